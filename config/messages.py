@@ -502,6 +502,12 @@ class NotificationMessages:
     SYSTEM_ERROR = "🚨 خطأ في النظام: {error_details}"
     HIGH_USAGE = "📈 استخدام عالي: {usage_details}"
     SECURITY_ALERT = "🛡️ تنبيه أمني: {alert_details}"
+    TARGET_UNAVAILABLE = (
+        "🚫 تم إيقاف الإرسال مؤقتاً للهدف {target_chat_id} في المهمة {task_id} "
+        "بعد أخطاء متكررة: {error_message}\n"
+        "تأكد من أن البوت ما زال عضواً ويملك صلاحية النشر، وسيتم اختبار الهدف تلقائياً."
+    )
+    TARGET_RECOVERED = "✅ عاد الإرسال للهدف {target_chat_id} في المهمة {task_id}"
 
 class AdminMessages:
     """رسائل الإدارة"""
@@ -37,6 +37,17 @@ class Settings:
     SPAM_PROTECTION: bool = os.getenv("SPAM_PROTECTION", "True").lower() == "true"
     MAX_MESSAGES_PER_MINUTE: int = int(os.getenv("MAX_MESSAGES_PER_MINUTE", "20"))
     
+    # إعدادات طابور التوجيه
+    FORWARDING_WORKERS: int = int(os.getenv("FORWARDING_WORKERS", "8"))
+    CONTENT_DEDUP_WINDOW_MINUTES: int = int(os.getenv("CONTENT_DEDUP_WINDOW_MINUTES", "60"))
+    FORWARDING_QUEUE_MAX_DEPTH: int = int(os.getenv("FORWARDING_QUEUE_MAX_DEPTH", "1000"))
+    FORWARDING_OVERFLOW_POLICY: str = os.getenv("FORWARDING_OVERFLOW_POLICY", "block")
+    BACKFILL_RATE_PER_SECOND: float = float(os.getenv("BACKFILL_RATE_PER_SECOND", "2"))
+    BACKFILL_STAGING_CHAT_ID: int = int(os.getenv("BACKFILL_STAGING_CHAT_ID", "0"))
+    CATCH_UP_ENABLED: bool = os.getenv("CATCH_UP_ENABLED", "True").lower() == "true"
+    CATCH_UP_MAX_AGE_MINUTES: int = int(os.getenv("CATCH_UP_MAX_AGE_MINUTES", "60"))
+    CATCH_UP_RATE_PER_SECOND: float = float(os.getenv("CATCH_UP_RATE_PER_SECOND", "50"))
+    
     # إعدادات التخزين
     BACKUP_ENABLED: bool = os.getenv("BACKUP_ENABLED", "True").lower() == "true"
     BACKUP_INTERVAL_HOURS: int = int(os.getenv("BACKUP_INTERVAL_HOURS", "24"))
@@ -220,5 +231,70 @@ class DatabaseConfig:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (owner_id) REFERENCES users (user_id)
             )
+        ''',
+        
+        'dead_letters': '''
+            CREATE TABLE IF NOT EXISTS dead_letters (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task_id INTEGER NOT NULL,
+                source_chat_id BIGINT NOT NULL,
+                source_message_id INTEGER NOT NULL,
+                target_chat_id BIGINT NOT NULL,
+                attempts INTEGER DEFAULT 0,
+                last_error TEXT,
+                payload TEXT,
+                status TEXT DEFAULT 'pending',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                replayed_at TIMESTAMP,
+                FOREIGN KEY (task_id) REFERENCES tasks (id)
+            )
+        ''',
+        
+        'backfill_jobs': '''
+            CREATE TABLE IF NOT EXISTS backfill_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task_id INTEGER NOT NULL,
+                user_id BIGINT NOT NULL,
+                from_message_id INTEGER NOT NULL,
+                to_message_id INTEGER NOT NULL,
+                next_message_id INTEGER NOT NULL,
+                check_duplicates BOOLEAN DEFAULT TRUE,
+                status TEXT DEFAULT 'running',
+                fetched INTEGER DEFAULT 0,
+                queued INTEGER DEFAULT 0,
+                missing INTEGER DEFAULT 0,
+                last_error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (task_id) REFERENCES tasks (id)
+            )
+        ''',
+        
+        'forwarding_outbox': '''
+            CREATE TABLE IF NOT EXISTS forwarding_outbox (
+                entry_key TEXT PRIMARY KEY,
+                task_id INTEGER NOT NULL,
+                source_chat_id BIGINT NOT NULL,
+                message_data TEXT NOT NULL,
+                due_at REAL NOT NULL,
+                status TEXT DEFAULT 'pending',
+                shard INTEGER,
+                lane TEXT DEFAULT 'live',
+                remaining_targets TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''',
+        
+        'message_map': '''
+            CREATE TABLE IF NOT EXISTS message_map (
+                task_id INTEGER NOT NULL,
+                source_chat_id BIGINT NOT NULL,
+                source_message_id INTEGER NOT NULL,
+                target_chat_id BIGINT NOT NULL,
+                target_message_id INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (task_id, source_chat_id, source_message_id, target_chat_id, target_message_id)
+            ) WITHOUT ROWID
         '''
     }
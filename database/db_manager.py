@@ -8,8 +8,9 @@ import asyncio
 import json
 import logging
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable
 from config.settings import DatabaseConfig
+from utils.pattern_cache import validate_task_patterns
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +20,7 @@ class DatabaseManager:
     def __init__(self, db_path: str = "bot_database.db"):
         self.db_path = db_path
         self.connection = None
+        self.task_listeners: List[Callable[[int, str], Awaitable[Any]]] = []  # مستمعو تغييرات المهام
     
     async def initialize(self):
         """تهيئة قاعدة البيانات وإنشاء الجداول"""
@@ -56,6 +58,23 @@ class DatabaseManager:
             logger.error(f"خطأ في تنفيذ التحديث: {e}")
             return False
     
+    def add_task_listener(self, listener: Callable[[int, str], Awaitable[Any]]):
+        """تسجيل مستمع يُستدعى بعد إنشاء مهمة أو تعديلها أو حذفها"""
+        self.task_listeners.append(listener)
+    
+    async def notify_task_change(self, task_id: int, action: str):
+        """إبلاغ المستمعين بتغيير مهمة ('created' / 'updated' / 'deleted')"""
+        for listener in self.task_listeners:
+            try:
+                await listener(task_id, action)
+            except Exception as e:
+                logger.error(f"خطأ في مستمع تغييرات المهام: {e}")
+    
+    async def notify_user_tasks_change(self, user_id: int):
+        """إبلاغ المستمعين بتغيير جميع مهام المستخدم (حالة الاشتراك تحدد مسار طلباتها في الطابور)"""
+        for row in self.execute_query("SELECT id FROM tasks WHERE user_id = ?", (user_id,)):
+            await self.notify_task_change(row['id'], 'updated')
+    
     # إدارة المستخدمين
     async def add_user(self, user_id: int, username: str = None, 
                       first_name: str = None, last_name: str = None) -> bool:
@@ -82,7 +101,10 @@ class DatabaseManager:
         """تفعيل Premium للمستخدم"""
         expires = datetime.now() + timedelta(days=days)
         query = "UPDATE users SET is_premium = TRUE, premium_expires = ? WHERE user_id = ?"
-        return self.execute_update(query, (expires, user_id))
+        updated = self.execute_update(query, (expires, user_id))
+        if updated:
+            await self.notify_user_tasks_change(user_id)
+        return updated
     
     async def check_premium(self, user_id: int) -> bool:
         """فحص حالة Premium للمستخدم"""
@@ -93,7 +115,8 @@ class DatabaseManager:
         if user['premium_expires'] and datetime.fromisoformat(user['premium_expires']) < datetime.now():
             # انتهت صلاحية Premium
             query = "UPDATE users SET is_premium = FALSE WHERE user_id = ?"
-            self.execute_update(query, (user_id,))
+            if self.execute_update(query, (user_id,)):
+                await self.notify_user_tasks_change(user_id)
             return False
         
         return True
@@ -110,12 +133,16 @@ class DatabaseManager:
             SET is_premium = TRUE, premium_expires = ?, trial_used = TRUE 
             WHERE user_id = ?
         """
-        return self.execute_update(query, (expires, user_id))
+        updated = self.execute_update(query, (expires, user_id))
+        if updated:
+            await self.notify_user_tasks_change(user_id)
+        return updated
     
     # إدارة المهام
     async def create_task(self, user_id: int, name: str, source_chat_id: int, 
                          target_chat_ids: List[int], settings: Dict = None) -> int:
         """إنشاء مهمة جديدة"""
+        self.validate_task_settings(settings or {})
         query = """
             INSERT INTO tasks (user_id, name, source_chat_id, target_chat_ids, settings)
             VALUES (?, ?, ?, ?, ?)
@@ -126,6 +153,7 @@ class DatabaseManager:
             json.dumps(settings or {})
         ))
         self.connection.commit()
+        await self.notify_task_change(cursor.lastrowid, 'created')
         return cursor.lastrowid
     
     async def get_user_tasks(self, user_id: int) -> List[Dict]:
@@ -140,22 +168,58 @@ class DatabaseManager:
         
         return tasks
     
+    ACTIVE_TASKS_QUERY = """
+        SELECT t.*, 
+               CASE WHEN u.is_premium AND (u.premium_expires IS NULL 
+                    OR u.premium_expires > datetime('now', 'localtime')) 
+               THEN 1 ELSE 0 END AS owner_is_premium,
+               u.premium_expires AS owner_premium_expires
+        FROM tasks t
+        LEFT JOIN users u ON u.user_id = t.user_id
+        WHERE t.is_active = TRUE
+    """
+    
     async def get_active_tasks(self) -> List[Dict]:
-        """الحصول على جميع المهام النشطة"""
-        query = "SELECT * FROM tasks WHERE is_active = TRUE"
-        tasks = self.execute_query(query)
+        """الحصول على جميع المهام النشطة مع حالة اشتراك أصحابها"""
+        tasks = self.execute_query(self.ACTIVE_TASKS_QUERY)
         
         for task in tasks:
-            task['target_chat_ids'] = json.loads(task['target_chat_ids'])
-            task['settings'] = json.loads(task['settings'] or '{}')
+            self.decode_active_task(task)
         
         return tasks
     
+    async def get_active_task(self, task_id: int) -> Optional[Dict]:
+        """الحصول على مهمة نشطة واحدة (None إذا كانت متوقفة أو غير موجودة)"""
+        result = self.execute_query(self.ACTIVE_TASKS_QUERY + " AND t.id = ?", (task_id,))
+        if not result:
+            return None
+        
+        return self.decode_active_task(result[0])
+    
+    @staticmethod
+    def decode_active_task(task: Dict) -> Dict:
+        """تحويل حقول المهمة النشطة وحساب وقت انتهاء اشتراك صاحبها"""
+        task['target_chat_ids'] = json.loads(task['target_chat_ids'])
+        task['settings'] = json.loads(task['settings'] or '{}')
+        
+        # انتهاء الاشتراك دون تفاعل من المستخدم لا يمر بمستمعي التغييرات، فيُقارن وقته عند الجدولة
+        expires = task.pop('owner_premium_expires', None)
+        task['owner_premium_until'] = None
+        if task['owner_is_premium'] and expires:
+            try:
+                task['owner_premium_until'] = datetime.fromisoformat(str(expires)).timestamp()
+            except ValueError:
+                pass
+        return task
+    
     async def update_task(self, task_id: int, **kwargs) -> bool:
         """تحديث مهمة"""
         if not kwargs:
             return False
         
+        if isinstance(kwargs.get('settings'), dict):
+            self.validate_task_settings(kwargs['settings'])
+        
         # تحويل القوائم والقواميس إلى JSON
         for key, value in kwargs.items():
             if isinstance(value, (list, dict)):
@@ -165,12 +229,27 @@ class DatabaseManager:
         query = f"UPDATE tasks SET {set_clause}, updated_at = ? WHERE id = ?"
         
         values = list(kwargs.values()) + [datetime.now(), task_id]
-        return self.execute_update(query, values)
+        if not self.execute_update(query, values):
+            return False
+        
+        await self.notify_task_change(task_id, 'updated')
+        return True
+    
+    @staticmethod
+    def validate_task_settings(settings: Dict):
+        """رفض إعدادات المهمة التي تحتوي على أنماط فلاتر غير صالحة أو مكلفة قبل حفظها"""
+        errors = validate_task_patterns(settings)
+        if errors:
+            raise ValueError("أنماط فلاتر مرفوضة:\n" + "\n".join(errors))
     
     async def delete_task(self, task_id: int, user_id: int) -> bool:
         """حذف مهمة"""
         query = "DELETE FROM tasks WHERE id = ? AND user_id = ?"
-        return self.execute_update(query, (task_id, user_id))
+        if not self.execute_update(query, (task_id, user_id)):
+            return False
+        
+        await self.notify_task_change(task_id, 'deleted')
+        return True
     
     # إدارة الرسائل
     async def log_forwarded_message(self, task_id: int, source_msg_id: int, 
@@ -182,6 +261,230 @@ class DatabaseManager:
         """
         self.execute_update(query, (task_id, source_msg_id, json.dumps(target_msg_ids)))
     
+    async def log_forwarded_messages(self, rows: List[Tuple[int, int, str]]) -> bool:
+        """تسجيل دفعة من الرسائل الموجهة في معاملة واحدة: (المهمة، الرسالة المصدر، نسخ الأهداف JSON)"""
+        try:
+            self.connection.executemany("""
+                INSERT INTO messages (task_id, source_message_id, target_message_ids)
+                VALUES (?, ?, ?)
+            """, rows)
+            self.connection.commit()
+            return True
+        except Exception as e:
+            self.connection.rollback()
+            logger.error(f"خطأ في تسجيل الرسائل الموجهة: {e}")
+            return False
+    
+    # خريطة نسخ الرسائل
+    async def add_message_mappings(self, rows: List[Tuple[int, int, int, int, int]]) -> bool:
+        """تسجيل نسخ الرسائل: (المهمة، المصدر، الرسالة، الهدف، النسخة)"""
+        try:
+            self.connection.executemany("""
+                INSERT OR IGNORE INTO message_map 
+                (task_id, source_chat_id, source_message_id, target_chat_id, target_message_id)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
+            self.connection.commit()
+            return True
+        except Exception as e:
+            self.connection.rollback()
+            logger.error(f"خطأ في تسجيل خريطة الرسائل: {e}")
+            return False
+    
+    async def get_message_mappings(self, source_chat_id: int, source_message_id: int, 
+                                  task_ids: List[int]) -> List[Dict]:
+        """الحصول على نسخ رسالة مصدر للمهام المحددة"""
+        placeholders = ','.join('?' * len(task_ids))
+        query = f"""
+            SELECT task_id, target_chat_id, target_message_id FROM message_map 
+            WHERE task_id IN ({placeholders}) AND source_chat_id = ? AND source_message_id = ?
+        """
+        return self.execute_query(query, (*task_ids, source_chat_id, source_message_id))
+    
+    async def delete_message_mappings(self, source_chat_id: int, source_message_id: int, 
+                                     task_ids: List[int]) -> bool:
+        """حذف نسخ رسالة مصدر من الخريطة"""
+        placeholders = ','.join('?' * len(task_ids))
+        query = f"""
+            DELETE FROM message_map 
+            WHERE task_id IN ({placeholders}) AND source_chat_id = ? AND source_message_id = ?
+        """
+        return self.execute_update(query, (*task_ids, source_chat_id, source_message_id))
+    
+    # مخزن الرسائل الفاشلة
+    async def add_dead_letter(self, task_id: int, source_chat_id: int, source_message_id: int,
+                             target_chat_id: int, attempts: int, last_error: str,
+                             payload: Dict = None) -> int:
+        """إضافة عملية إرسال فاشلة لمخزن الرسائل الفاشلة"""
+        query = """
+            INSERT INTO dead_letters 
+            (task_id, source_chat_id, source_message_id, target_chat_id, attempts, last_error, payload)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """
+        cursor = self.connection.execute(query, (
+            task_id, source_chat_id, source_message_id, target_chat_id,
+            attempts, last_error, json.dumps(payload or {}, ensure_ascii=False)
+        ))
+        self.connection.commit()
+        return cursor.lastrowid
+    
+    async def get_dead_letters(self, status: str = 'pending', task_id: int = None, 
+                              limit: int = 50) -> List[Dict]:
+        """الحصول على الرسائل الفاشلة"""
+        if task_id is None:
+            query = "SELECT * FROM dead_letters WHERE status = ? ORDER BY id ASC LIMIT ?"
+            params = (status, limit)
+        else:
+            query = "SELECT * FROM dead_letters WHERE status = ? AND task_id = ? ORDER BY id ASC LIMIT ?"
+            params = (status, task_id, limit)
+        
+        dead_letters = self.execute_query(query, params)
+        for dead_letter in dead_letters:
+            dead_letter['payload'] = json.loads(dead_letter['payload'] or '{}')
+        
+        return dead_letters
+    
+    async def mark_dead_letter_replayed(self, dead_letter_id: int) -> bool:
+        """تمييز رسالة فاشلة كمُعاد إرسالها"""
+        query = "UPDATE dead_letters SET status = 'replayed', replayed_at = ? WHERE id = ?"
+        return self.execute_update(query, (datetime.now(), dead_letter_id))
+    
+    async def update_dead_letter_error(self, dead_letter_id: int, error: str) -> bool:
+        """تحديث آخر خطأ لرسالة فاشلة بعد محاولة إعادة إرسال"""
+        query = "UPDATE dead_letters SET attempts = attempts + 1, last_error = ? WHERE id = ?"
+        return self.execute_update(query, (error, dead_letter_id))
+    
+    async def get_dead_letters_stats(self) -> Dict[str, Any]:
+        """إحصائيات مخزن الرسائل الفاشلة"""
+        stats = {}
+        
+        result = self.execute_query("SELECT COUNT(*) as count FROM dead_letters WHERE status = 'pending'")
+        stats['pending'] = result[0]['count'] if result else 0
+        
+        result = self.execute_query("SELECT COUNT(*) as count FROM dead_letters WHERE status = 'replayed'")
+        stats['replayed'] = result[0]['count'] if result else 0
+        
+        stats['by_task'] = self.execute_query("""
+            SELECT task_id, COUNT(*) as count FROM dead_letters 
+            WHERE status = 'pending' 
+            GROUP BY task_id ORDER BY count DESC LIMIT 10
+        """)
+        
+        return stats
+    
+    # صندوق الصادر
+    def flush_outbox(self, inserts: List[tuple], completions: List[tuple], spills: List[tuple] = None,
+                     target_updates: List[tuple] = None) -> bool:
+        """حفظ دفعة من كتابات صندوق الصادر في معاملة واحدة"""
+        try:
+            if inserts:
+                self.connection.executemany("""
+                    INSERT OR REPLACE INTO forwarding_outbox 
+                    (entry_key, task_id, source_chat_id, message_data, due_at, lane, status)
+                    VALUES (?, ?, ?, ?, ?, ?, 'pending')
+                """, inserts)
+            if spills:
+                self.connection.executemany(
+                    "UPDATE forwarding_outbox SET status = 'spilled', shard = ?, updated_at = CURRENT_TIMESTAMP WHERE entry_key = ?",
+                    spills
+                )
+            if target_updates:
+                self.connection.executemany(
+                    "UPDATE forwarding_outbox SET remaining_targets = ?, updated_at = CURRENT_TIMESTAMP WHERE entry_key = ?",
+                    target_updates
+                )
+            if completions:
+                self.connection.executemany(
+                    "UPDATE forwarding_outbox SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE entry_key = ?",
+                    completions
+                )
+            self.connection.commit()
+            return True
+        except Exception as e:
+            self.connection.rollback()
+            logger.error(f"خطأ في حفظ صندوق الصادر: {e}")
+            return False
+    
+    async def get_unfinished_outbox_entries(self) -> List[Dict]:
+        """الحصول على طلبات التوجيه غير المكتملة بترتيب إضافتها وإعادة المنقولة للقرص لحالة الانتظار"""
+        # في نفس المعاملة: أول نقل جديد للقرص يعيد التحميل من السجلات 'spilled' فلا تُحمل مرتين
+        try:
+            cursor = self.connection.execute("""
+                SELECT * FROM forwarding_outbox WHERE status IN ('pending', 'spilled') 
+                ORDER BY due_at ASC, rowid ASC
+            """)
+            rows = [dict(row) for row in cursor.fetchall()]
+            self.connection.execute(
+                "UPDATE forwarding_outbox SET status = 'pending', updated_at = CURRENT_TIMESTAMP WHERE status = 'spilled'"
+            )
+            self.connection.commit()
+            return rows
+        except Exception as e:
+            self.connection.rollback()
+            logger.error(f"خطأ في تحميل صندوق الصادر: {e}")
+            return []
+    
+    async def get_spilled_outbox_entries(self, shard: int, limit: int) -> List[Dict]:
+        """الحصول على أقدم طلبات التوجيه المنقولة للقرص لعامل معين"""
+        query = """
+            SELECT * FROM forwarding_outbox WHERE status = 'spilled' AND shard = ? 
+            ORDER BY due_at ASC, rowid ASC LIMIT ?
+        """
+        return self.execute_query(query, (shard, limit))
+    
+    async def purge_outbox_entries(self, days: int = 1) -> bool:
+        """حذف سجلات صندوق الصادر المكتملة القديمة"""
+        query = """
+            DELETE FROM forwarding_outbox WHERE status NOT IN ('pending', 'spilled') 
+            AND updated_at < datetime('now', ?)
+        """
+        return self.execute_update(query, (f'-{days} days',))
+    
+    # مهام نسخ السجل
+    async def create_backfill_job(self, task_id: int, user_id: int, from_message_id: int,
+                                  to_message_id: int, check_duplicates: bool = True) -> int:
+        """إنشاء مهمة نسخ سجل لنطاق رسائل"""
+        query = """
+            INSERT INTO backfill_jobs 
+            (task_id, user_id, from_message_id, to_message_id, next_message_id, check_duplicates)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """
+        cursor = self.connection.execute(query, (
+            task_id, user_id, from_message_id, to_message_id, from_message_id, check_duplicates
+        ))
+        self.connection.commit()
+        return cursor.lastrowid
+    
+    async def get_backfill_job(self, job_id: int) -> Optional[Dict]:
+        """الحصول على مهمة نسخ سجل"""
+        result = self.execute_query("SELECT * FROM backfill_jobs WHERE id = ?", (job_id,))
+        return result[0] if result else None
+    
+    async def get_backfill_jobs(self, status: str = None, user_id: int = None, limit: int = 20) -> List[Dict]:
+        """الحصول على مهام نسخ السجل"""
+        conditions = []
+        params = []
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if user_id:
+            conditions.append("user_id = ?")
+            params.append(user_id)
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"SELECT * FROM backfill_jobs {where} ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        return self.execute_query(query, tuple(params))
+    
+    async def update_backfill_job(self, job_id: int, **kwargs) -> bool:
+        """حفظ تقدم مهمة نسخ سجل"""
+        if not kwargs:
+            return False
+        
+        set_clause = ", ".join([f"{key} = ?" for key in kwargs.keys()])
+        query = f"UPDATE backfill_jobs SET {set_clause}, updated_at = CURRENT_TIMESTAMP WHERE id = ?"
+        return self.execute_update(query, list(kwargs.values()) + [job_id])
+    
     # إدارة الدردشات
     async def add_chat(self, chat_id: int, chat_type: str, title: str = None, 
                       username: str = None, member_count: int = 0) -> bool:
@@ -248,6 +551,11 @@ class DatabaseManager:
         result = self.execute_query(query, (user_id,))
         return len(result) > 0
     
+    async def get_admin_user_ids(self) -> List[int]:
+        """الحصول على معرفات جميع المشرفين"""
+        query = "SELECT user_id FROM admins"
+        return [row['user_id'] for row in self.execute_query(query)]
+    
     # الرسائل المجدولة
     async def add_scheduled_message(self, user_id: int, message_text: str, 
                                    target_type: str, target_ids: List[int],
@@ -345,7 +653,10 @@ class DatabaseManager:
     async def deactivate_premium(self, user_id: int) -> bool:
         """إلغاء Premium للمستخدم"""
         query = "UPDATE users SET is_premium = FALSE, premium_expires = NULL WHERE user_id = ?"
-        return self.execute_update(query, (user_id,))
+        updated = self.execute_update(query, (user_id,))
+        if updated:
+            await self.notify_user_tasks_change(user_id)
+        return updated
     
     async def get_users_stats(self) -> Dict[str, Any]:
         """الحصول على إحصائيات المستخدمين"""
@@ -506,6 +817,7 @@ class DatabaseManager:
         # حذف الرسائل القديمة (أكثر من 90 يوم)
         query = "DELETE FROM messages WHERE created_at < date('now', '-90 days')"
         cursor = self.connection.execute(query)
+        self.connection.execute("DELETE FROM message_map WHERE created_at < date('now', '-90 days')")
         self.connection.commit()
         return cursor.rowcount
     
@@ -105,6 +105,41 @@ class MigrationManager:
                 'version': '010',
                 'description': 'إضافة القيود والعلاقات',
                 'sql': self.migration_010_add_constraints()
+            },
+            {
+                'version': '011',
+                'description': 'إضافة فهارس مخزن الرسائل الفاشلة',
+                'sql': self.migration_011_add_dead_letters_indexes()
+            },
+            {
+                'version': '012',
+                'description': 'إضافة فهارس صندوق الصادر',
+                'sql': self.migration_012_add_outbox_indexes()
+            },
+            {
+                'version': '013',
+                'description': 'دعم نقل طلبات التوجيه الزائدة للقرص',
+                'sql': self.migration_013_add_outbox_spill()
+            },
+            {
+                'version': '014',
+                'description': 'إضافة فهارس مهام نسخ السجل',
+                'sql': self.migration_014_add_backfill_indexes()
+            },
+            {
+                'version': '015',
+                'description': 'إضافة فهرس تاريخ خريطة الرسائل',
+                'sql': self.migration_015_add_message_map_indexes()
+            },
+            {
+                'version': '016',
+                'description': 'حفظ مسار الطابور في صندوق الصادر',
+                'sql': self.migration_016_add_outbox_lane()
+            },
+            {
+                'version': '017',
+                'description': 'حفظ الأهداف المتبقية لطلبات صندوق الصادر',
+                'sql': self.migration_017_add_outbox_remaining_targets()
             }
         ]
         return migrations
@@ -467,6 +502,62 @@ class MigrationManager:
             "CREATE INDEX idx_users_created_at ON users(created_at)"
         ]
 
+    def migration_011_add_dead_letters_indexes(self) -> List[str]:
+        """إضافة فهارس مخزن الرسائل الفاشلة"""
+        return [
+            "CREATE INDEX IF NOT EXISTS idx_dead_letters_status_task ON dead_letters(status, task_id)",
+            "CREATE INDEX IF NOT EXISTS idx_dead_letters_created_at ON dead_letters(created_at)"
+        ]
+
+    def migration_012_add_outbox_indexes(self) -> List[str]:
+        """إضافة فهارس صندوق الصادر"""
+        return [
+            "CREATE INDEX IF NOT EXISTS idx_forwarding_outbox_status ON forwarding_outbox(status, due_at)"
+        ]
+
+    def get_table_columns(self, table_name: str) -> List[str]:
+        """أسماء أعمدة جدول موجود"""
+        return [row['name'] for row in self.db.execute_query(f"PRAGMA table_info({table_name})")]
+
+    def migration_013_add_outbox_spill(self) -> List[str]:
+        """دعم نقل طلبات التوجيه الزائدة للقرص"""
+        statements = []
+        # القواعد الجديدة تُنشئ العمود مع الجدول، والقديمة فقط تحتاج إضافته
+        columns = self.get_table_columns('forwarding_outbox')
+        if columns and 'shard' not in columns:
+            statements.append("ALTER TABLE forwarding_outbox ADD COLUMN shard INTEGER")
+        statements.append(
+            "CREATE INDEX IF NOT EXISTS idx_forwarding_outbox_shard ON forwarding_outbox(status, shard, due_at)"
+        )
+        return statements
+
+    def migration_014_add_backfill_indexes(self) -> List[str]:
+        """إضافة فهارس مهام نسخ السجل"""
+        return [
+            "CREATE INDEX IF NOT EXISTS idx_backfill_jobs_status ON backfill_jobs(status)",
+            "CREATE INDEX IF NOT EXISTS idx_backfill_jobs_task ON backfill_jobs(task_id)"
+        ]
+
+    def migration_015_add_message_map_indexes(self) -> List[str]:
+        """إضافة فهرس تاريخ خريطة الرسائل (حذف الروابط القديمة دون مسح الجدول كاملاً)"""
+        return [
+            "CREATE INDEX IF NOT EXISTS idx_message_map_created_at ON message_map(created_at)"
+        ]
+
+    def migration_016_add_outbox_lane(self) -> List[str]:
+        """حفظ مسار الطابور (مباشر أو نسخ السجل) في صندوق الصادر"""
+        columns = self.get_table_columns('forwarding_outbox')
+        if columns and 'lane' not in columns:
+            return ["ALTER TABLE forwarding_outbox ADD COLUMN lane TEXT DEFAULT 'live'"]
+        return []
+    
+    def migration_017_add_outbox_remaining_targets(self) -> List[str]:
+        """حفظ الأهداف التي تنتظر إعادة المحاولة حتى يبقى الطلب مفتوحاً بعد إعادة التشغيل"""
+        columns = self.get_table_columns('forwarding_outbox')
+        if columns and 'remaining_targets' not in columns:
+            return ["ALTER TABLE forwarding_outbox ADD COLUMN remaining_targets TEXT"]
+        return []
+
 class BackupManager:
     """مدير النسخ الاحتياطية"""
     
@@ -0,0 +1,163 @@
+"""
+تجميع فلاتر المهمة إلى قائمة فحوصات مرتبة حسب التكلفة
+Cost-Ordered Compiled Filter Predicates
+"""
+
+import inspect
+import time
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Callable, Tuple
+
+# تكلفة تقديرية (بالثواني) لكل فحص قبل جمع قياسات فعلية
+COST_CHEAP = 0.00001  # حقول الرسالة فقط
+COST_TEXT = 0.0001  # مرور على النص
+COST_REGEX = 0.0005  # تعبيرات نمطية
+COST_DATABASE = 0.005  # استعلام قاعدة بيانات
+COST_NETWORK = 0.05  # طلب خارجي
+
+class FilterPredicate:
+    """فحص واحد من فلاتر المهمة مع قياس تكلفته ونسبة رفضه"""
+    
+    __slots__ = ('name', 'check', 'base_cost', 'runs', 'rejections', 'total_seconds')
+    
+    MIN_SAMPLES = 20  # عدد المرات قبل اعتماد التكلفة المقاسة بدل التقديرية
+    
+    def __init__(self, name: str, check: Callable, base_cost: float):
+        self.name = name
+        self.check = check  # تستقبل الرسالة وتعيد bool أو (bool، السبب)، متزامنة أو غير متزامنة
+        self.base_cost = base_cost
+        self.runs = 0
+        self.rejections = 0
+        self.total_seconds = 0.0
+    
+    @property
+    def cost(self) -> float:
+        """متوسط زمن الفحص"""
+        if self.runs < self.MIN_SAMPLES:
+            return self.base_cost
+        return self.total_seconds / self.runs
+    
+    @property
+    def rejection_rate(self) -> float:
+        """نسبة الرفض المقدرة (مع تنعيم لتجنب القسمة على صفر)"""
+        return (self.rejections + 1) / (self.runs + 2)
+    
+    @property
+    def rank(self) -> float:
+        """التكلفة المتوقعة لكل رفض: الأقل يُنفذ أولاً"""
+        return self.cost / self.rejection_rate
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات الفحص"""
+        return {
+            'name': self.name,
+            'runs': self.runs,
+            'rejections': self.rejections,
+            'rejection_rate': self.rejections / self.runs if self.runs else 0.0,
+            'avg_ms': self.cost * 1000
+        }
+
+class CompiledFilter:
+    """قائمة فحوصات مسطحة تُقيّم بالترتيب وتتوقف عند أول رفض"""
+    
+    REORDER_EVERY = 200  # إعادة الترتيب حسب القياسات كل هذا العدد من الرسائل
+    
+    def __init__(self, predicates: List[FilterPredicate]):
+        self.predicates = sorted(predicates, key=lambda predicate: predicate.rank)
+        self.evaluations = 0
+        self.reorders = 0
+    
+    async def evaluate(self, message) -> Tuple[bool, Optional[str]]:
+        """تقييم الرسالة وإرجاع (مقبولة، سبب الرفض)"""
+        self.evaluations += 1
+        if self.evaluations % self.REORDER_EVERY == 0:
+            self.reorder()
+        
+        for predicate in self.predicates:
+            started_at = time.perf_counter()
+            result = predicate.check(message)
+            if inspect.isawaitable(result):
+                result = await result
+            predicate.total_seconds += time.perf_counter() - started_at
+            predicate.runs += 1
+            
+            accepted, reason = result if isinstance(result, tuple) else (result, predicate.name)
+            if not accepted:
+                predicate.rejections += 1
+                return False, reason
+        
+        return True, None
+    
+    def reorder(self):
+        """ترتيب الفحوصات حسب التكلفة والانتقائية المقاسة"""
+        ordered = sorted(self.predicates, key=lambda predicate: predicate.rank)
+        if [predicate.name for predicate in ordered] != [predicate.name for predicate in self.predicates]:
+            self.predicates = ordered
+            self.reorders += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات الفلتر المجمع بترتيبه الحالي"""
+        return {
+            'evaluations': self.evaluations,
+            'reorders': self.reorders,
+            'predicates': [predicate.get_stats() for predicate in self.predicates]
+        }
+
+class CompiledFilterCache:
+    """كاش الفلاتر المجمعة حسب المهمة وإصدارها في لقطة المهام"""
+    
+    MAX_ENTRIES = 1024
+    
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        # المفتاح -> (الإصدار، كائن الفلاتر، الفلتر المجمع)
+        self.entries: OrderedDict = OrderedDict()
+        self.stats = {
+            'compiled': 0,
+            'hits': 0,
+            'invalidated': 0
+        }
+    
+    def get(self, task_id: Optional[int], version: int, filters: Dict[str, Any],
+            build: Callable[[Dict[str, Any]], CompiledFilter]) -> CompiledFilter:
+        """الفلتر المجمع للمهمة، ويُعاد تجميعه فقط عند تغير إصدارها"""
+        if task_id is None:
+            # بدون معرف مهمة: الفلاتر تُعرف بهوية كائن الإعدادات
+            key, version = ('filters', id(filters)), 0
+        else:
+            key = ('task', task_id)
+        
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == version and (task_id is not None or entry[1] is filters):
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[2]
+        
+        compiled = build(filters)
+        self.entries[key] = (version, filters, compiled)
+        self.entries.move_to_end(key)
+        self.stats['compiled'] += 1
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return compiled
+    
+    def invalidate(self, task_id: int):
+        """حذف الفلتر المجمع لمهمة"""
+        if self.entries.pop(('task', task_id), None) is not None:
+            self.stats['invalidated'] += 1
+    
+    def retain(self, task_ids):
+        """حذف الفلاتر المجمعة للمهام غير النشطة"""
+        task_ids = set(task_ids)
+        for scope, task_id in list(self.entries):
+            if scope == 'task' and task_id not in task_ids:
+                self.invalidate(task_id)
+    
+    def get_task_stats(self, task_id: int) -> Optional[Dict[str, Any]]:
+        """ترتيب وإحصائيات فحوصات مهمة"""
+        entry = self.entries.get(('task', task_id))
+        return entry[2].get_stats() if entry else None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات الكاش"""
+        return {**self.stats, 'filters': len(self.entries)}
@@ -0,0 +1,200 @@
+"""
+خصائص الرسالة المحسوبة مرة واحدة لجميع الفلاتر
+Shared Per-Message Feature Extraction
+"""
+
+import re
+import urllib.parse
+from collections import Counter, OrderedDict
+from functools import cached_property
+from typing import Dict, List, Optional, Tuple
+from telegram import Message
+from utils.keyword_matcher import fold_text
+
+# نفس نمط الروابط المستخدم في TextProcessor.clean_text
+URL_PATTERN = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\$$\$$,]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+
+def get_message_type(message: Message) -> str:
+    """تحديد نوع الرسالة"""
+    if message.text:
+        return 'text'
+    elif message.photo:
+        return 'photo'
+    elif message.video:
+        return 'video'
+    elif message.audio:
+        return 'audio'
+    elif message.voice:
+        return 'voice'
+    elif message.document:
+        return 'document'
+    elif message.sticker:
+        return 'sticker'
+    elif message.animation:
+        return 'animation'
+    elif message.location:
+        return 'location'
+    elif message.contact:
+        return 'contact'
+    elif message.poll:
+        return 'poll'
+    elif message.game:
+        return 'game'
+    else:
+        return 'other'
+
+def extract_domain(url: str) -> str:
+    """استخراج الدومين من الرابط (بدون المنفذ وبيانات الدخول)"""
+    parsed = urllib.parse.urlparse(url)
+    return (parsed.hostname or parsed.netloc).lower()
+
+def get_script_counts(char_counts: Counter) -> Dict[str, int]:
+    """عدد الأحرف العربية واللاتينية من جدول تكرار الأحرف (دون مرور جديد على النص)"""
+    arabic = english = 0
+    for char, count in char_counts.items():
+        if '\u0600' <= char <= '\u06ff':
+            arabic += count
+        elif 'a' <= char <= 'z' or 'A' <= char <= 'Z':
+            english += count
+    return {'arabic': arabic, 'english': english}
+
+def get_language(script_counts: Dict[str, int]) -> str:
+    """اللغة الغالبة حسب عدد الأحرف"""
+    if script_counts['arabic'] > script_counts['english']:
+        return 'arabic'
+    elif script_counts['english'] > script_counts['arabic']:
+        return 'english'
+    else:
+        return 'mixed'
+
+class MessageFeatures:
+    """خصائص رسالة واحدة: كل خاصية تُحسب عند أول طلب فقط ثم تُشارك بين الفلاتر"""
+    
+    def __init__(self, message: Message):
+        self.message = message
+        self.text = message.text or message.caption or ""
+        self.type = get_message_type(message)
+    
+    @cached_property
+    def text_lower(self) -> str:
+        """النص بأحرف صغيرة"""
+        return self.text.lower()
+    
+    @cached_property
+    def normalized_text(self) -> str:
+        """النص الموحد للمقارنة (حالة الأحرف والحروف العربية)"""
+        return fold_text(self.text)
+    
+    @cached_property
+    def urls(self) -> List[str]:
+        """الروابط في النص"""
+        return URL_PATTERN.findall(self.text) if self.text else []
+    
+    @cached_property
+    def domains(self) -> List[str]:
+        """دومينات الروابط بنفس ترتيبها"""
+        return [extract_domain(url) for url in self.urls]
+    
+    @cached_property
+    def char_counts(self) -> Counter:
+        """تكرار كل حرف في النص (مرور واحد)"""
+        return Counter(self.text)
+    
+    @cached_property
+    def script_counts(self) -> Dict[str, int]:
+        """عدد الأحرف العربية واللاتينية"""
+        return get_script_counts(self.char_counts)
+    
+    @cached_property
+    def most_repeated_char(self) -> Tuple[Optional[str], int]:
+        """الحرف الأكثر تكراراً وعدد مرات تكراره"""
+        if not self.char_counts:
+            return None, 0
+        return self.char_counts.most_common(1)[0]
+    
+    @property
+    def language(self) -> str:
+        """كشف لغة النص"""
+        return get_language(self.script_counts)
+    
+    @cached_property
+    def media(self) -> Tuple[int, int, Tuple[int, int]]:
+        """(حجم الملف، المدة، الأبعاد) للوسائط"""
+        message = self.message
+        if message.photo:
+            photo = message.photo[-1]
+            return photo.file_size or 0, 0, (photo.width, photo.height)
+        elif message.video:
+            video = message.video
+            return video.file_size or 0, video.duration or 0, (video.width, video.height)
+        elif message.audio:
+            return message.audio.file_size or 0, message.audio.duration or 0, (0, 0)
+        elif message.voice:
+            return message.voice.file_size or 0, message.voice.duration or 0, (0, 0)
+        elif message.document:
+            return message.document.file_size or 0, 0, (0, 0)
+        else:
+            return 0, 0, (0, 0)
+    
+    @property
+    def file_size(self) -> int:
+        """حجم ملف الوسائط بالبايت"""
+        return self.media[0]
+    
+    @property
+    def duration(self) -> int:
+        """مدة الوسائط بالثواني"""
+        return self.media[1]
+    
+    @property
+    def dimensions(self) -> Tuple[int, int]:
+        """أبعاد الصورة أو الفيديو"""
+        return self.media[2]
+    
+    @cached_property
+    def forward_source_id(self) -> Optional[int]:
+        """معرف مصدر الرسالة المعاد توجيهها"""
+        if self.message.forward_from:
+            return self.message.forward_from.id
+        elif self.message.forward_from_chat:
+            return self.message.forward_from_chat.id
+        return None
+    
+    @property
+    def is_forwarded(self) -> bool:
+        """هل الرسالة معاد توجيهها"""
+        return bool(self.message.forward_from or self.message.forward_from_chat)
+
+class MessageFeatureCache:
+    """كاش محدود لخصائص الرسائل حسب هوية كائن الرسالة (التحديث الواحد يمر على جميع المهام بنفس الكائن)"""
+    
+    MAX_ENTRIES = 256
+    
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.features: OrderedDict = OrderedDict()
+        self.stats = {
+            'computed': 0,
+            'hits': 0
+        }
+    
+    def get(self, message: Message) -> MessageFeatures:
+        """خصائص الرسالة، تُنشأ مرة واحدة لكل تحديث"""
+        cached = self.features.get(id(message))
+        if cached is not None and cached.message is message:
+            self.stats['hits'] += 1
+            return cached
+        
+        features = MessageFeatures(message)
+        self.features[id(message)] = features
+        self.stats['computed'] += 1
+        if len(self.features) > self.max_entries:
+            self.features.popitem(last=False)
+        return features
+    
+    def get_stats(self) -> Dict[str, int]:
+        """إحصائيات الكاش"""
+        return {**self.stats, 'cached': len(self.features)}
+
+# كاش مشترك بين مديري الفلاتر وكاشف السبام
+message_features = MessageFeatureCache()
@@ -3,11 +3,17 @@
 Message Filters Manager
 """
 
-import re
 import json
 from typing import Dict, List, Any, Optional
 from telegram import Message
 from utils.logger import BotLogger
+from utils.keyword_matcher import keyword_matchers
+from utils.domain_matcher import domain_matchers
+from utils.pattern_cache import pattern_cache
+from filters.message_features import message_features, get_message_type
+from filters.filter_compiler import (
+    FilterPredicate, CompiledFilter, CompiledFilterCache, COST_CHEAP, COST_TEXT, COST_REGEX, COST_NETWORK
+)
 
 logger = BotLogger()
 
@@ -15,43 +21,44 @@ class MessageFilterManager:
     """مدير فلاتر الرسائل المتقدم"""
     
     def __init__(self):
-        self.filter_cache = {}
+        self.filter_cache = pattern_cache  # الأنماط المجمعة مشتركة بين مديري الفلاتر
+        self.compiled_filters = CompiledFilterCache()  # فلاتر كل مهمة مجمعة حسب إصدارها
     
-    async def check_message(self, message: Message, filters: Dict[str, Any]) -> bool:
+    def compile_filters(self, filters: Dict[str, Any]) -> CompiledFilter:
+        """تجميع الفلاتر المفعلة فقط إلى فحوصات مرتبة حسب التكلفة"""
+        text_filter = filters.get('text', {})
+        definitions = (
+            ('media', self.check_media_filter, COST_CHEAP),
+            ('forwarded', self.check_forwarded_filter, COST_CHEAP),
+            ('users', self.check_user_filter, COST_CHEAP),
+            ('language', self.check_language_filter, COST_TEXT),
+            ('links', self.check_links_filter, COST_TEXT),
+            ('text', self.check_text_filter, COST_REGEX if text_filter.get('regex_patterns') else COST_TEXT),
+            ('admins', self.check_admin_filter, COST_NETWORK)
+        )
+        
+        predicates = []
+        for name, check, cost in definitions:
+            config = filters.get(name) or {}
+            if config.get('enabled', False):
+                predicates.append(FilterPredicate(name, self.bind_filter(check, config), cost))
+        return CompiledFilter(predicates)
+    
+    @staticmethod
+    def bind_filter(check, config: Dict[str, Any]):
+        """ربط دالة الفلتر بإعداداته"""
+        return lambda message: check(message, config)
+    
+    async def check_message(self, message: Message, filters: Dict[str, Any],
+                            task_id: Optional[int] = None, task_version: int = 0) -> bool:
         """فحص الرسالة ضد جميع الفلاتر"""
         if not filters:
             return True
         
         try:
-            # فلتر أنواع الوسائط
-            if not self.check_media_filter(message, filters.get('media', {})):
-                return False
-            
-            # فلتر النصوص
-            if not self.check_text_filter(message, filters.get('text', {})):
-                return False
-            
-            # فلتر المستخدمين
-            if not self.check_user_filter(message, filters.get('users', {})):
-                return False
-            
-            # فلتر الروابط
-            if not self.check_links_filter(message, filters.get('links', {})):
-                return False
-            
-            # فلتر اللغة
-            if not self.check_language_filter(message, filters.get('language', {})):
-                return False
-            
-            # فلتر المشرفين
-            if not await self.check_admin_filter(message, filters.get('admins', {})):
-                return False
-            
-            # فلتر الرسائل المُعاد توجيهها
-            if not self.check_forwarded_filter(message, filters.get('forwarded', {})):
-                return False
-            
-            return True
+            compiled = self.compiled_filters.get(task_id, task_version, filters, self.compile_filters)
+            accepted, _ = await compiled.evaluate(message)
+            return accepted
             
         except Exception as e:
             logger.log_error(e, {
@@ -71,64 +78,36 @@ class MessageFilterManager:
             return True
         
         # تحديد نوع الرسالة
-        message_type = self.get_message_type(message)
+        message_type = message_features.get(message).type
         
         # فحص إذا كان النوع مسموح
         return message_type in allowed_types
     
     def get_message_type(self, message: Message) -> str:
         """تحديد نوع الرسالة"""
-        if message.text:
-            return 'text'
-        elif message.photo:
-            return 'photo'
-        elif message.video:
-            return 'video'
-        elif message.audio:
-            return 'audio'
-        elif message.voice:
-            return 'voice'
-        elif message.document:
-            return 'document'
-        elif message.sticker:
-            return 'sticker'
-        elif message.animation:
-            return 'animation'
-        elif message.location:
-            return 'location'
-        elif message.contact:
-            return 'contact'
-        elif message.poll:
-            return 'poll'
-        elif message.game:
-            return 'game'
-        else:
-            return 'other'
+        return get_message_type(message)
     
-    def check_text_filter(self, message: Message, text_filter: Dict[str, Any]) -> bool:
+    async def check_text_filter(self, message: Message, text_filter: Dict[str, Any]) -> bool:
         """فلتر النصوص"""
         if not text_filter.get('enabled', False):
             return True
         
-        text_content = message.text or message.caption or ""
+        features = message_features.get(message)
+        text_content = features.text
         if not text_content:
             return True
         
-        # فلتر الكلمات المحظورة
+        # فلتر الكلمات المحظورة (مرور واحد على النص الموحد لجميع الكلمات)
         banned_words = text_filter.get('banned_words', [])
-        if banned_words:
-            text_lower = text_content.lower()
-            for word in banned_words:
-                if word.lower() in text_lower:
-                    return False
+        if banned_words and keyword_matchers.get(banned_words).search(features.normalized_text, is_folded=True):
+            return False
         
-        # فلتر الكلمات المطلوبة
+        # فلتر الكلمات المطلوبة (يجب وجودها جميعاً)
         required_words = text_filter.get('required_words', [])
-        if required_words:
-            text_lower = text_content.lower()
-            for word in required_words:
-                if word.lower() not in text_lower:
-                    return False
+        if required_words and not keyword_matchers.get(required_words).contains_all(
+            features.normalized_text, is_folded=True
+        ):
+            return False
         
         # فلتر طول النص
         min_length = text_filter.get('min_length', 0)
@@ -140,14 +119,11 @@ class MessageFilterManager:
         if max_length > 0 and len(text_content) > max_length:
             return False
         
-        # فلتر التعبيرات النمطية
+        # فلتر التعبيرات النمطية (النمط المعطل لتكلفته يحجب النص بدل تجاوزه بصمت)
         regex_patterns = text_filter.get('regex_patterns', [])
         for pattern in regex_patterns:
-            try:
-                if re.search(pattern, text_content):
-                    return False
-            except re.error:
-                continue
+            if await self.filter_cache.search(pattern, text_content) is not False:
+                return False
         
         return True
     
@@ -188,37 +164,30 @@ class MessageFilterManager:
         if not links_filter.get('enabled', False):
             return True
         
-        text_content = message.text or message.caption or ""
-        if not text_content:
+        features = message_features.get(message)
+        if not features.text:
             return True
         
-        # البحث عن الروابط
-        url_pattern = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\$$\$$,]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
-        urls = re.findall(url_pattern, text_content)
+        # الروابط ودوميناتها مستخرجة مرة واحدة للرسالة
+        domains = features.domains
         
         # فلتر حظر الروابط
-        if links_filter.get('block_all_links', False) and urls:
+        if links_filter.get('block_all_links', False) and domains:
             return False
         
-        # فلتر الدومينات المحظورة
+        # فلتر الدومينات المحظورة (الدومين أو نطاقاته الفرعية، لا أي رابط يحتوي النص)
         banned_domains = links_filter.get('banned_domains', [])
-        if banned_domains and urls:
-            for url in urls:
-                for domain in banned_domains:
-                    if domain in url:
-                        return False
+        if banned_domains and domains:
+            banned = domain_matchers.get(banned_domains)
+            if any(domain in banned for domain in domains):
+                return False
         
         # فلتر الدومينات المسموحة
         allowed_domains = links_filter.get('allowed_domains', [])
-        if allowed_domains and urls:
-            for url in urls:
-                domain_allowed = False
-                for domain in allowed_domains:
-                    if domain in url:
-                        domain_allowed = True
-                        break
-                if not domain_allowed:
-                    return False
+        if allowed_domains and domains:
+            allowed = domain_matchers.get(allowed_domains)
+            if not all(domain in allowed for domain in domains):
+                return False
         
         return True
     
@@ -227,23 +196,15 @@ class MessageFilterManager:
         if not language_filter.get('enabled', False):
             return True
         
-        text_content = message.text or message.caption or ""
-        if not text_content:
+        features = message_features.get(message)
+        if not features.text:
             return True
         
-        # فحص اللغة المطلوبة (تطبيق بسيط)
+        # فحص اللغة المطلوبة (تطبيق بسيط: وجود أحرف من اللغة)
         required_language = language_filter.get('required_language')
-        if required_language:
-            if required_language == 'arabic':
-                # فحص وجود أحرف عربية
-                arabic_pattern = r'[\u0600-\u06FF]'
-                if not re.search(arabic_pattern, text_content):
-                    return False
-            elif required_language == 'english':
-                # فحص وجود أحرف إنجليزية
-                english_pattern = r'[a-zA-Z]'
-                if not re.search(english_pattern, text_content):
-                    return False
+        if required_language in ('arabic', 'english'):
+            if not features.script_counts[required_language]:
+                return False
         
         return True
     
@@ -262,7 +223,7 @@ class MessageFilterManager:
             return True
         
         # فحص إذا كانت الرسالة مُعاد توجيهها
-        is_forwarded = message.forward_from or message.forward_from_chat
+        is_forwarded = message_features.get(message).is_forwarded
         
         # حظر الرسائل المُعاد توجيهها
         if forwarded_filter.get('block_forwarded', False) and is_forwarded:
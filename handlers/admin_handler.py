@@ -3,8 +3,9 @@
 Advanced Admin Handler
 """
 
+import html
 import json
-import asyncio
+import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
@@ -16,16 +17,22 @@ from config.messages import Messages
 from utils.decorators import admin_required, error_handler, rate_limit
 from utils.helpers import FormatHelper, TimeHelper
 from utils.logger import BotLogger
+from services.rate_limiter import rate_limiter
+from services.retry_queue import DeadLetterQueue
+from services.metrics import forwarding_metrics, STAGES
+from utils.pattern_cache import pattern_cache
 
 logger = BotLogger()
 
 class AdminHandler:
     """معالج الإدارة المتقدم"""
     
-    def __init__(self, db: DatabaseManager):
+    def __init__(self, db: DatabaseManager, message_forwarder=None):
         self.db = db
         self.settings = Settings()
         self.broadcast_sessions = {}  # جلسات الرسائل الجماعية
+        self.dead_letters = DeadLetterQueue(db)  # مخزن الرسائل الفاشلة
+        self.message_forwarder = message_forwarder  # مصدر إحصائيات مسار التوجيه
     
     @admin_required
     @error_handler
@@ -369,6 +376,8 @@ class AdminHandler:
         # إرسال الرسائل
         for user_id in recipients:
             try:
+                # انتظار رمز من محدد المعدل لتجنب حدود التلغرام
+                await rate_limiter.acquire(context.bot.token, user_id, 'private')
                 await context.bot.send_message(
                     chat_id=user_id,
                     text=message_text,
@@ -376,9 +385,6 @@ class AdminHandler:
                 )
                 sent_count += 1
                 
-                # تأخير صغير لتجنب حدود التلغرام
-                await asyncio.sleep(0.1)
-                
             except Exception as e:
                 if "blocked" in str(e).lower():
                     blocked_count += 1
@@ -588,9 +594,72 @@ class AdminHandler:
             'uptime': uptime,
             'memory_usage': memory_usage,
             'db_size': FormatHelper.format_file_size(db_size),
-            'queue_size': 0  # سيتم تحديثه من MessageForwarder
+            'queue_size': self.message_forwarder.forwarding_queue.qsize() if self.message_forwarder else 0,
+            'rate_limiter': rate_limiter.get_stats(),
+            'forwarding': self.message_forwarder.get_stats() if self.message_forwarder else None
         }
     
+    @staticmethod
+    def format_forwarding_stats(stats: Dict[str, Any]) -> str:
+        """تنسيق إحصائيات مسار التوجيه (الطابور، التكرار، الكتابة، القواطع، اللحاق)"""
+        queue = stats['queue']
+        text = (
+            f"🧵 <b>طابور التوجيه:</b> {queue['queue_size']}/{queue['max_depth'] or '∞'} "
+            f"(سياسة الامتلاء: {queue['overflow_policy']})\n"
+            f"• العمال المشغولون: {queue['busy_workers']}/{queue['workers']}\n"
+            f"• المنقول للقرص: {queue['spilled']} | المحذوف: {queue['dropped']}\n"
+        )
+        for shard in queue['shards']:
+            if shard['depth'] or shard['processed']:
+                text += f"• العامل {shard['shard']}: {shard['depth']} طلب، استخدام {shard['utilization']:.0%}\n"
+        
+        if queue['lanes']:
+            text += "\n🛣 <b>المسارات:</b>\n"
+            for name, lane in queue['lanes'].items():
+                text += (
+                    f"• {name}: {lane['depth']} في الانتظار، انتظار {lane['avg_wait']:.2f} ث، "
+                    f"زمن {lane['avg_latency']:.2f} ث\n"
+                )
+        
+        deduplication = stats['deduplication']
+        content = stats['content_deduplication']
+        text += (
+            f"\n♻️ <b>كشف التكرار:</b> {deduplication['hit_rate']:.1%} من {deduplication['lookups']} فحص\n"
+            f"• محتوى مكرر عبر المصادر: {content['duplicates']} من {content['checks']}\n"
+        )
+        
+        text += "\n💾 <b>الكتابة المؤجلة:</b>\n"
+        for name, writer in (('سجل الرسائل', stats['message_log']), ('خريطة الرسائل', stats['message_map']['writer'])):
+            text += (
+                f"• {name}: دفعة {writer['avg_batch_size']:.1f} صف، "
+                f"{writer['avg_flush_seconds'] * 1000:.1f} ms، معلق {writer['pending']}\n"
+            )
+        text += f"• صندوق الصادر: معلق {stats['outbox']['pending_writes']}\n"
+        
+        breaker = stats['circuit_breaker']
+        text += (
+            f"\n🔌 <b>قاطع الدائرة:</b> فُتح {breaker['opened']} | أُغلق {breaker['closed']} | "
+            f"رُفض {breaker['rejected']}\n"
+        )
+        for target in breaker['open_targets'][:10]:
+            text += (
+                f"• <code>{target['chat_id']}</code> {target['state']} "
+                f"(بعد {TimeHelper.format_duration(int(target['retry_in_seconds']))})\n"
+            )
+        
+        catch_up = stats['catch_up']
+        text += f"\n⏩ <b>وضع اللحاق:</b> {catch_up['mode']}"
+        if catch_up['remaining']:
+            eta = catch_up['eta_seconds']
+            text += f" - متبقٍ {catch_up['remaining']}"
+            if eta is not None:
+                text += f"، الوقت المتوقع {TimeHelper.format_duration(int(eta))}"
+        text += (
+            f"\n🔁 <b>إعادة المحاولة:</b> {stats['retry_queue']['pending']} معلقة"
+            f" | ⏳ مؤجلة: {stats['delay_queue']['pending']}\n"
+        )
+        return text
+    
     async def get_user_stats(self, user_id: int) -> Dict[str, Any]:
         """الحصول على إحصائيات مستخدم محدد"""
         return await self.db.get_user_detailed_stats(user_id)
@@ -648,6 +717,161 @@ class AdminHandler:
         else:
             await update.message.reply_text("❌ فشل في إلغاء حظر المستخدم")
     
+    @admin_required
+    @error_handler
+    async def show_dead_letters(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """عرض الرسائل الفاشلة المخزنة"""
+        task_id = int(context.args[0]) if context.args else None
+        
+        summary = await self.dead_letters.get_summary()
+        dead_letters = await self.dead_letters.get_pending(task_id=task_id, limit=10)
+        
+        text = f"""
+📭 <b>مخزن الرسائل الفاشلة</b>
+
+⏳ المعلقة: {FormatHelper.format_number(summary['pending'])}
+✅ المُعاد إرسالها: {FormatHelper.format_number(summary['replayed'])}
+"""
+        
+        if summary['by_task']:
+            text += "\n📋 <b>حسب المهمة:</b>\n"
+            for row in summary['by_task']:
+                text += f"• المهمة {row['task_id']}: {row['count']}\n"
+        
+        if dead_letters:
+            text += f"\n🔍 <b>آخر الرسائل{f' للمهمة {task_id}' if task_id else ''}:</b>\n"
+            for dead_letter in dead_letters:
+                text += (
+                    f"• #{dead_letter['id']} - المهمة {dead_letter['task_id']} → "
+                    f"<code>{dead_letter['target_chat_id']}</code> "
+                    f"({dead_letter['attempts']} محاولة): {html.escape((dead_letter['last_error'] or '')[:80])}\n"
+                )
+        
+        text += "\n💡 لإعادة الإرسال: <code>/replay [all|task_id] [limit]</code>"
+        
+        await update.message.reply_text(text, parse_mode='HTML')
+    
+    @admin_required
+    @error_handler
+    async def replay_dead_letters(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """إعادة إرسال الرسائل الفاشلة المخزنة"""
+        if not context.args:
+            await update.message.reply_text(
+                "❌ الاستخدام: <code>/replay [all|task_id] [limit]</code>",
+                parse_mode='HTML'
+            )
+            return
+        
+        task_id = None if context.args[0] == 'all' else int(context.args[0])
+        limit = int(context.args[1]) if len(context.args) > 1 else 100
+        
+        results = await self.dead_letters.replay(context.bot, task_id=task_id, limit=limit)
+        
+        await update.message.reply_text(
+            f"🔁 <b>إعادة الإرسال</b>\n\n"
+            f"📊 الإجمالي: {results['total']}\n"
+            f"✅ نجح: {results['replayed']}\n"
+            f"❌ فشل: {results['failed']}",
+            parse_mode='HTML'
+        )
+        
+        logger.log_admin_action(
+            update.effective_user.id,
+            "dead_letters_replayed",
+            target=str(task_id or 'all'),
+            details=results
+        )
+    
+    @admin_required
+    @error_handler
+    async def show_metrics(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """عرض مدرجات الزمن وعدادات التوجيه أو تصديرها"""
+        arg = context.args[0] if context.args else None
+        
+        if arg == 'pipeline':
+            if not self.message_forwarder:
+                await update.message.reply_text("❌ خدمة التوجيه غير متاحة.")
+                return
+            text = "🚦 <b>مسار التوجيه</b>\n\n" + self.format_forwarding_stats(self.message_forwarder.get_stats())
+            await update.message.reply_text(text, parse_mode='HTML')
+            return
+        
+        if arg in ('export', 'json'):
+            if arg == 'json':
+                content, extension = forwarding_metrics.export_json(), 'json'
+            else:
+                content, extension = forwarding_metrics.export_prometheus(), 'prom'
+            await update.message.reply_document(
+                document=content.encode('utf-8'),
+                filename=f"metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+            )
+            return
+        
+        if arg:
+            task_id = int(arg)
+            summary = forwarding_metrics.get_scope_summary('task', task_id)
+            counters = summary['counters']
+            text = f"📈 <b>مقاييس المهمة {task_id}</b>\n\n"
+            text += "\n".join(f"• {name}: {FormatHelper.format_number(value)}" for name, value in counters.items())
+            
+            if summary['latency']:
+                text += "\n\n⏱ <b>الزمن (ث) p50 / p95 / p99:</b>\n"
+                for stage in STAGES:
+                    latency = summary['latency'].get(stage)
+                    if latency:
+                        text += (
+                            f"• {stage}: {latency['p50']:g} / {latency['p95']:g} / {latency['p99']:g} "
+                            f"({latency['count']})\n"
+                        )
+        else:
+            top_tasks = forwarding_metrics.get_top_tasks()
+            text = "📈 <b>مقاييس التوجيه</b>\n\n"
+            if not top_tasks:
+                text += "لا توجد بيانات بعد.\n"
+            for task_id, counters in top_tasks:
+                end_to_end = forwarding_metrics.get_scope_summary('task', task_id)['latency'].get('end_to_end')
+                text += (
+                    f"• المهمة {task_id}: ✅ {counters['accepted']} | 🚫 {counters['filtered']} | "
+                    f"♻️ {counters['duplicate']} | ❌ {counters['failed']} | 🔁 {counters['retried']}"
+                )
+                if end_to_end:
+                    text += f" | p95 {end_to_end['p95']:g} ث"
+                text += "\n"
+        
+        text += "\n💡 <code>/metrics [task_id|pipeline|export|json]</code>"
+        await update.message.reply_text(text, parse_mode='HTML')
+    
+    @admin_required
+    @error_handler
+    async def show_expensive_patterns(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """عرض أنماط الفلاتر المكلفة أو المعطلة"""
+        stats = pattern_cache.get_stats()
+        
+        text = f"""
+🧮 <b>أنماط الفلاتر</b>
+
+📦 المجمعة: {FormatHelper.format_number(stats['patterns'])}
+⛔ المعطلة لتكلفتها: {FormatHelper.format_number(stats['disabled'])}
+⚙️ المحرك الخطي (re2): {'✅' if stats['linear_engine'] else '❌'}
+⏱️ مطابقات أُنهيت لتجاوز المهلة: {FormatHelper.format_number(stats['timeouts'])}
+"""
+        
+        if stats['expensive']:
+            text += "\n🐢 <b>الأنماط المكلفة:</b>\n"
+            for pattern in stats['expensive']:
+                state = "⛔" if pattern['disabled'] else "⚠️"
+                text += (
+                    f"{state} <code>{html.escape(pattern['pattern'][:60])}</code> - "
+                    f"{pattern['runs']} تشغيل، أقصى {pattern['max_ms']:.0f} ms، "
+                    f"متوسط {pattern['avg_ms']:.1f} ms\n"
+                )
+                if pattern['error']:
+                    text += f"   {html.escape(pattern['error'])}\n"
+        else:
+            text += "\n✅ لا توجد أنماط مكلفة."
+        
+        await update.message.reply_text(text, parse_mode='HTML')
+    
     @admin_required
     @error_handler
     async def system_maintenance(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -747,6 +971,13 @@ class AdminHandler:
 🗄️ <b>حجم قاعدة البيانات:</b> {system_stats['db_size']}
 📊 <b>المهام في الطابور:</b> {system_stats['queue_size']}
 
+⏳ <b>محدد المعدل:</b>
+• طلبات الإرسال: {FormatHelper.format_number(system_stats['rate_limiter']['acquired'])}
+• طلبات انتظرت: {FormatHelper.format_number(system_stats['rate_limiter']['waited'])}
+• متوسط الانتظار: {system_stats['rate_limiter']['avg_wait_seconds']:.2f} ثانية
+• أقصى انتظار: {system_stats['rate_limiter']['max_wait_seconds']:.2f} ثانية
+• أحداث RetryAfter: {system_stats['rate_limiter']['retry_after_events']}
+{self.format_forwarding_stats(system_stats['forwarding']) if system_stats['forwarding'] else ''}
 🟢 <b>الخدمات النشطة:</b>
 • خدمة توجيه الرسائل
 • خدمة قاعدة البيانات
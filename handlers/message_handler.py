@@ -94,12 +94,3 @@ class MessageHandler:
         """إعادة تحميل المهام"""
         if self.initialized:
             await self.message_forwarder.reload_tasks()
-    
-    async def get_forwarding_stats(self) -> dict:
-        """الحصول على إحصائيات التوجيه"""
-        # سيتم تطويرها في المرحلة التالية
-        return {
-            'active_tasks': len(self.message_forwarder.active_tasks),
-            'queue_size': self.message_forwarder.forwarding_queue.qsize(),
-            'is_processing': self.message_forwarder.is_processing
-        }
@@ -25,8 +25,9 @@ logger = BotLogger()
 class TaskHandler:
     """معالج المهام المتقدم"""
     
-    def __init__(self, db: DatabaseManager):
+    def __init__(self, db: DatabaseManager, backfill_engine=None):
         self.db = db
+        self.backfill_engine = backfill_engine  # محرك نسخ سجل المصادر
         self.user_sessions = {}  # جلسات المستخدمين لإنشاء المهام
     
     @user_required
@@ -498,7 +499,9 @@ class TaskHandler:
                         'pin_messages': False,
                         'reply_to_message': True,
                         'char_limit': 0,
-                        'custom_buttons': []
+                        'custom_buttons': [],
+                        'max_concurrent_sends': 10,
+                        'skip_duplicate_content': True
                     }
                 }
             )
@@ -662,6 +665,107 @@ class TaskHandler:
         else:
             await update.message.reply_text("❌ فشل في حذف المهمة. يرجى المحاولة مرة أخرى.")
     
+    @user_required
+    @error_handler
+    async def backfill_task(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """نسخ رسائل قديمة من مصدر المهمة: آخر N رسالة أو نطاق معرفات"""
+        args = context.args or []
+        if len(args) not in (2, 3, 4) or not all(arg.isdigit() for arg in args[:3]):
+            await update.message.reply_text(
+                "❌ الاستخدام:\n"
+                "<code>/backfill 123 50</code> - آخر 50 رسالة\n"
+                "<code>/backfill 123 1000 1200</code> - نطاق معرفات\n"
+                "<code>/backfill 123 1000 1200 replay</code> - إعادة الإرسال حتى للرسائل المعالجة سابقاً",
+                parse_mode='HTML'
+            )
+            return
+        
+        user_id = update.effective_user.id
+        task_id = int(args[0])
+        
+        # التأكد من وجود المهمة وملكية المستخدم لها
+        tasks = await self.db.get_user_tasks(user_id)
+        task = next((t for t in tasks if t['id'] == task_id), None)
+        if not task:
+            await update.message.reply_text("❌ المهمة غير موجودة أو ليس لديك صلاحية عليها.")
+            return
+        if not task['is_active']:
+            await update.message.reply_text("❌ يجب تفعيل المهمة أولاً.")
+            return
+        
+        if len(args) == 2:
+            last_message_id = self.backfill_engine.get_last_message_id(task['source_chat_id'])
+            if not last_message_id:
+                await update.message.reply_text(
+                    "❌ لم تصل أي رسالة من المصدر منذ تشغيل البوت، لذا لا يُعرف آخر معرف.\n"
+                    "يرجى تحديد نطاق المعرفات مباشرة.",
+                    parse_mode='HTML'
+                )
+                return
+            from_message_id = max(1, last_message_id - int(args[1]) + 1)
+            to_message_id = last_message_id
+        else:
+            from_message_id, to_message_id = int(args[1]), int(args[2])
+        
+        replay = len(args) == 4 and args[3].lower() == 'replay'
+        
+        try:
+            job_id = await self.backfill_engine.create_job(
+                task, from_message_id, to_message_id, check_duplicates=not replay
+            )
+        except (ValueError, RuntimeError) as e:
+            await update.message.reply_text(f"❌ {e}")
+            return
+        
+        logger.log_task_action(user_id, task_id, "backfill_started", {
+            'job_id': job_id, 'from': from_message_id, 'to': to_message_id, 'replay': replay
+        })
+        await update.message.reply_text(
+            f"✅ بدأت مهمة النسخ #{job_id} للرسائل {from_message_id} - {to_message_id}.\n"
+            f"لمتابعة التقدم: <code>/backfills</code>\n"
+            f"للإلغاء: <code>/cancelbackfill {job_id}</code>",
+            parse_mode='HTML'
+        )
+    
+    @user_required
+    @error_handler
+    async def list_backfills(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """عرض مهام نسخ السجل الأخيرة للمستخدم"""
+        jobs = await self.backfill_engine.get_jobs(update.effective_user.id)
+        if not jobs:
+            await update.message.reply_text("📭 لا توجد مهام نسخ سجل.")
+            return
+        
+        lines = ["📥 <b>مهام نسخ السجل:</b>\n"]
+        for job in jobs:
+            total = job['to_message_id'] - job['from_message_id'] + 1
+            done = min(total, job['next_message_id'] - job['from_message_id'])
+            lines.append(
+                f"#{job['id']} | المهمة {job['task_id']} | {job['status']} | "
+                f"{done}/{total} ({job['queued']} أضيفت، {job['missing']} غير موجودة)"
+            )
+        
+        await update.message.reply_text("\n".join(lines), parse_mode='HTML')
+    
+    @user_required
+    @error_handler
+    async def cancel_backfill(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """إلغاء مهمة نسخ سجل"""
+        if not context.args or not context.args[0].isdigit():
+            await update.message.reply_text(
+                "❌ يرجى تحديد رقم مهمة النسخ.\n\nمثال: <code>/cancelbackfill 5</code>",
+                parse_mode='HTML'
+            )
+            return
+        
+        job = await self.db.get_backfill_job(int(context.args[0]))
+        if not job or job['user_id'] != update.effective_user.id:
+            await update.message.reply_text("❌ مهمة النسخ غير موجودة أو ليس لديك صلاحية عليها.")
+            return
+        
+        await self.backfill_engine.cancel_job(job['id'])
+        await update.message.reply_text(f"⏹️ تم إلغاء مهمة النسخ #{job['id']}.")
+    
     async def parse_chat_identifier(self, identifier: str) -> Optional[int]:
         """تحليل معرف الدردشة من أشكال مختلفة"""
         identifier = identifier.strip()
@@ -9,12 +9,13 @@ import logging
 import os
 from datetime import datetime
 from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
+from telegram.ext import Application, CommandHandler, MessageHandler, TypeHandler, filters, ContextTypes
 from database.db_manager import DatabaseManager
 from handlers.admin_handler import AdminHandler
 from handlers.task_handler import TaskHandler
 from handlers.user_handler import UserHandler
 from services.message_forwarder import MessageForwarder
+from services.notification_service import NotificationService
 from handlers.webhook_handler import WebhookHandler
 from config.settings import Settings
 from utils.logger import setup_logger
@@ -27,10 +28,11 @@ class TelegramBot:
     def __init__(self):
         self.settings = Settings()
         self.db = DatabaseManager()
-        self.admin_handler = AdminHandler(self.db)
-        self.task_handler = TaskHandler(self.db)
-        self.user_handler = UserHandler(self.db)
         self.message_forwarder = MessageForwarder(self.db)
+        self.admin_handler = AdminHandler(self.db, self.message_forwarder)
+        self.task_handler = TaskHandler(self.db, self.message_forwarder.backfill)
+        self.user_handler = UserHandler(self.db)
+        self.notification_service = NotificationService(self.db, self.settings.BOT_TOKEN)
         self.webhook_handler = WebhookHandler(self.db)
         
     async def initialize(self):
@@ -52,6 +54,9 @@ class TelegramBot:
     def setup_handlers(self, application):
         """إعداد معالجات الأوامر والرسائل"""
         
+        # وضع اللحاق يمر على كل تحديث قبل باقي المعالجات
+        application.add_handler(TypeHandler(Update, self.message_forwarder.catch_up.observe_update), group=-1)
+        
         # معالجات الأوامر الأساسية
         application.add_handler(CommandHandler("start", self.user_handler.start_command))
         application.add_handler(CommandHandler("help", self.user_handler.help_command))
@@ -62,21 +67,44 @@ class TelegramBot:
         application.add_handler(CommandHandler("stats", self.admin_handler.show_stats))
         application.add_handler(CommandHandler("users", self.admin_handler.manage_users))
         application.add_handler(CommandHandler("broadcast", self.admin_handler.broadcast_message))
+        application.add_handler(CommandHandler("deadletters", self.admin_handler.show_dead_letters))
+        application.add_handler(CommandHandler("replay", self.admin_handler.replay_dead_letters))
+        application.add_handler(CommandHandler("metrics", self.admin_handler.show_metrics))
+        application.add_handler(CommandHandler("patterns", self.admin_handler.show_expensive_patterns))
         
         # معالجات المهام
         application.add_handler(CommandHandler("tasks", self.task_handler.list_tasks))
         application.add_handler(CommandHandler("newtask", self.task_handler.create_task))
         application.add_handler(CommandHandler("edittask", self.task_handler.edit_task))
         application.add_handler(CommandHandler("deltask", self.task_handler.delete_task))
+        application.add_handler(CommandHandler("backfill", self.task_handler.backfill_task))
+        application.add_handler(CommandHandler("backfills", self.task_handler.list_backfills))
+        application.add_handler(CommandHandler("cancelbackfill", self.task_handler.cancel_backfill))
         
         # معالج الرسائل العام
         application.add_handler(MessageHandler(
             filters.ALL, self.message_forwarder.handle_message
         ))
         
+        # تحديثات حذف الرسائل لا تحمل رسالة فلا تصل لمعالج الرسائل (مجموعة مستقلة حتى لا تحجبه)
+        application.add_handler(TypeHandler(Update, self.message_forwarder.handle_message_delete), group=1)
+        
         # معالج الأخطاء
         application.add_error_handler(self.error_handler)
     
+    async def post_init(self, application):
+        """تشغيل خدمة التوجيه داخل حلقة أحداث التطبيق واستعادة الطلبات المعلقة"""
+        await self.notification_service.start()
+        await self.message_forwarder.initialize(application, self.notification_service)
+        await self.message_forwarder.recover_outbox(application)
+        if self.settings.CATCH_UP_ENABLED:
+            await self.message_forwarder.catch_up.start(application.bot)
+    
+    async def post_shutdown(self, application):
+        """إيقاف خدمة التوجيه وحفظ الكتابات المعلقة"""
+        await self.message_forwarder.stop_forwarding()
+        await self.notification_service.stop()
+    
     async def error_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """معالج الأخطاء العام"""
         logger.error(f"خطأ في البوت: {context.error}")
@@ -92,7 +120,13 @@ class TelegramBot:
     def run(self):
         """تشغيل البوت"""
         # إنشاء التطبيق
-        application = Application.builder().token(self.settings.BOT_TOKEN).build()
+        application = (
+            Application.builder()
+            .token(self.settings.BOT_TOKEN)
+            .post_init(self.post_init)
+            .post_shutdown(self.post_shutdown)
+            .build()
+        )
         
         # إعداد المعالجات
         self.setup_handlers(application)
@@ -105,12 +139,12 @@ class TelegramBot:
                 listen="0.0.0.0",
                 port=int(os.environ.get("PORT", 8443)),
                 webhook_url=self.settings.WEBHOOK_URL,
-                drop_pending_updates=True
+                drop_pending_updates=not self.settings.CATCH_UP_ENABLED
             )
         else:
             application.run_polling(
                 allowed_updates=Update.ALL_TYPES,
-                drop_pending_updates=True
+                drop_pending_updates=not self.settings.CATCH_UP_ENABLED
             )
 
 if __name__ == "__main__":
@@ -0,0 +1,258 @@
+"""
+نسخ سجل المصدر لنطاق من الرسائل
+History Backfill Engine
+"""
+
+import asyncio
+from typing import Dict, List, Any, Optional
+from telegram import Bot, Message
+from telegram.ext import Application, CallbackContext
+from telegram.error import BadRequest, RetryAfter
+from database.db_manager import DatabaseManager
+from services.rate_limiter import rate_limiter
+from services.retry_queue import get_retry_after_seconds
+from config.settings import Settings
+from utils.logger import BotLogger
+
+logger = BotLogger()
+
+# حقول إعادة التوجيه التي تضيفها النسخة الوسيطة لرسالة غير معاد توجيهها في المصدر
+FORWARD_FIELDS = (
+    'forward_origin', 'forward_from', 'forward_from_chat', 'forward_from_message_id',
+    'forward_signature', 'forward_sender_name', 'forward_date', 'is_automatic_forward'
+)
+
+class BackfillEngine:
+    """تمرير نطاق من رسائل المصدر القديمة عبر مسار التوجيه العادي بمعدل محدود"""
+    
+    MAX_RANGE = 10000  # أقصى عدد رسائل في مهمة واحدة
+    MAX_QUEUED_REQUESTS = 200  # إيقاف الجلب مؤقتاً إذا تجاوز طابور التوجيه هذا الحد
+    CHECKPOINT_EVERY = 20  # حفظ التقدم كل هذا العدد من الرسائل
+    
+    def __init__(self, db: DatabaseManager, forwarder):
+        self.db = db
+        self.forwarder = forwarder
+        self.application: Optional[Application] = None
+        self.jobs: Dict[int, asyncio.Task] = {}  # معرف مهمة النسخ -> مهمة التشغيل
+    
+    async def start(self, application: Application):
+        """استئناف مهام النسخ غير المكتملة من تشغيل سابق"""
+        self.application = application
+        for job in await self.db.get_backfill_jobs(status='running', limit=1000):
+            self.launch(job)
+        
+        if self.jobs:
+            logger.logger.info(f"تم استئناف {len(self.jobs)} مهمة نسخ سجل")
+    
+    async def stop(self):
+        """إيقاف جميع المهام مع بقاء حالتها 'running' لاستئنافها لاحقاً"""
+        jobs = list(self.jobs.values())
+        for job in jobs:
+            job.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
+        self.jobs = {}
+    
+    async def create_job(self, task: Dict[str, Any], from_message_id: int, to_message_id: int,
+                         check_duplicates: bool = True) -> int:
+        """إنشاء مهمة نسخ لنطاق رسائل وتشغيلها"""
+        if from_message_id < 1 or to_message_id < from_message_id:
+            raise ValueError("نطاق الرسائل غير صالح")
+        if to_message_id - from_message_id + 1 > self.MAX_RANGE:
+            raise ValueError(f"أقصى نطاق مسموح هو {self.MAX_RANGE} رسالة")
+        if not self.application:
+            raise RuntimeError("خدمة التوجيه لم تبدأ بعد")
+        
+        job_id = await self.db.create_backfill_job(
+            task['id'], task['user_id'], from_message_id, to_message_id, check_duplicates
+        )
+        self.launch(await self.db.get_backfill_job(job_id))
+        return job_id
+    
+    async def cancel_job(self, job_id: int) -> bool:
+        """إلغاء مهمة نسخ"""
+        runner = self.jobs.pop(job_id, None)
+        if runner:
+            runner.cancel()
+            await asyncio.gather(runner, return_exceptions=True)
+        return await self.db.update_backfill_job(job_id, status='cancelled')
+    
+    def get_last_message_id(self, source_chat_id: int) -> Optional[int]:
+        """آخر معرف رسالة شوهد من المصدر منذ التشغيل"""
+        return self.forwarder.last_source_message_ids.get(source_chat_id)
+    
+    def launch(self, job: Dict[str, Any]):
+        """تشغيل مهمة نسخ في الخلفية"""
+        runner = asyncio.create_task(self.run_job(job))
+        self.jobs[job['id']] = runner
+        runner.add_done_callback(lambda _: self.jobs.pop(job['id'], None))
+    
+    async def run_job(self, job: Dict[str, Any]):
+        """جلب الرسائل بالترتيب وتمريرها عبر فلاتر المهمة ومعالجتها"""
+        job_id = job['id']
+        bot = self.application.bot
+        context = CallbackContext(self.application)
+        interval = 1 / max(Settings.BACKFILL_RATE_PER_SECOND, 0.01)
+        progress = {key: job[key] for key in ('fetched', 'queued', 'missing')}
+        next_message_id = job['next_message_id']
+        album: List[Message] = []
+        
+        try:
+            task = self.forwarder.active_tasks.get(job['task_id'])
+            if not task:
+                await self.db.update_backfill_job(job_id, status='failed', last_error="المهمة غير نشطة")
+                return
+            
+            source_chat = (await bot.get_chat(task['source_chat_id'])).to_dict()
+            staging_chat_id = Settings.BACKFILL_STAGING_CHAT_ID or task['user_id']
+            
+            for message_id in range(job['next_message_id'], job['to_message_id'] + 1):
+                # حماية الرسائل الحية: الانتظار حتى ينخفض طابور التوجيه
+                while self.forwarder.forwarding_queue.qsize() >= self.MAX_QUEUED_REQUESTS:
+                    await asyncio.sleep(1)
+                
+                # المهمة قد تتغير أو تتوقف أثناء النسخ
+                task = self.forwarder.active_tasks.get(job['task_id'])
+                if not task:
+                    await self.db.update_backfill_job(job_id, status='failed', last_error="المهمة غير نشطة")
+                    return
+                
+                message = await self.fetch_message(bot, source_chat, message_id, staging_chat_id)
+                if message is None:
+                    progress['missing'] += 1
+                else:
+                    progress['fetched'] += 1
+                    # أجزاء الألبوم متتالية: تُجمع ثم توجه كوحدة واحدة
+                    if album and message.media_group_id != album[0].media_group_id:
+                        progress['queued'] += await self.route(album, task, context, job)
+                        album = []
+                        next_message_id = message_id
+                    if message.media_group_id:
+                        album.append(message)
+                    else:
+                        progress['queued'] += await self.route([message], task, context, job)
+                
+                if not album:
+                    next_message_id = message_id + 1
+                if (message_id - job['from_message_id'] + 1) % self.CHECKPOINT_EVERY == 0:
+                    await self.db.update_backfill_job(job_id, next_message_id=next_message_id, **progress)
+                
+                await asyncio.sleep(interval)
+            
+            if album:
+                progress['queued'] += await self.route(album, task, context, job)
+            await self.db.update_backfill_job(
+                job_id, status='done', next_message_id=job['to_message_id'] + 1, **progress
+            )
+            logger.logger.info(
+                f"اكتملت مهمة نسخ السجل {job_id}: {progress['queued']} رسالة أضيفت للطابور"
+            )
+        
+        except asyncio.CancelledError:
+            # حفظ نقطة الاستئناف (الألبوم غير المكتمل يُعاد جلبه)
+            await self.db.update_backfill_job(job_id, next_message_id=next_message_id, **progress)
+            raise
+        except Exception as e:
+            logger.log_error(e, {'function': 'run_job', 'backfill_job_id': job_id})
+            await self.db.update_backfill_job(
+                job_id, status='failed', last_error=str(e), next_message_id=next_message_id, **progress
+            )
+    
+    async def route(self, messages: List[Message], task: Dict[str, Any], context: CallbackContext,
+                    job: Dict[str, Any]) -> int:
+        """تمرير رسالة أو ألبوم عبر مسار المهمة في مسار نسخ السجل"""
+        filters_key = next(
+            (key for routed_task, key in self.forwarder.source_index.get(task['source_chat_id'], [])
+             if routed_task['id'] == task['id']),
+            None
+        )
+        if filters_key is None:
+            return 0
+        
+        if len(messages) > 1:
+            accepted = await self.forwarder.route_album_to_task(
+                messages, task, filters_key, {}, context,
+                backfill=True, check_duplicates=bool(job['check_duplicates'])
+            )
+        else:
+            accepted = await self.forwarder.route_message_to_task(
+                messages[0], task, filters_key, {}, context,
+                backfill=True, check_duplicates=bool(job['check_duplicates'])
+            )
+        return 1 if accepted else 0
+    
+    async def fetch_message(self, bot: Bot, source_chat: Dict[str, Any], message_id: int,
+                            staging_chat_id: int) -> Optional[Message]:
+        """قراءة رسالة قديمة من المصدر عبر توجيهها لدردشة وسيطة ثم حذفها"""
+        # واجهة البوت لا تسمح بقراءة السجل، لكن التوجيه بمعرف الرسالة يعيد محتواها كاملاً
+        while True:
+            await rate_limiter.acquire(bot.token, staging_chat_id)
+            try:
+                staged = await bot.forward_message(
+                    chat_id=staging_chat_id,
+                    from_chat_id=source_chat['id'],
+                    message_id=message_id,
+                    disable_notification=True
+                )
+                break
+            except RetryAfter as e:
+                retry_after = get_retry_after_seconds(e)
+                rate_limiter.report_retry_after(bot.token, staging_chat_id, retry_after)
+                await asyncio.sleep(retry_after)
+            except BadRequest:
+                # رسالة محذوفة أو رسالة خدمة لا يمكن توجيهها
+                return None
+        
+        try:
+            await bot.delete_message(chat_id=staging_chat_id, message_id=staged.message_id)
+        except Exception:
+            pass  # بقاء النسخة الوسيطة لا يؤثر على النسخ
+        
+        return Message.de_json(self.restore_source_message(staged.to_dict(), source_chat, message_id), bot)
+    
+    @staticmethod
+    def is_source_origin(origin: Dict[str, Any], source_chat: Dict[str, Any], message_id: int) -> bool:
+        """هل مصدر التوجيه هو رسالة المصدر نفسها (أي أنها لم تكن معاد توجيهها)"""
+        origin_type = origin.get('type')
+        if origin_type == 'channel':
+            return origin.get('chat', {}).get('id') == source_chat['id'] and origin.get('message_id') == message_id
+        if origin_type == 'chat':
+            return origin.get('sender_chat', {}).get('id') == source_chat['id']
+        # في المجموعات: المرسل الأصلي لرسالة عادية (لا يمكن تمييزه عن رسالة معاد توجيهها من مستخدم)
+        return origin_type in ('user', 'hidden_user')
+    
+    def restore_source_message(self, data: Dict[str, Any], source_chat: Dict[str, Any],
+                               message_id: int) -> Dict[str, Any]:
+        """إعادة بناء الرسالة كما في المصدر بحذف ما أضافته النسخة الوسيطة فقط"""
+        origin = data.get('forward_origin') or {}
+        data['chat'] = source_chat
+        data['message_id'] = message_id
+        data.pop('from', None)  # مرسل النسخة الوسيطة هو البوت
+        
+        if not self.is_source_origin(origin, source_chat, message_id):
+            # الرسالة معاد توجيهها في المصدر: حقول التوجيه حقولها الأصلية وتبقى للفلاتر
+            # (تاريخ رسالة المصدر نفسها لا تكشفه واجهة البوت، فيبقى تاريخ الجلب)
+            return data
+        
+        for field in FORWARD_FIELDS:
+            data.pop(field, None)
+        data['date'] = origin.get('date', data.get('date'))
+        
+        # المرسل الأصلي في المصدر
+        if origin.get('sender_user'):
+            data['from'] = origin['sender_user']
+        elif origin.get('sender_chat') or origin.get('chat'):
+            data['sender_chat'] = origin.get('sender_chat') or origin['chat']
+        if origin.get('author_signature'):
+            data['author_signature'] = origin['author_signature']
+        return data
+    
+    async def get_jobs(self, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """مهام النسخ الأخيرة"""
+        jobs = await self.db.get_backfill_jobs(user_id=user_id)
+        for job in jobs:
+            job['is_running'] = job['id'] in self.jobs
+        return jobs
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات نسخ السجل"""
+        return {'running_jobs': len(self.jobs)}
@@ -0,0 +1,148 @@
+"""
+استهلاك التحديثات المتراكمة بعد إعادة التشغيل
+Startup Catch-Up Mode
+"""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+from telegram import Bot, Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+from services.rate_limiter import TokenBucket
+from utils.logger import BotLogger
+
+logger = BotLogger()
+
+class CatchUpMonitor:
+    """تمرير التحديثات المتراكمة أثناء التوقف بمعدل محدود مع تجاهل ما تجاوز عمر محدد"""
+    
+    NORMAL = 'normal'
+    CATCHING_UP = 'catching_up'
+    
+    FRESH_UPDATE_SECONDS = 5  # التحديث الأحدث من هذا يعني أن التراكم انتهى
+    PROGRESS_LOG_INTERVAL = 10
+    RATE_SMOOTHING = 0.2
+    
+    def __init__(self, max_age_minutes: int, rate_per_second: float):
+        self.max_age_seconds = max_age_minutes * 60
+        self.bucket = TokenBucket(max(rate_per_second, 1.0), max(rate_per_second, 1.0))
+        self.mode = self.NORMAL
+        self.backlog = 0
+        self.started_at = 0.0
+        self.last_log = 0.0
+        self.rate = 0.0  # تحديثات/ثانية (متوسط متحرك)
+        self.rate_window_start = 0.0
+        self.rate_window_count = 0
+        self.stats = {
+            'processed': 0,
+            'dropped_stale': 0,
+            'duration_seconds': 0.0
+        }
+    
+    async def start(self, bot: Bot):
+        """قراءة حجم التراكم من تلغرام وبدء وضع اللحاق إذا وُجد"""
+        try:
+            webhook_info = await bot.get_webhook_info()
+            self.backlog = webhook_info.pending_update_count
+        except Exception as e:
+            logger.log_error(e, {'function': 'catch_up.start'})
+            return
+        
+        if self.backlog > 0:
+            self.mode = self.CATCHING_UP
+            self.started_at = self.last_log = self.rate_window_start = time.monotonic()
+            logger.logger.info(
+                f"⏩ وضع اللحاق: {self.backlog} تحديث متراكم أثناء التوقف "
+                f"(تجاهل ما هو أقدم من {self.max_age_seconds // 60} دقيقة)"
+            )
+    
+    @property
+    def is_catching_up(self) -> bool:
+        """هل ما زال التراكم قيد الاستهلاك"""
+        return self.mode == self.CATCHING_UP
+    
+    def get_update_age(self, update: Update) -> Optional[float]:
+        """عمر التحديث بالثواني حسب تاريخ رسالته"""
+        message = update.effective_message
+        if not message:
+            return None
+        sent_at = message.edit_date or message.date
+        return (datetime.now(timezone.utc) - sent_at).total_seconds()
+    
+    async def observe_update(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """يُستدعى قبل جميع المعالجات: تحديد المعدل وتجاهل التحديثات القديمة أثناء اللحاق"""
+        if not self.is_catching_up:
+            return
+        
+        age = self.get_update_age(update)
+        if age is not None and age <= self.FRESH_UPDATE_SECONDS:
+            # وصل تحديث حي: لم يبق تراكم قبله
+            self.finish()
+            return
+        
+        self.record_processed()
+        
+        if age is not None and self.max_age_seconds > 0 and age > self.max_age_seconds:
+            self.stats['dropped_stale'] += 1
+            raise ApplicationHandlerStop
+        
+        # معدل مرتفع لكن محدود حتى لا يُغرق طابور التوجيه وحدود الإرسال
+        while True:
+            wait = self.bucket.wait_time(time.monotonic())
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+        self.bucket.consume()
+        
+        if self.stats['processed'] >= self.backlog:
+            self.finish()
+    
+    def record_processed(self):
+        """تحديث العداد ومعدل الاستهلاك وتسجيل التقدم دورياً"""
+        self.stats['processed'] += 1
+        self.rate_window_count += 1
+        now = time.monotonic()
+        
+        window = now - self.rate_window_start
+        if window >= 1:
+            current = self.rate_window_count / window
+            self.rate = current if not self.rate else (
+                self.RATE_SMOOTHING * current + (1 - self.RATE_SMOOTHING) * self.rate
+            )
+            self.rate_window_start = now
+            self.rate_window_count = 0
+        
+        if now - self.last_log >= self.PROGRESS_LOG_INTERVAL:
+            self.last_log = now
+            eta = self.get_eta_seconds()
+            progress = f"⏩ اللحاق: {self.stats['processed']}/{self.backlog} تحديث"
+            if eta is not None:
+                progress += f" ({self.rate:.1f}/ث، المتبقي ~{eta:.0f} ث)"
+            logger.logger.info(progress)
+    
+    def get_eta_seconds(self) -> Optional[float]:
+        """الوقت المتوقع لاستهلاك باقي التراكم"""
+        if not self.is_catching_up or not self.rate:
+            return None
+        return max(0, self.backlog - self.stats['processed']) / self.rate
+    
+    def finish(self):
+        """العودة للوضع العادي"""
+        self.mode = self.NORMAL
+        self.stats['duration_seconds'] = time.monotonic() - self.started_at
+        logger.logger.info(
+            f"✅ انتهى وضع اللحاق: {self.stats['processed']} تحديث في "
+            f"{self.stats['duration_seconds']:.0f} ث ({self.stats['dropped_stale']} تم تجاهلها لقدمها)"
+        )
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات وضع اللحاق"""
+        return {
+            **self.stats,
+            'mode': self.mode,
+            'backlog': self.backlog,
+            'remaining': max(0, self.backlog - self.stats['processed']) if self.is_catching_up else 0,
+            'rate_per_second': self.rate,
+            'eta_seconds': self.get_eta_seconds()
+        }
@@ -0,0 +1,147 @@
+"""
+قاطع الدائرة للأهداف المتعطلة
+Per-Target Circuit Breaker
+"""
+
+import time
+from typing import Dict, Any, Optional, Tuple
+from telegram.error import TelegramError, Forbidden, BadRequest
+
+# أخطاء الطلب التي تعني أن الهدف نفسه غير متاح للبوت وليس الرسالة
+TARGET_UNAVAILABLE_ERRORS = (
+    'chat not found',
+    'chat_write_forbidden',
+    'have no rights to send',
+    'not enough rights',
+    'need administrator rights',
+    'chat_admin_required',
+    'bot was kicked',
+    'peer_id_invalid'
+)
+
+def is_target_unavailable(error: TelegramError) -> bool:
+    """فحص إذا كان الخطأ يعني أن البوت فقد الوصول للهدف"""
+    if isinstance(error, Forbidden):
+        return True
+    if isinstance(error, BadRequest):
+        message = str(error).lower()
+        return any(fragment in message for fragment in TARGET_UNAVAILABLE_ERRORS)
+    return False
+
+class TargetCircuit:
+    """حالة الدائرة لهدف واحد"""
+    
+    def __init__(self):
+        self.state = TargetCircuitBreaker.CLOSED
+        self.failures = 0  # أخطاء متتالية
+        self.opened_count = 0  # مرات الفتح المتتالية (لمضاعفة مهلة التهدئة)
+        self.retry_at = 0.0
+        self.probe_in_flight = False
+        self.last_error = None
+        self.rejected = 0
+
+class TargetCircuitBreaker:
+    """قاطع دائرة لكل (بوت، هدف): يوقف الإرسال للأهداف المحظورة ثم يختبرها بعد مهلة"""
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    FAILURE_THRESHOLD = 3  # أخطاء متتالية قبل فتح الدائرة
+    BASE_COOLDOWN_SECONDS = 600
+    MAX_COOLDOWN_SECONDS = 6 * 3600
+    
+    def __init__(self):
+        self.circuits: Dict[Tuple[str, int], TargetCircuit] = {}
+        self.stats = {
+            'opened': 0,
+            'closed': 0,
+            'probes': 0,
+            'rejected': 0
+        }
+    
+    def allow(self, bot_token: str, chat_id: int) -> bool:
+        """فحص إذا كان مسموحاً بالإرسال للهدف الآن"""
+        circuit = self.circuits.get((bot_token, chat_id))
+        if circuit is None or circuit.state == self.CLOSED:
+            return True
+        
+        if circuit.state == self.OPEN and time.monotonic() >= circuit.retry_at:
+            # انتهت التهدئة: السماح بطلب اختبار واحد
+            circuit.state = self.HALF_OPEN
+        
+        if circuit.state == self.HALF_OPEN and not circuit.probe_in_flight:
+            circuit.probe_in_flight = True
+            self.stats['probes'] += 1
+            return True
+        
+        circuit.rejected += 1
+        self.stats['rejected'] += 1
+        return False
+    
+    def record_success(self, bot_token: str, chat_id: int) -> Optional[str]:
+        """تسجيل إرسال ناجح وإرجاع CLOSED إذا أُغلقت دائرة كانت مفتوحة"""
+        circuit = self.circuits.pop((bot_token, chat_id), None)
+        if circuit is None or circuit.state == self.CLOSED:
+            return None
+        
+        self.stats['closed'] += 1
+        return self.CLOSED
+    
+    def record_failure(self, bot_token: str, chat_id: int, error: TelegramError) -> Optional[str]:
+        """تسجيل خطأ هدف غير متاح وإرجاع OPEN إذا فُتحت الدائرة الآن"""
+        key = (bot_token, chat_id)
+        circuit = self.circuits.get(key)
+        if circuit is None:
+            circuit = self.circuits[key] = TargetCircuit()
+        
+        circuit.failures += 1
+        circuit.last_error = str(error)
+        
+        if circuit.state == self.OPEN:
+            # طلبات أُرسلت قبل فتح الدائرة: تُعد فقط ولا تضاعف مهلة التهدئة
+            return None
+        
+        circuit.probe_in_flight = False
+        if circuit.state == self.HALF_OPEN or circuit.failures >= self.FAILURE_THRESHOLD:
+            was_closed = circuit.state == self.CLOSED
+            cooldown = min(self.BASE_COOLDOWN_SECONDS * 2 ** circuit.opened_count, self.MAX_COOLDOWN_SECONDS)
+            circuit.state = self.OPEN
+            circuit.opened_count += 1
+            circuit.retry_at = time.monotonic() + cooldown
+            
+            if was_closed:
+                self.stats['opened'] += 1
+                return self.OPEN
+        
+        return None
+    
+    def release(self, bot_token: str, chat_id: int):
+        """إنهاء طلب اختبار انتهى بخطأ لا يخص توفر الهدف (يُسمح باختبار جديد)"""
+        circuit = self.circuits.get((bot_token, chat_id))
+        if circuit:
+            circuit.probe_in_flight = False
+    
+    def get_state(self, bot_token: str, chat_id: int) -> str:
+        """حالة دائرة الهدف"""
+        circuit = self.circuits.get((bot_token, chat_id))
+        return circuit.state if circuit else self.CLOSED
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات قاطع الدائرة"""
+        now = time.monotonic()
+        return {
+            **self.stats,
+            'open_targets': [
+                {
+                    'chat_id': chat_id,
+                    'state': circuit.state,
+                    'failures': circuit.failures,
+                    'rejected': circuit.rejected,
+                    'retry_in_seconds': max(0.0, circuit.retry_at - now),
+                    'last_error': circuit.last_error
+                }
+                for (_, chat_id), circuit in self.circuits.items()
+                if circuit.state != self.CLOSED
+            ]
+        }
@@ -0,0 +1,167 @@
+"""
+كشف تكرار الرسائل
+Message Deduplication
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+from telegram import Message
+
+class MessageDeduplicator:
+    """ذاكرة LRU محدودة الحجم لجميع المهام لكشف الرسائل المُعالجة مسبقاً"""
+    
+    DEFAULT_MAX_ENTRIES = 100000  # الحد الأقصى الإجمالي للمفاتيح المحفوظة لجميع المهام
+    
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        # (المهمة، الدردشة، الرسالة) بترتيب آخر استخدام
+        self.entries: "OrderedDict[Tuple[int, int, int], None]" = OrderedDict()
+        self.stats = {
+            'lookups': 0,
+            'hits': 0,
+            'evictions': 0
+        }
+    
+    def check_and_add(self, task_id: int, chat_id: int, message_id: int) -> bool:
+        """فحص إذا كانت الرسالة مكررة وتسجيلها إن لم تكن كذلك"""
+        key = (task_id, chat_id, message_id)
+        self.stats['lookups'] += 1
+        
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return True
+        
+        self.entries[key] = None
+        if len(self.entries) > self.max_entries:
+            # إزالة الأقدم استخداماً، والمهام المحذوفة تخرج تلقائياً مع الوقت
+            self.entries.popitem(last=False)
+            self.stats['evictions'] += 1
+        
+        return False
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات كشف التكرار"""
+        lookups = self.stats['lookups']
+        return {
+            **self.stats,
+            'size': len(self.entries),
+            'max_entries': self.max_entries,
+            'hit_rate': self.stats['hits'] / lookups if lookups else 0.0
+        }
+
+class ContentDeduplicator:
+    """كشف المحتوى المكرر لكل هدف عبر المصادر خلال نافذة زمنية"""
+    
+    NUM_BUCKETS = 6
+    MAX_BUCKET_ENTRIES = 50000  # حد كل دلو (~5MB) حتى لا تنمو الذاكرة مع ضغط الرسائل
+    
+    def __init__(self, window_seconds: float):
+        # النافذة مقسمة لدلاء زمنية: تجزئة (الهدف، البصمة) -> المصدر الذي أرسلها أولاً
+        self.window_seconds = window_seconds
+        self.bucket_span = max(window_seconds, 1) / self.NUM_BUCKETS
+        self.buckets: List[Dict[int, int]] = [{} for _ in range(self.NUM_BUCKETS)]
+        self.epoch = int(time.time() // self.bucket_span)
+        self.stats = {
+            'checks': 0,
+            'duplicates': 0,
+            'added': 0,
+            'discarded': 0,
+            'overflow': 0
+        }
+    
+    @property
+    def enabled(self) -> bool:
+        """النافذة الصفرية تعطل الفحص"""
+        return self.window_seconds > 0
+    
+    @staticmethod
+    def get_key(target_chat_id: int, fingerprint: str) -> int:
+        """تجزئة 64 بت للهدف والبصمة (أصغر من حفظ البصمة كاملة)"""
+        digest = hashlib.blake2b(f"{target_chat_id}:{fingerprint}".encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'little')
+    
+    def rotate(self):
+        """تفريغ الدلاء التي خرجت من النافذة الزمنية"""
+        epoch = int(time.time() // self.bucket_span)
+        expired = min(epoch - self.epoch, self.NUM_BUCKETS)
+        for offset in range(1, expired + 1):
+            self.buckets[(self.epoch + offset) % self.NUM_BUCKETS].clear()
+        self.epoch = max(self.epoch, epoch)
+    
+    def find_source(self, key: int) -> Optional[int]:
+        """المصدر المسجل للمحتوى في النافذة"""
+        for bucket in self.buckets:
+            source_chat_id = bucket.get(key)
+            if source_chat_id is not None:
+                return source_chat_id
+        return None
+    
+    def check_and_add(self, target_chat_id: int, fingerprint: str, source_chat_id: int) -> bool:
+        """فحص إذا وصل نفس المحتوى لهذا الهدف من مصدر آخر، وإلا تسجيله باسم هذا المصدر (خطوة واحدة)"""
+        self.rotate()
+        self.stats['checks'] += 1
+        
+        key = self.get_key(target_chat_id, fingerprint)
+        recorded_source = self.find_source(key)
+        if recorded_source is None:
+            bucket = self.buckets[self.epoch % self.NUM_BUCKETS]
+            if len(bucket) < self.MAX_BUCKET_ENTRIES:
+                bucket[key] = source_chat_id
+                self.stats['added'] += 1
+            else:
+                self.stats['overflow'] += 1
+            return False
+        
+        # إعادة النشر من نفس المصدر ليست تكراراً عبر المصادر
+        if recorded_source != source_chat_id:
+            self.stats['duplicates'] += 1
+            return True
+        return False
+    
+    def discard(self, target_chat_id: int, fingerprint: str, source_chat_id: int):
+        """إلغاء تسجيل محتوى فشل إرساله حتى لا يمنع نسخته من مصدر آخر"""
+        key = self.get_key(target_chat_id, fingerprint)
+        for bucket in self.buckets:
+            if bucket.get(key) == source_chat_id:
+                del bucket[key]
+                self.stats['discarded'] += 1
+                return
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات كشف المحتوى المكرر"""
+        return {
+            **self.stats,
+            'window_seconds': self.window_seconds,
+            'bucket_items': [len(bucket) for bucket in self.buckets]
+        }
+
+def get_text_hash(text: str) -> str:
+    """تجزئة النص بعد تطبيع بسيط: تجاهل حالة الأحرف والمسافات الزائدة"""
+    normalized = ' '.join(text.casefold().split())
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+def get_content_fingerprint(messages: List[Message]) -> Optional[str]:
+    """بصمة محتوى الرسالة (أو الألبوم): معرف الملف الفريد للوسائط مع تعليقها وتجزئة النص المُطبّع"""
+    parts = []
+    
+    for message in messages:
+        media = (
+            (message.photo[-1] if message.photo else None) or message.video or message.document
+            or message.audio or message.voice or message.animation or message.sticker or message.video_note
+        )
+        if media:
+            # نفس الوسائط بتعليق مختلف محتوى مختلف
+            caption = f":{get_text_hash(message.caption)}" if message.caption else ""
+            parts.append(f"m:{media.file_unique_id}{caption}")
+            continue
+        
+        text = message.text or message.caption
+        if text:
+            parts.append(f"t:{get_text_hash(text)}")
+    
+    if not parts:
+        return None
+    return '|'.join(parts)
@@ -0,0 +1,84 @@
+"""
+مرحلة التأخير المجدول للرسائل
+Delayed Delivery Stage
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Dict, List, Any, Callable, Awaitable, Hashable, Tuple
+from utils.logger import BotLogger
+
+logger = BotLogger()
+
+class DelayQueue:
+    """كومة أوقات استحقاق تطلق العناصر المؤجلة دون حجز أي عامل أثناء الانتظار"""
+    
+    def __init__(self, release_callback: Callable[[Hashable, Dict[str, Any]], Awaitable[Any]]):
+        self.release_callback = release_callback
+        self.heap: List[Tuple[float, int, Hashable, Dict[str, Any]]] = []  # (وقت الاستحقاق، ترتيب، المفتاح، العنصر)
+        self.sequence = itertools.count()  # يحفظ ترتيب الإدخال للعناصر ذات وقت الاستحقاق نفسه
+        self.wakeup = asyncio.Event()
+        self.timer = None
+        self.is_running = False
+        self.stats = {
+            'scheduled': 0,
+            'released': 0,
+            'max_lateness_seconds': 0.0
+        }
+    
+    async def start(self):
+        """تشغيل المؤقت"""
+        if not self.is_running:
+            self.is_running = True
+            self.timer = asyncio.create_task(self.run_timer())
+    
+    async def stop(self):
+        """إيقاف المؤقت"""
+        self.is_running = False
+        self.wakeup.set()
+        if self.timer:
+            await asyncio.gather(self.timer, return_exceptions=True)
+            self.timer = None
+    
+    async def schedule(self, delay: float, key: Hashable, item: Dict[str, Any]):
+        """جدولة عنصر ليُطلق بعد مدة محددة"""
+        due_at = time.monotonic() + delay
+        heapq.heappush(self.heap, (due_at, next(self.sequence), key, item))
+        self.stats['scheduled'] += 1
+        
+        # إيقاظ المؤقت فقط إذا أصبح العنصر الجديد هو الأقرب استحقاقاً
+        if self.heap[0][0] == due_at:
+            self.wakeup.set()
+    
+    async def run_timer(self):
+        """انتظار أقرب وقت استحقاق ثم إطلاق جميع العناصر المستحقة"""
+        while self.is_running:
+            try:
+                now = time.monotonic()
+                
+                while self.heap and self.heap[0][0] <= now:
+                    due_at, _, key, item = heapq.heappop(self.heap)
+                    self.stats['released'] += 1
+                    self.stats['max_lateness_seconds'] = max(self.stats['max_lateness_seconds'], now - due_at)
+                    await self.release_callback(key, item)
+                
+                timeout = self.heap[0][0] - time.monotonic() if self.heap else None
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+            
+            except Exception as e:
+                logger.log_error(e, {'function': 'run_timer'})
+                await asyncio.sleep(1)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات مرحلة التأخير"""
+        return {
+            **self.stats,
+            'pending': len(self.heap),
+            'next_due_in_seconds': max(0.0, self.heap[0][0] - time.monotonic()) if self.heap else None
+        }
@@ -6,11 +6,22 @@ Advanced Filter Manager
 import re
 import json
 import asyncio
+from collections import Counter
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Tuple
 from telegram import Message, User, Chat
 from database.db_manager import DatabaseManager
 from utils.helpers import TextProcessor
+from utils.keyword_matcher import keyword_matchers
+from utils.domain_matcher import DomainMatcher, domain_matchers
+from utils.pattern_cache import pattern_cache
+from filters.message_features import (
+    message_features, extract_domain, get_script_counts, get_language, URL_PATTERN
+)
+from filters.filter_compiler import (
+    FilterPredicate, CompiledFilter, CompiledFilterCache,
+    COST_CHEAP, COST_TEXT, COST_REGEX, COST_DATABASE, COST_NETWORK
+)
 from utils.logger import BotLogger
 
 logger = BotLogger()
@@ -20,40 +31,94 @@ class AdvancedFilterManager:
     
     def __init__(self, db: DatabaseManager):
         self.db = db
-        self.filter_cache = {}
+        self.filter_cache = pattern_cache  # الأنماط المجمعة مشتركة بين مديري الفلاتر
         self.user_message_history = {}  # تتبع تاريخ رسائل المستخدمين
         self.spam_detection = SpamDetector()
         self.content_analyzer = ContentAnalyzer()
+        self.short_url_domains = DomainMatcher(['bit.ly', 'tinyurl.com', 't.co', 'goo.gl', 'ow.ly'])
+        self.dangerous_domains = DomainMatcher([
+            'malware.com', 'phishing.net', 'spam.org',
+            'virus.info', 'scam.biz'
+        ])
+        self.compiled_filters = CompiledFilterCache()  # فلاتر كل مهمة مجمعة حسب إصدارها
+        self.filter_methods = {
+            'media_type': self.filter_media_type,
+            'text_content': self.filter_text_content,
+            'user_restrictions': self.filter_user_restrictions,
+            'time_based': self.filter_time_based,
+            'size_limits': self.filter_size_limits,
+            'language_detection': self.filter_language,
+            'sentiment_analysis': self.filter_sentiment,
+            'duplicate_detection': self.filter_duplicates,
+            'link_analysis': self.filter_links,
+            'forwarded_restrictions': self.filter_forwarded
+        }
+    
+    @staticmethod
+    def get_filter_cost(filter_name: str, config: Dict[str, Any]) -> float:
+        """التكلفة التقديرية لفلتر حسب نوعه وإعداداته"""
+        if filter_name == 'text_content':
+            return COST_REGEX if config.get('regex_patterns') else COST_TEXT
+        if filter_name == 'link_analysis':
+            return COST_NETWORK if config.get('check_url_safety') else COST_TEXT
+        if filter_name == 'user_restrictions':
+            return COST_DATABASE if config.get('verified_only') else COST_CHEAP
+        if filter_name == 'duplicate_detection':
+            return COST_DATABASE
+        if filter_name in ('language_detection', 'sentiment_analysis'):
+            return COST_TEXT
+        return COST_CHEAP
+    
+    def compile_filters(self, task_filters: Dict[str, Any]) -> CompiledFilter:
+        """تجميع الفلاتر العامة وفلاتر المهمة المفعلة إلى فحوصات مرتبة حسب التكلفة"""
+        async def check_global_ban(message: Message) -> Tuple[bool, str]:
+            return not await self.check_global_ban(message), "المستخدم محظور عالمياً"
+        
+        async def check_spam(message: Message) -> Tuple[bool, str]:
+            return not await self.spam_detection.is_spam(message, self.user_message_history), "رسالة سبام"
+        
+        async def check_forbidden_content(message: Message) -> Tuple[bool, str]:
+            return not await self.content_analyzer.has_forbidden_content(message), "محتوى محظور"
+        
+        predicates = [
+            FilterPredicate('global_ban', check_global_ban, COST_DATABASE),
+            FilterPredicate('spam', check_spam, COST_REGEX),
+            FilterPredicate('forbidden_content', check_forbidden_content, COST_TEXT)
+        ]
+        
+        for filter_name, filter_config in task_filters.items():
+            method = self.filter_methods.get(filter_name)
+            if method is None or not filter_config.get('enabled', False):
+                continue
+            predicates.append(FilterPredicate(
+                filter_name,
+                self.bind_filter(filter_name, method, filter_config),
+                self.get_filter_cost(filter_name, filter_config)
+            ))
+        return CompiledFilter(predicates)
     
-    async def apply_filters(self, message: Message, task_filters: Dict[str, Any]) -> Tuple[bool, str]:
-        """تطبيق جميع الفلاتر على الرسالة"""
+    @staticmethod
+    def bind_filter(filter_name: str, method, config: Dict[str, Any]):
+        """ربط فلتر المهمة بإعداداته مع إضافة اسمه لسبب الرفض"""
+        async def check(message: Message) -> Tuple[bool, str]:
+            result, reason = await method(message, config)
+            return result, f"فلتر {filter_name}: {reason}"
+        return check
+    
+    async def apply_filters(self, message: Message, task_filters: Dict[str, Any],
+                            task_id: Optional[int] = None, task_version: int = 0) -> Tuple[bool, str]:
+        """تطبيق جميع الفلاتر على الرسالة (الأرخص والأكثر رفضاً أولاً)"""
         try:
-            # فلتر الحظر العام
-            if await self.check_global_ban(message):
-                return False, "المستخدم محظور عالمياً"
-            
-            # فلتر السبام
-            if await self.spam_detection.is_spam(message, self.user_message_history):
-                return False, "رسالة سبام"
-            
-            # فلتر المحتوى المحظور
-            if await self.content_analyzer.has_forbidden_content(message):
-                return False, "محتوى محظور"
-            
-            # فلاتر المهمة المخصصة
-            for filter_name, filter_config in task_filters.items():
-                if not filter_config.get('enabled', False):
-                    continue
-                
-                result, reason = await self.apply_single_filter(message, filter_name, filter_config)
-                if not result:
-                    return False, f"فلتر {filter_name}: {reason}"
+            compiled = self.compiled_filters.get(task_id, task_version, task_filters, self.compile_filters)
+            accepted, reason = await compiled.evaluate(message)
+            if not accepted:
+                return False, reason
             
             # تحديث تاريخ الرسائل
             await self.update_message_history(message)
             
             return True, "تم قبول الرسالة"
-            
+        
         except Exception as e:
             logger.log_error(e, {
                 'function': 'apply_filters',
@@ -65,36 +130,18 @@ class AdvancedFilterManager:
     async def apply_single_filter(self, message: Message, filter_name: str, 
                                  filter_config: Dict[str, Any]) -> Tuple[bool, str]:
         """تطبيق فلتر واحد"""
-        
-        if filter_name == 'media_type':
-            return await self.filter_media_type(message, filter_config)
-        elif filter_name == 'text_content':
-            return await self.filter_text_content(message, filter_config)
-        elif filter_name == 'user_restrictions':
-            return await self.filter_user_restrictions(message, filter_config)
-        elif filter_name == 'time_based':
-            return await self.filter_time_based(message, filter_config)
-        elif filter_name == 'size_limits':
-            return await self.filter_size_limits(message, filter_config)
-        elif filter_name == 'language_detection':
-            return await self.filter_language(message, filter_config)
-        elif filter_name == 'sentiment_analysis':
-            return await self.filter_sentiment(message, filter_config)
-        elif filter_name == 'duplicate_detection':
-            return await self.filter_duplicates(message, filter_config)
-        elif filter_name == 'link_analysis':
-            return await self.filter_links(message, filter_config)
-        elif filter_name == 'forwarded_restrictions':
-            return await self.filter_forwarded(message, filter_config)
-        else:
+        method = self.filter_methods.get(filter_name)
+        if method is None:
             return True, "فلتر غير معروف"
+        return await method(message, filter_config)
     
     async def filter_media_type(self, message: Message, config: Dict[str, Any]) -> Tuple[bool, str]:
         """فلتر نوع الوسائط"""
         allowed_types = config.get('allowed_types', [])
         blocked_types = config.get('blocked_types', [])
         
-        message_type = self.get_message_type(message)
+        features = message_features.get(message)
+        message_type = features.type
         
         # فحص الأنواع المحظورة
         if blocked_types and message_type in blocked_types:
@@ -107,14 +154,14 @@ class AdvancedFilterManager:
         # فلتر حجم الملف
         max_file_size = config.get('max_file_size_mb', 0)
         if max_file_size > 0:
-            file_size = self.get_file_size(message)
+            file_size = features.file_size
             if file_size > max_file_size * 1024 * 1024:
                 return False, f"حجم الملف كبير جداً: {file_size / (1024*1024):.1f}MB"
         
         # فلتر مدة الوسائط
         max_duration = config.get('max_duration_seconds', 0)
         if max_duration > 0:
-            duration = self.get_media_duration(message)
+            duration = features.duration
             if duration > max_duration:
                 return False, f"مدة الوسائط طويلة جداً: {duration}s"
         
@@ -122,29 +169,22 @@ class AdvancedFilterManager:
     
     async def filter_text_content(self, message: Message, config: Dict[str, Any]) -> Tuple[bool, str]:
         """فلتر محتوى النص"""
-        text = message.text or message.caption or ""
+        features = message_features.get(message)
+        text = features.text
         if not text:
             return True, "لا يوجد نص"
         
-        # فلتر الكلمات المحظورة
+        # فلتر الكلمات المحظورة (مرور واحد على النص لجميع الكلمات)
         banned_words = config.get('banned_words', [])
         if banned_words:
-            text_lower = text.lower()
-            for word in banned_words:
-                if word.lower() in text_lower:
-                    return False, f"كلمة محظورة: {word}"
+            banned_word = keyword_matchers.get(banned_words).search(features.normalized_text, is_folded=True)
+            if banned_word:
+                return False, f"كلمة محظورة: {banned_word}"
         
-        # فلتر الكلمات المطلوبة
+        # فلتر الكلمات المطلوبة (تكفي واحدة منها)
         required_words = config.get('required_words', [])
-        if required_words:
-            text_lower = text.lower()
-            found_required = False
-            for word in required_words:
-                if word.lower() in text_lower:
-                    found_required = True
-                    break
-            if not found_required:
-                return False, "لا يحتوي على كلمات مطلوبة"
+        if required_words and not keyword_matchers.get(required_words).search(features.normalized_text, is_folded=True):
+            return False, "لا يحتوي على كلمات مطلوبة"
         
         # فلتر طول النص
         min_length = config.get('min_length', 0)
@@ -162,21 +202,23 @@ class AdvancedFilterManager:
             pattern = pattern_config.get('pattern', '')
             action = pattern_config.get('action', 'block')  # block or require
             
-            try:
-                match = re.search(pattern, text, re.IGNORECASE)
-                if action == 'block' and match:
-                    return False, f"نمط محظور: {pattern}"
-                elif action == 'require' and not match:
-                    return False, f"نمط مطلوب غير موجود: {pattern}"
-            except re.error:
+            match = await self.filter_cache.search(pattern, text, re.IGNORECASE)
+            if match is None:
+                # نمط معطل لتكلفته: الحظر لا يُتجاوز بصمت (يُحجب النص حتى يُصلح النمط)
+                if action == 'block':
+                    return False, f"نمط محظور معطل لتكلفته: {pattern}"
                 continue
+            if action == 'block' and match:
+                return False, f"نمط محظور: {pattern}"
+            elif action == 'require' and not match:
+                return False, f"نمط مطلوب غير موجود: {pattern}"
         
         # فلتر تكرار الأحرف
         max_char_repeat = config.get('max_char_repeat', 0)
         if max_char_repeat > 0:
-            for char in text:
-                if text.count(char) > max_char_repeat:
-                    return False, f"تكرار مفرط للحرف: {char}"
+            char, count = features.most_repeated_char
+            if count > max_char_repeat:
+                return False, f"تكرار مفرط للحرف: {char}"
         
         return True, "محتوى النص مقبول"
     
@@ -260,17 +302,19 @@ class AdvancedFilterManager:
     
     async def filter_size_limits(self, message: Message, config: Dict[str, Any]) -> Tuple[bool, str]:
         """فلتر حدود الحجم"""
+        features = message_features.get(message)
+        
         # حد حجم النص
         max_text_length = config.get('max_text_length', 0)
         if max_text_length > 0:
-            text = message.text or message.caption or ""
+            text = features.text
             if len(text) > max_text_length:
                 return False, f"النص طويل جداً: {len(text)} > {max_text_length}"
         
         # حد حجم الملف
         max_file_size = config.get('max_file_size_mb', 0)
         if max_file_size > 0:
-            file_size = self.get_file_size(message)
+            file_size = features.file_size
             max_size_bytes = max_file_size * 1024 * 1024
             if file_size > max_size_bytes:
                 return False, f"الملف كبير جداً: {file_size / (1024*1024):.1f}MB"
@@ -278,7 +322,7 @@ class AdvancedFilterManager:
         # حد أبعاد الصورة/الفيديو
         max_resolution = config.get('max_resolution', {})
         if max_resolution:
-            width, height = self.get_media_dimensions(message)
+            width, height = features.dimensions
             max_width = max_resolution.get('width', 0)
             max_height = max_resolution.get('height', 0)
             
@@ -292,15 +336,15 @@ class AdvancedFilterManager:
     
     async def filter_language(self, message: Message, config: Dict[str, Any]) -> Tuple[bool, str]:
         """فلتر اللغة"""
-        text = message.text or message.caption or ""
-        if not text:
+        features = message_features.get(message)
+        if not features.text:
             return True, "لا يوجد نص"
         
         required_language = config.get('required_language', '')
         if not required_language:
             return True, "لا يوجد قيد لغوي"
         
-        detected_language = self.detect_language(text)
+        detected_language = features.language
         
         if detected_language != required_language:
             return False, f"لغة غير مطلوبة: {detected_language} != {required_language}"
@@ -350,12 +394,13 @@ class AdvancedFilterManager:
     
     async def filter_links(self, message: Message, config: Dict[str, Any]) -> Tuple[bool, str]:
         """فلتر الروابط المتقدم"""
-        text = message.text or message.caption or ""
-        if not text:
+        features = message_features.get(message)
+        if not features.text:
             return True, "لا يوجد نص"
         
-        # استخراج الروابط
-        urls = self.extract_urls(text)
+        # الروابط ودوميناتها مستخرجة مرة واحدة للرسالة
+        urls = features.urls
+        domains = features.domains
         
         if not urls:
             if config.get('require_links', False):
@@ -368,38 +413,38 @@ class AdvancedFilterManager:
         
         # فحص الدومينات المحظورة
         banned_domains = config.get('banned_domains', [])
-        for url in urls:
-            domain = self.extract_domain(url)
-            if domain in banned_domains:
-                return False, f"دومين محظور: {domain}"
+        if banned_domains:
+            banned = domain_matchers.get(banned_domains)
+            for domain in domains:
+                if domain in banned:
+                    return False, f"دومين محظور: {domain}"
         
         # فحص الدومينات المسموحة
         allowed_domains = config.get('allowed_domains', [])
         if allowed_domains:
-            for url in urls:
-                domain = self.extract_domain(url)
-                if domain not in allowed_domains:
+            allowed = domain_matchers.get(allowed_domains)
+            for domain in domains:
+                if domain not in allowed:
                     return False, f"دومين غير مسموح: {domain}"
         
         # فحص الروابط المختصرة
         if config.get('block_shortened_urls', False):
-            short_url_domains = ['bit.ly', 'tinyurl.com', 't.co', 'goo.gl', 'ow.ly']
-            for url in urls:
-                domain = self.extract_domain(url)
-                if domain in short_url_domains:
+            for domain in domains:
+                if domain in self.short_url_domains:
                     return False, f"رابط مختصر محظور: {domain}"
         
         # فحص أمان الروابط
         if config.get('check_url_safety', False):
-            for url in urls:
-                if not await self.is_url_safe(url):
+            for url, domain in zip(urls, domains):
+                if not await self.is_url_safe(url, domain):
                     return False, f"رابط غير آمن: {url}"
         
         return True, "الروابط مقبولة"
     
     async def filter_forwarded(self, message: Message, config: Dict[str, Any]) -> Tuple[bool, str]:
         """فلتر الرسائل المُعاد توجيهها"""
-        is_forwarded = bool(message.forward_from or message.forward_from_chat)
+        features = message_features.get(message)
+        is_forwarded = features.is_forwarded
         
         # حظر الرسائل المُعاد توجيهها
         if config.get('block_forwarded', False) and is_forwarded:
@@ -414,11 +459,7 @@ class AdvancedFilterManager:
             allowed_sources = config.get('allowed_forward_sources', [])
             blocked_sources = config.get('blocked_forward_sources', [])
             
-            source_id = None
-            if message.forward_from:
-                source_id = message.forward_from.id
-            elif message.forward_from_chat:
-                source_id = message.forward_from_chat.id
+            source_id = features.forward_source_id
             
             if blocked_sources and source_id in blocked_sources:
                 return False, f"مصدر توجيه محظور: {source_id}"
@@ -431,79 +472,23 @@ class AdvancedFilterManager:
     # وظائف مساعدة
     def get_message_type(self, message: Message) -> str:
         """تحديد نوع الرسالة"""
-        if message.text:
-            return 'text'
-        elif message.photo:
-            return 'photo'
-        elif message.video:
-            return 'video'
-        elif message.audio:
-            return 'audio'
-        elif message.voice:
-            return 'voice'
-        elif message.document:
-            return 'document'
-        elif message.sticker:
-            return 'sticker'
-        elif message.animation:
-            return 'animation'
-        elif message.location:
-            return 'location'
-        elif message.contact:
-            return 'contact'
-        elif message.poll:
-            return 'poll'
-        else:
-            return 'other'
+        return message_features.get(message).type
     
     def get_file_size(self, message: Message) -> int:
         """الحصول على حجم الملف"""
-        if message.photo:
-            return message.photo[-1].file_size or 0
-        elif message.video:
-            return message.video.file_size or 0
-        elif message.audio:
-            return message.audio.file_size or 0
-        elif message.voice:
-            return message.voice.file_size or 0
-        elif message.document:
-            return message.document.file_size or 0
-        else:
-            return 0
+        return message_features.get(message).file_size
     
     def get_media_duration(self, message: Message) -> int:
         """الحصول على مدة الوسائط"""
-        if message.video:
-            return message.video.duration or 0
-        elif message.audio:
-            return message.audio.duration or 0
-        elif message.voice:
-            return message.voice.duration or 0
-        else:
-            return 0
+        return message_features.get(message).duration
     
     def get_media_dimensions(self, message: Message) -> Tuple[int, int]:
         """الحصول على أبعاد الوسائط"""
-        if message.photo:
-            photo = message.photo[-1]
-            return photo.width, photo.height
-        elif message.video:
-            return message.video.width, message.video.height
-        else:
-            return 0, 0
+        return message_features.get(message).dimensions
     
     def detect_language(self, text: str) -> str:
         """كشف لغة النص"""
-        # تطبيق بسيط لكشف اللغة
-        arabic_chars = len(re.findall(r'[\u0600-\u06FF]', text))
-        english_chars = len(re.findall(r'[a-zA-Z]', text))
-        
-        if arabic_chars > english_chars:
-            return 'arabic'
-        elif english_chars > arabic_chars:
-            return 'english'
-        else:
-            return 'mixed'
+        return get_language(get_script_counts(Counter(text)))
     
     def analyze_sentiment(self, text: str) -> str:
         """تحليل مشاعر النص"""
@@ -524,25 +509,18 @@ class AdvancedFilterManager:
     
     def extract_urls(self, text: str) -> List[str]:
         """استخراج الروابط من النص"""
-        url_pattern = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\$$\$$,]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
-        return re.findall(url_pattern, text)
+        return URL_PATTERN.findall(text)
     
     def extract_domain(self, url: str) -> str:
         """استخراج الدومين من الرابط"""
-        import urllib.parse
-        parsed = urllib.parse.urlparse(url)
-        return parsed.netloc.lower()
+        return extract_domain(url)
     
-    async def is_url_safe(self, url: str) -> bool:
-        """فحص أمان الرابط"""
+    async def is_url_safe(self, url: str, domain: Optional[str] = None) -> bool:
+        """فحص أمان الرابط (domain: دومين الرابط إن كان مستخرجاً مسبقاً)"""
         # تطبيق بسيط - يمكن تطويره للاتصال بخدمات فحص الأمان
-        dangerous_domains = [
-            'malware.com', 'phishing.net', 'spam.org',
-            'virus.info', 'scam.biz'
-        ]
-        
-        domain = self.extract_domain(url)
-        return domain not in dangerous_domains
+        if domain is None:
+            domain = self.extract_domain(url)
+        return domain not in self.dangerous_domains
     
     def calculate_similarity(self, text1: str, text2: str) -> float:
         """حساب التشابه بين النصوص"""
@@ -579,6 +557,7 @@ class AdvancedFilterManager:
         
         user_id = message.from_user.id
         current_time = datetime.now()
+        features = message_features.get(message)
         
         if user_id not in self.user_message_history:
             self.user_message_history[user_id] = {
@@ -590,9 +569,9 @@ class AdvancedFilterManager:
         user_history = self.user_message_history[user_id]
         user_history['last_time'] = current_time
         user_history['messages'].append({
-            'text': message.text or message.caption or '',
+            'text': features.text,
             'time': current_time,
-            'type': self.get_message_type(message)
+            'type': features.type
         })
         
         # الاحتفاظ بآخر 100 رسالة فقط
@@ -618,25 +597,32 @@ class SpamDetector:
             r'(urgent|hurry|limited time)',
             r'(\$|\€|\£|USD|EUR)\s*\d+',
         ]
+        self.spam_regexes = [re.compile(pattern, re.IGNORECASE) for pattern in self.spam_patterns]
         self.spam_keywords = [
             'spam', 'scam', 'phishing', 'malware',
             'free money', 'easy money', 'get rich quick'
         ]
+        self.suspicious_domains = [
+            'bit.ly', 'tinyurl.com', 'goo.gl',
+            'ow.ly', 't.co', 'short.link'
+        ]
+        self.suspicious_domain_matcher = DomainMatcher(self.suspicious_domains)
     
     async def is_spam(self, message: Message, user_history: Dict[int, Dict]) -> bool:
         """فحص إذا كانت الرسالة سبام"""
-        text = message.text or message.caption or ""
+        features = message_features.get(message)
+        text = features.text
         if not text:
             return False
         
         user_id = message.from_user.id if message.from_user else 0
         
         # فحص الأنماط المشبوهة
-        if self.check_spam_patterns(text):
+        if self.check_spam_patterns(features.text_lower):
             return True
         
         # فحص الكلمات المفتاحية
-        if self.check_spam_keywords(text):
+        if self.check_spam_keywords(features.text_lower):
             return True
         
         # فحص معدل الإرسال
@@ -648,26 +634,18 @@ class SpamDetector:
             return True
         
         # فحص الروابط المشبوهة
-        if self.check_suspicious_links(text):
+        if self.check_suspicious_links(text, features.domains):
             return True
         
         return False
     
     def check_spam_patterns(self, text: str) -> bool:
         """فحص أنماط السبام"""
-        text_lower = text.lower()
-        for pattern in self.spam_patterns:
-            if re.search(pattern, text_lower, re.IGNORECASE):
-                return True
-        return False
+        return any(regex.search(text) for regex in self.spam_regexes)
     
     def check_spam_keywords(self, text: str) -> bool:
         """فحص كلمات السبام"""
-        text_lower = text.lower()
-        for keyword in self.spam_keywords:
-            if keyword in text_lower:
-                return True
-        return False
+        return keyword_matchers.get(self.spam_keywords).search(text) is not None
     
     async def check_rate_limit(self, user_id: int, user_history: Dict[int, Dict]) -> bool:
         """فحص معدل الإرسال"""
@@ -695,19 +673,11 @@ class SpamDetector:
         
         return identical_count >= 3  # 3 رسائل متطابقة أو أكثر
     
-    def check_suspicious_links(self, text: str) -> bool:
-        """فحص الروابط المشبوهة"""
-        suspicious_domains = [
-            'bit.ly', 'tinyurl.com', 'goo.gl',
-            'ow.ly', 't.co', 'short.link'
-        ]
-        
-        urls = re.findall(r'http[s]?://[^\s]+', text)
-        for url in urls:
-            for domain in suspicious_domains:
-                if domain in url:
-                    return True
-        return False
+    def check_suspicious_links(self, text: str, domains: Optional[List[str]] = None) -> bool:
+        """فحص الروابط المشبوهة (domains: دومينات روابط النص إن كانت مستخرجة مسبقاً)"""
+        if domains is None:
+            domains = [extract_domain(url) for url in URL_PATTERN.findall(text)]
+        return any(domain in self.suspicious_domain_matcher for domain in domains)
 
 class ContentAnalyzer:
     """محلل المحتوى المتقدم"""
@@ -0,0 +1,395 @@
+"""
+طابور التوجيه المقسم على عدة عمال
+Sharded Forwarding Queue
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Dict, List, Any, Callable, Awaitable, Hashable, Optional, Tuple
+from utils.logger import BotLogger
+
+logger = BotLogger()
+
+class PriorityLane:
+    """مسار أولوية داخل جزء الطابور مع حساب زمن الانتظار"""
+    
+    def __init__(self, key: Tuple[int, bool], weight: int):
+        self.key = key
+        self.weight = max(1, weight)
+        self.items = deque()  # (وقت الإضافة، العنصر)
+        self.pass_value = 0.0  # الوقت الافتراضي للمسار في الجدولة العادلة الموزونة
+        self.enqueued = 0
+        self.dequeued = 0
+        self.dropped = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.completed = 0
+    
+    @property
+    def name(self) -> str:
+        """اسم المسار للعرض"""
+        priority, premium = self.key
+        if priority == ShardedForwardingQueue.BACKFILL_PRIORITY:
+            return 'backfill'
+        return f"p{priority}-{'premium' if premium else 'free'}"
+    
+    def record_wait(self, wait: float):
+        """تسجيل زمن انتظار عنصر في المسار"""
+        self.dequeued += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+    
+    def record_latency(self, latency: float):
+        """تسجيل الزمن الكلي من الإضافة حتى انتهاء المعالجة"""
+        self.completed += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات المسار"""
+        return {
+            'weight': self.weight,
+            'depth': len(self.items),
+            'enqueued': self.enqueued,
+            'dequeued': self.dequeued,
+            'dropped': self.dropped,
+            'completed': self.completed,
+            'total_wait': self.total_wait,
+            'max_wait': self.max_wait,
+            'total_latency': self.total_latency,
+            'max_latency': self.max_latency
+        }
+
+class QueueShard:
+    """جزء واحد من طابور التوجيه يخدمه عامل واحد"""
+    
+    def __init__(self, index: int):
+        self.index = index
+        self.lanes: Dict[Tuple[int, bool], PriorityLane] = {}
+        self.size = 0
+        self.virtual_time = 0.0  # أصغر وقت افتراضي تمت خدمته
+        self.current: Optional[Tuple[PriorityLane, float]] = None  # مسار العنصر قيد المعالجة ووقت إضافته
+        self.has_items = asyncio.Event()
+        self.has_space = asyncio.Event()
+        self.has_space.set()
+        self.spilled = 0  # عناصر محفوظة على القرص بانتظار إعادة تحميلها
+        self.is_refilling = False
+        self.above_high_watermark = False
+        self.processed = 0
+        self.errors = 0
+        self.dropped = 0
+        self.blocked_puts = 0
+        self.max_depth_seen = 0
+        self.busy_seconds = 0.0
+        self.is_busy = False
+        self.started_at = time.monotonic()
+    
+    def depth(self) -> int:
+        """عدد العناصر في الذاكرة"""
+        return self.size
+    
+    def push(self, lane_key: Tuple[int, bool], weight: int, item: Dict[str, Any]):
+        """إضافة عنصر لنهاية مساره"""
+        lane = self.lanes.get(lane_key)
+        if lane is None:
+            lane = self.lanes[lane_key] = PriorityLane(lane_key, weight)
+        
+        if not lane.items:
+            # المسار العائد من الخمول لا يحتفظ برصيد متراكم يسمح له بحجز العامل
+            lane.pass_value = max(lane.pass_value, self.virtual_time)
+        
+        lane.items.append((time.monotonic(), item))
+        lane.enqueued += 1
+        self.size += 1
+    
+    def pop(self) -> Dict[str, Any]:
+        """سحب العنصر التالي من المسار صاحب أصغر وقت افتراضي"""
+        lane = min(
+            (lane for lane in self.lanes.values() if lane.items),
+            key=lambda lane: lane.pass_value
+        )
+        enqueued_at, item = lane.items.popleft()
+        self.size -= 1
+        
+        # كل مسار يتقدم بمقدار عكس وزنه فيحصل على حصة من العامل تتناسب مع وزنه دون أن يُحرم أي مسار
+        self.virtual_time = lane.pass_value
+        lane.pass_value += 1.0 / lane.weight
+        lane.record_wait(time.monotonic() - enqueued_at)
+        self.current = (lane, enqueued_at)
+        return item
+    
+    def remove_newest(self, lane: PriorityLane) -> Dict[str, Any]:
+        """حذف أحدث عنصر في مسار"""
+        _, item = lane.items.pop()
+        lane.dropped += 1
+        self.size -= 1
+        return item
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات الجزء"""
+        uptime = time.monotonic() - self.started_at
+        return {
+            'shard': self.index,
+            'depth': self.depth(),
+            'max_depth_seen': self.max_depth_seen,
+            'spilled': self.spilled,
+            'processed': self.processed,
+            'errors': self.errors,
+            'dropped': self.dropped,
+            'blocked_puts': self.blocked_puts,
+            'busy': self.is_busy,
+            'above_high_watermark': self.above_high_watermark,
+            'utilization': self.busy_seconds / uptime if uptime > 0 else 0.0,
+            'lanes': {lane.name: lane.get_stats() for lane in self.lanes.values()}
+        }
+
+class ShardedForwardingQueue:
+    """طابور توجيه مقسم حسب المفتاح مع عامل مستقل لكل جزء"""
+    
+    POLICY_BLOCK = 'block'  # إيقاف معالج التحديثات حتى يتوفر مكان
+    POLICY_DROP = 'drop'  # حذف العنصر الأقل أولوية
+    POLICY_SPILL = 'spill'  # نقل العناصر الزائدة للقرص وإعادة تحميلها لاحقاً
+    POLICIES = (POLICY_BLOCK, POLICY_DROP, POLICY_SPILL)
+    
+    HIGH_WATERMARK_RATIO = 0.8
+    LOW_WATERMARK_RATIO = 0.5
+    
+    PRIORITY_WEIGHT = 4  # وزن كل درجة أولوية للرسائل الحية
+    PREMIUM_WEIGHT_MULTIPLIER = 4  # وزن مسارات مهام المشتركين المميزين مقارنة بالمجانية
+    BACKFILL_PRIORITY = 0  # مسار نسخ السجل القديم بأقل وزن حتى لا يؤخر الرسائل الحية
+    
+    def __init__(self, num_shards: int, handler: Callable[[Dict[str, Any]], Awaitable[Any]],
+                 max_depth: int = 1000, overflow_policy: str = POLICY_BLOCK,
+                 on_drop: Optional[Callable[[Dict[str, Any]], Any]] = None,
+                 on_spill: Optional[Callable[[Dict[str, Any], int], Any]] = None,
+                 on_refill: Optional[Callable[[int, int], Awaitable[Tuple[List[Dict[str, Any]], int]]]] = None,
+                 on_watermark: Optional[Callable[[int, str, int], Awaitable[Any]]] = None):
+        self.num_shards = max(1, num_shards)
+        self.handler = handler
+        self.max_depth = max(1, max_depth)
+        self.overflow_policy = overflow_policy if overflow_policy in self.POLICIES else self.POLICY_BLOCK
+        self.high_watermark = max(1, int(self.max_depth * self.HIGH_WATERMARK_RATIO))
+        self.low_watermark = int(self.max_depth * self.LOW_WATERMARK_RATIO)
+        self.on_drop = on_drop
+        self.on_spill = on_spill
+        self.on_refill = on_refill
+        self.on_watermark = on_watermark
+        self.shards = [QueueShard(index) for index in range(self.num_shards)]
+        self.workers: List[asyncio.Task] = []
+        self.is_running = False
+    
+    def get_shard(self, key: Hashable) -> QueueShard:
+        """تحديد الجزء المسؤول عن مفتاح معين"""
+        # نفس المفتاح يذهب دائماً لنفس الجزء فيبقى ترتيبه محفوظاً
+        return self.shards[hash(key) % self.num_shards]
+    
+    async def start(self):
+        """تشغيل عامل لكل جزء"""
+        if self.is_running:
+            return
+        
+        self.is_running = True
+        for shard in self.shards:
+            shard.started_at = time.monotonic()
+            self.workers.append(asyncio.create_task(self.run_worker(shard)))
+        
+        logger.logger.info(
+            f"تم تشغيل {self.num_shards} عامل لطابور التوجيه "
+            f"(السعة {self.max_depth} لكل جزء، سياسة الامتلاء: {self.overflow_policy})"
+        )
+    
+    async def stop(self):
+        """إيقاف جميع العمال"""
+        self.is_running = False
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+    
+    async def put(self, key: Hashable, item: Dict[str, Any]) -> bool:
+        """إضافة عنصر للجزء المسؤول عن المفتاح وإرجاع False إذا لم يُقبل في الذاكرة"""
+        shard = self.get_shard(key)
+        
+        # وجود عناصر على القرص يعني أن الجديدة يجب أن تلحق بها للحفاظ على الترتيب
+        if shard.spilled and self.overflow_policy == self.POLICY_SPILL:
+            self.spill(shard, item)
+            return False
+        
+        if shard.depth() >= self.max_depth:
+            if self.overflow_policy == self.POLICY_SPILL:
+                self.spill(shard, item)
+                return False
+            
+            if self.overflow_policy == self.POLICY_DROP:
+                if not self.drop_lowest_priority(shard, item):
+                    return False
+            else:
+                shard.blocked_puts += 1
+                while shard.depth() >= self.max_depth:
+                    shard.has_space.clear()
+                    await shard.has_space.wait()
+        
+        self.append(shard, item)
+        return True
+    
+    def append(self, shard: QueueShard, item: Dict[str, Any]):
+        """إضافة عنصر لنهاية مساره في الجزء وتحديث المؤشرات"""
+        shard.push(self.get_lane_key(item), self.get_weight(item), item)
+        shard.has_items.set()
+        shard.max_depth_seen = max(shard.max_depth_seen, shard.depth())
+        
+        if not shard.above_high_watermark and shard.depth() >= self.high_watermark:
+            shard.above_high_watermark = True
+            self.notify_watermark(shard, 'high')
+    
+    def spill(self, shard: QueueShard, item: Dict[str, Any]):
+        """نقل عنصر للقرص بدلاً من الذاكرة"""
+        shard.spilled += 1
+        if self.on_spill:
+            self.on_spill(item, shard.index)
+    
+    def drop_lowest_priority(self, shard: QueueShard, item: Dict[str, Any]) -> bool:
+        """حذف أحدث عنصر في المسار الأقل وزناً (الجديد عند التساوي) وإرجاع True إذا قُبل العنصر الجديد"""
+        lowest = min(
+            (lane for lane in shard.lanes.values() if lane.items),
+            key=lambda lane: lane.weight
+        )
+        if lowest.weight >= self.get_weight(item):
+            victim = item
+        else:
+            victim = shard.remove_newest(lowest)
+        
+        shard.dropped += 1
+        if self.on_drop:
+            self.on_drop(victim)
+        return victim is not item
+    
+    @staticmethod
+    def get_lane_key(item: Dict[str, Any]) -> Tuple[int, bool]:
+        """مسار العنصر: أولوية مهمته (الأعلى أهم) واشتراك صاحبها"""
+        if item.get('backfill'):
+            return (ShardedForwardingQueue.BACKFILL_PRIORITY, False)
+        
+        task = item['task']
+        premium_until = task.get('owner_premium_until')
+        premium = bool(task.get('owner_is_premium')) and (premium_until is None or premium_until > time.time())
+        return (max(1, task.get('priority') or 1), premium)
+    
+    def get_weight(self, item: Dict[str, Any]) -> int:
+        """وزن مسار العنصر في الجدولة"""
+        priority, premium = self.get_lane_key(item)
+        if priority == self.BACKFILL_PRIORITY:
+            return 1
+        return priority * self.PRIORITY_WEIGHT * (self.PREMIUM_WEIGHT_MULTIPLIER if premium else 1)
+    
+    def notify_watermark(self, shard: QueueShard, level: str):
+        """إطلاق إشعار تجاوز حد الامتلاء"""
+        if self.on_watermark:
+            asyncio.create_task(self.on_watermark(shard.index, level, shard.depth()))
+    
+    def qsize(self) -> int:
+        """إجمالي العناصر المنتظرة في جميع الأجزاء"""
+        return sum(shard.depth() + shard.spilled for shard in self.shards)
+    
+    async def get(self, shard: QueueShard) -> Dict[str, Any]:
+        """انتظار العنصر التالي في الجزء"""
+        while not shard.depth():
+            shard.has_items.clear()
+            await shard.has_items.wait()
+        
+        item = shard.pop()
+        shard.has_space.set()
+        
+        if shard.above_high_watermark and shard.depth() <= self.low_watermark:
+            shard.above_high_watermark = False
+            self.notify_watermark(shard, 'low')
+        
+        if shard.spilled and not shard.is_refilling and shard.depth() <= self.low_watermark:
+            asyncio.create_task(self.refill(shard))
+        
+        return item
+    
+    async def refill(self, shard: QueueShard):
+        """إعادة تحميل العناصر المحفوظة على القرص عند انخفاض الامتلاء"""
+        if not self.on_refill:
+            return
+        
+        shard.is_refilling = True
+        try:
+            limit = self.max_depth - shard.depth()
+            # المعالج يعيد العناصر الصالحة وعدد السجلات المقروءة من القرص
+            items, consumed = await self.on_refill(shard.index, limit)
+            
+            for item in items:
+                self.append(shard, item)
+            
+            shard.spilled = max(0, shard.spilled - consumed)
+            if consumed < limit:
+                # لم يتبق شيء على القرص لهذا الجزء
+                shard.spilled = 0
+        except Exception as e:
+            logger.log_error(e, {'function': 'refill', 'shard': shard.index})
+        finally:
+            shard.is_refilling = False
+    
+    async def run_worker(self, shard: QueueShard):
+        """حلقة عامل جزء واحد: معالجة العناصر بالترتيب"""
+        while self.is_running:
+            item = await self.get(shard)
+            shard.is_busy = True
+            started_at = time.monotonic()
+            
+            try:
+                await self.handler(item)
+                shard.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                shard.errors += 1
+                logger.log_error(e, {'function': 'run_worker', 'shard': shard.index})
+            finally:
+                finished_at = time.monotonic()
+                shard.busy_seconds += finished_at - started_at
+                shard.is_busy = False
+                lane, enqueued_at = shard.current
+                lane.record_latency(finished_at - enqueued_at)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات الطابور وكل جزء فيه"""
+        shards = [shard.get_stats() for shard in self.shards]
+        return {
+            'workers': self.num_shards,
+            'max_depth': self.max_depth,
+            'overflow_policy': self.overflow_policy,
+            'high_watermark': self.high_watermark,
+            'low_watermark': self.low_watermark,
+            'queue_size': sum(shard['depth'] for shard in shards),
+            'spilled': sum(shard['spilled'] for shard in shards),
+            'dropped': sum(shard['dropped'] for shard in shards),
+            'busy_workers': sum(1 for shard in shards if shard['busy']),
+            'lanes': self.get_lane_stats(),
+            'shards': shards
+        }
+    
+    def get_lane_stats(self) -> Dict[str, Dict[str, Any]]:
+        """إحصائيات المسارات مجمعة من جميع الأجزاء مع متوسطات زمن الانتظار"""
+        lanes = {}
+        for shard in self.shards:
+            for lane in shard.lanes.values():
+                stats = lanes.setdefault(lane.name, {
+                    'weight': lane.weight, 'depth': 0, 'enqueued': 0, 'dequeued': 0, 'dropped': 0,
+                    'completed': 0, 'total_wait': 0.0, 'max_wait': 0.0, 'total_latency': 0.0, 'max_latency': 0.0
+                })
+                for field, value in lane.get_stats().items():
+                    if field.startswith('max_'):
+                        stats[field] = max(stats[field], value)
+                    elif field != 'weight':
+                        stats[field] += value
+        
+        for stats in lanes.values():
+            stats['avg_wait'] = stats['total_wait'] / stats['dequeued'] if stats['dequeued'] else 0.0
+            stats['avg_latency'] = stats['total_latency'] / stats['completed'] if stats['completed'] else 0.0
+        return lanes
@@ -0,0 +1,81 @@
+"""
+تجميع الألبومات (مجموعات الوسائط)
+Media Group Aggregation
+"""
+
+import asyncio
+import time
+from typing import Dict, List, Any, Callable, Awaitable, Tuple
+from telegram import Message
+from telegram.ext import ContextTypes
+from utils.logger import BotLogger
+
+logger = BotLogger()
+
+class MediaGroupAggregator:
+    """تجميع رسائل الألبوم الواحد قبل توجيهها كوحدة واحدة"""
+    
+    WINDOW_SECONDS = 1.0  # مدة انتظار بقية أجزاء الألبوم بعد آخر جزء وصل
+    MAX_GROUP_SIZE = 10  # الحد الأقصى لعناصر الألبوم في تلغرام
+    
+    def __init__(self, flush_callback: Callable[[List[Message], ContextTypes.DEFAULT_TYPE], Awaitable[Any]]):
+        self.flush_callback = flush_callback
+        self.groups: Dict[Tuple[int, str], Dict[str, Any]] = {}
+        self.stats = {
+            'albums': 0,
+            'messages': 0
+        }
+    
+    async def add(self, message: Message, context: ContextTypes.DEFAULT_TYPE):
+        """إضافة جزء من ألبوم للمخزن المؤقت"""
+        key = (message.chat_id, message.media_group_id)
+        group = self.groups.get(key)
+        
+        if group is None:
+            group = {'messages': [], 'context': context, 'deadline': 0.0}
+            self.groups[key] = group
+            asyncio.create_task(self.flush_when_complete(key, group))
+        
+        group['messages'].append(message)
+        group['deadline'] = time.monotonic() + self.WINDOW_SECONDS
+        self.stats['messages'] += 1
+        
+        # الألبوم اكتمل فلا داعي لانتظار نهاية المهلة
+        if len(group['messages']) >= self.MAX_GROUP_SIZE:
+            await self.flush(key, group)
+    
+    async def flush_when_complete(self, key: Tuple[int, str], group: Dict[str, Any]):
+        """انتظار توقف وصول أجزاء الألبوم ثم توجيهه"""
+        while self.groups.get(key) is group:
+            remaining = group['deadline'] - time.monotonic()
+            if remaining <= 0:
+                await self.flush(key, group)
+                return
+            await asyncio.sleep(remaining)
+    
+    async def flush(self, key: Tuple[int, str], group: Dict[str, Any]):
+        """تمرير الألبوم المكتمل مرتباً حسب معرف الرسالة"""
+        if self.groups.get(key) is not group:
+            return
+        del self.groups[key]
+        
+        messages = sorted(group['messages'], key=lambda message: message.message_id)
+        self.stats['albums'] += 1
+        
+        try:
+            await self.flush_callback(messages, group['context'])
+        except Exception as e:
+            logger.log_error(e, {
+                'function': 'flush',
+                'chat_id': key[0],
+                'media_group_id': key[1]
+            })
+    
+    async def flush_all(self):
+        """تمرير جميع الألبومات التي لم تنته مهلة تجميعها (عند الإيقاف حتى تُسجل في صندوق الصادر)"""
+        for key, group in list(self.groups.items()):
+            await self.flush(key, group)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات تجميع الألبومات"""
+        return {**self.stats, 'buffered_groups': len(self.groups)}
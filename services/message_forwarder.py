@@ -8,106 +8,305 @@ import json
 import logging
 import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Union
-from telegram import Bot, Message, Update
-from telegram.ext import ContextTypes
-from telegram.error import TelegramError, Forbidden, BadRequest
+from typing import Dict, List, Any, Optional, Tuple, Union
+from telegram import Bot, Message, Update, InputMediaPhoto, InputMediaVideo, InputMediaDocument, InputMediaAudio
+from telegram.ext import Application, CallbackContext, ContextTypes
+from telegram.error import TelegramError, Forbidden, BadRequest, RetryAfter, TimedOut, NetworkError
 from database.db_manager import DatabaseManager
-from utils.helpers import TextProcessor, TimeHelper
+from utils.helpers import TimeHelper
 from utils.logger import BotLogger
 from filters.message_filters import MessageFilterManager
+from services.rate_limiter import rate_limiter
+from services.retry_queue import RetryQueue, get_retry_after_seconds
+from services.forwarding_queue import ShardedForwardingQueue
+from services.delay_queue import DelayQueue
+from services.media_group import MediaGroupAggregator
+from services.outbox import ForwardingOutbox
+from services.message_map import MessageMap
+from services.processing_plan import processing_plans
+from services.deduplicator import MessageDeduplicator, ContentDeduplicator, get_content_fingerprint
+from services.task_snapshot import TaskSnapshot
+from services.write_behind import WriteBehindBuffer
+from services.circuit_breaker import TargetCircuitBreaker, is_target_unavailable
+from services.backfill import BackfillEngine
+from services.catch_up import CatchUpMonitor
+from services.metrics import forwarding_metrics
+from config.settings import Settings
 
 logger = BotLogger()
 
 class MessageForwarder:
     """خدمة توجيه الرسائل المتقدمة"""
     
+    DEFAULT_DELIVERY_CONCURRENCY = 10  # عدد الأهداف التي يتم الإرسال لها في نفس الوقت
+    
     def __init__(self, db: DatabaseManager):
         self.db = db
         self.filter_manager = MessageFilterManager()
-        self.active_tasks = {}  # كاش للمهام النشطة
-        self.last_messages = {}  # تتبع آخر الرسائل لتجنب التكرار
-        self.forwarding_queue = asyncio.Queue()  # طابور التوجيه
+        self.task_snapshot = TaskSnapshot.build([])  # المهام النشطة وفهرس التوجيه (تُستبدل كاملة عند كل تغيير)
+        self.deduplicator = MessageDeduplicator()  # تتبع آخر الرسائل لتجنب التكرار
+        # كشف المحتوى المكرر لكل هدف عبر المصادر المختلفة
+        self.content_deduplicator = ContentDeduplicator(Settings.CONTENT_DEDUP_WINDOW_MINUTES * 60)
+        # طابور التوجيه مقسم حسب المصدر: ترتيب ثابت داخل المصدر وتوازي بين المصادر
+        self.forwarding_queue = ShardedForwardingQueue(
+            Settings.FORWARDING_WORKERS,
+            self.process_forward_request,
+            max_depth=Settings.FORWARDING_QUEUE_MAX_DEPTH,
+            overflow_policy=Settings.FORWARDING_OVERFLOW_POLICY,
+            on_drop=self.handle_dropped_request,
+            on_spill=self.handle_spilled_request,
+            on_refill=self.refill_spilled_requests,
+            on_watermark=self.handle_queue_watermark
+        )
         self.is_processing = False
+        self.delay_queue = DelayQueue(self.forwarding_queue.put)  # الرسائل المؤجلة حتى موعد إرسالها
+        self.media_groups = MediaGroupAggregator(self.handle_album)  # تجميع أجزاء الألبومات
+        self.retry_queue = RetryQueue(db, self.retry_delivery)  # طابور إعادة المحاولة للأخطاء المؤقتة
+        self.circuit_breaker = TargetCircuitBreaker()  # إيقاف الإرسال للأهداف التي فقد البوت الوصول إليها
+        self.backfill = BackfillEngine(db, self)  # نسخ الرسائل القديمة من المصادر
+        self.last_source_message_ids = {}  # آخر رسالة شوهدت من كل مصدر (لتحديد نطاق نسخ السجل)
+        # استهلاك التحديثات المتراكمة أثناء التوقف
+        self.catch_up = CatchUpMonitor(Settings.CATCH_UP_MAX_AGE_MINUTES, Settings.CATCH_UP_RATE_PER_SECOND)
+        self.outbox = ForwardingOutbox(db)  # حفظ الطلبات المعلقة لاستعادتها بعد إعادة التشغيل
+        # مفتاح صندوق الصادر -> الأهداف التي لم يُحسم إرسالها (يبقى السجل مفتوحاً حتى تُحسم جميعها)
+        self.open_deliveries: Dict[str, Dict[str, Any]] = {}
+        self.message_map = MessageMap(db)  # نسخ الرسائل في الأهداف لمزامنة التعديل والحذف
+        # سجل الرسائل الموجهة يُحفظ على دفعات بدلاً من معاملة لكل رسالة
+        self.message_log = WriteBehindBuffer('forwarded_messages', db.log_forwarded_messages)
+        self.application = None  # لإعادة بناء الطلبات المحملة من القرص
+        self.notification_service = None  # تنبيهات المشرفين عند امتلاء الطابور
+        db.add_task_listener(self.handle_task_change)  # تحديث المهمة المتغيرة فقط بدلاً من إعادة تحميل الكل
         
-    async def initialize(self):
+    async def initialize(self, application: Optional[Application] = None, notification_service=None):
         """تهيئة خدمة التوجيه"""
+        self.application = application
+        self.notification_service = notification_service
         await self.load_active_tasks()
         await self.start_forwarding_processor()
+        if application:
+            await self.backfill.start(application)
         logger.logger.info("✅ تم تهيئة خدمة توجيه الرسائل")
     
     async def load_active_tasks(self):
         """تحميل المهام النشطة"""
         try:
             tasks = await self.db.get_active_tasks()
-            self.active_tasks = {task['source_chat_id']: task for task in tasks}
-            logger.logger.info(f"تم تحميل {len(tasks)} مهمة نشطة")
+            self.task_snapshot = TaskSnapshot.build(tasks, self.task_snapshot.version + 1)
+            processing_plans.retain(self.active_tasks)
+            self.filter_manager.compiled_filters.retain(self.active_tasks)
+            logger.logger.info(
+                f"تم تحميل {len(tasks)} مهمة نشطة على {len(self.source_index)} مصدر"
+            )
         except Exception as e:
             logger.log_error(e, {'function': 'load_active_tasks'})
     
+    @property
+    def active_tasks(self) -> Dict[int, Dict[str, Any]]:
+        """المهام النشطة حسب معرف المهمة"""
+        return self.task_snapshot.tasks
+    
+    @property
+    def source_index(self) -> Dict[int, List[Tuple[Dict[str, Any], str]]]:
+        """فهرس التوجيه: معرف المصدر -> المهام المرتبطة به"""
+        return self.task_snapshot.source_index
+    
+    async def handle_task_change(self, task_id: int, action: str):
+        """تحديث مهمة واحدة في اللقطة بعد إنشائها أو تعديلها أو حذفها"""
+        task = None
+        if action != 'deleted':
+            # المهمة المتوقفة تُعاد None فتُحذف من الفهرس
+            task = await self.db.get_active_task(task_id)
+        
+        self.task_snapshot = self.task_snapshot.with_task(task_id, task)
+        processing_plans.invalidate(task_id)
+        self.filter_manager.compiled_filters.invalidate(task_id)
+        if action == 'deleted':
+            forwarding_metrics.forget_task(task_id)
+        logger.logger.debug(f"تم تحديث المهمة {task_id} ({action}) - إصدار المهام {self.task_snapshot.version}")
+    
+    def get_source_tasks(self, chat_id: int) -> List[Dict[str, Any]]:
+        """الحصول على جميع المهام النشطة لمصدر معين"""
+        return [task for task, _ in self.source_index.get(chat_id, [])]
+    
     async def start_forwarding_processor(self):
-        """بدء معالج طابور التوجيه"""
+        """بدء عمال طابور التوجيه"""
         if not self.is_processing:
             self.is_processing = True
-            asyncio.create_task(self.process_forwarding_queue())
-    
-    async def process_forwarding_queue(self):
-        """معالجة طابور التوجيه"""
-        while self.is_processing:
-            try:
-                # انتظار عنصر في الطابور
-                forward_data = await asyncio.wait_for(
-                    self.forwarding_queue.get(), 
-                    timeout=1.0
-                )
-                
-                await self.process_forward_request(forward_data)
-                
-            except asyncio.TimeoutError:
-                continue
-            except Exception as e:
-                logger.log_error(e, {'function': 'process_forwarding_queue'})
-                await asyncio.sleep(1)
+            await self.forwarding_queue.start()
+        await self.outbox.start()
+        await self.message_log.start()
+        await self.message_map.start()
+        await self.delay_queue.start()
+        await self.retry_queue.start()
     
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """معالج الرسائل الرئيسي"""
-        if not update.message:
+        # تعديلات الرسائل والمنشورات تُزامن مع النسخ الموجهة
+        if update.edited_message or update.edited_channel_post:
+            await self.handle_message_edit(update, context)
+            return
+        
+        message = update.message or update.channel_post
+        if not message:
             return
         
-        message = update.message
         chat_id = message.chat_id
         
         # فحص إذا كانت الدردشة مصدر لأي مهمة
-        if chat_id not in self.active_tasks:
+        routes = self.source_index.get(chat_id)
+        if not routes:
             return
         
-        task = self.active_tasks[chat_id]
+        self.last_source_message_ids[chat_id] = max(
+            message.message_id, self.last_source_message_ids.get(chat_id, 0)
+        )
         
-        # فحص ساعات العمل
-        if not TimeHelper.is_working_hours(task['settings'].get('working_hours', {})):
+        # أجزاء الألبوم تُجمع أولاً ثم توجه كوحدة واحدة
+        if message.media_group_id:
+            await self.media_groups.add(message, context)
             return
         
+        # نتائج الفلاتر المشتركة لهذا التحديث (تُحسب مرة واحدة لكل إعداد فلاتر)
+        filter_results = {}
+        
+        for task, filters_key in routes:
+            try:
+                await self.route_message_to_task(message, task, filters_key, filter_results, context)
+            except Exception as e:
+                logger.log_error(e, {
+                    'function': 'handle_message',
+                    'task_id': task['id'],
+                    'message_id': message.message_id
+                })
+    
+    async def handle_album(self, album: List[Message], context: ContextTypes.DEFAULT_TYPE):
+        """توجيه ألبوم مكتمل لجميع المهام المرتبطة بمصدره"""
+        routes = self.source_index.get(album[0].chat_id, [])
+        
+        # نتائج الفلاتر المشتركة لكل (إعداد فلاتر، رسالة)
+        filter_results = {}
+        
+        for task, filters_key in routes:
+            try:
+                await self.route_album_to_task(album, task, filters_key, filter_results, context)
+            except Exception as e:
+                logger.log_error(e, {
+                    'function': 'handle_album',
+                    'task_id': task['id'],
+                    'media_group_id': album[0].media_group_id
+                })
+    
+    async def route_message_to_task(self, message: Message, task: Dict[str, Any], filters_key: str,
+                                    filter_results: Dict[str, bool], context: ContextTypes.DEFAULT_TYPE,
+                                    backfill: bool = False, check_duplicates: bool = True) -> bool:
+        """تمرير الرسالة عبر فحوصات مهمة واحدة وإضافتها للطابور"""
+        # فحص ساعات العمل (نسخ السجل يطلبه المستخدم صراحة فلا يخضع لها)
+        if not backfill and not TimeHelper.is_working_hours(task['settings'].get('working_hours', {})):
+            return False
+        
+        bot_token = context.bot.token
+        
         # فحص الفلاتر
-        if not await self.filter_manager.check_message(message, task['settings'].get('filters', {})):
-            return
+        if filters_key not in filter_results:
+            started_at = time.monotonic()
+            filter_results[filters_key] = await self.filter_manager.check_message(
+                message, task['settings'].get('filters', {}),
+                task['id'], self.task_snapshot.get_task_version(task['id'])
+            )
+            forwarding_metrics.observe('filter', time.monotonic() - started_at, task['id'], bot_token)
+        if not filter_results[filters_key]:
+            forwarding_metrics.increment('filtered', task['id'], bot_token)
+            return False
         
         # فحص التكرار
-        if await self.is_duplicate_message(message, task['id']):
-            return
+        if check_duplicates and await self.is_duplicate_message(message, task['id']):
+            forwarding_metrics.increment('duplicate', task['id'], bot_token)
+            return False
         
         # إضافة للطابور
-        forward_data = {
+        await self.enqueue_forward_request({
             'task': task,
             'message': message,
-            'timestamp': datetime.now()
-        }
+            'context': context,
+            'timestamp': datetime.now(),
+            'backfill': backfill
+        }, delay=0 if backfill else None)
+        return True
+    
+    async def route_album_to_task(self, album: List[Message], task: Dict[str, Any], filters_key: str,
+                                  filter_results: Dict[Tuple[str, int], bool], context: ContextTypes.DEFAULT_TYPE,
+                                  backfill: bool = False, check_duplicates: bool = True) -> bool:
+        """تمرير ألبوم عبر فحوصات مهمة واحدة وإضافته للطابور"""
+        # فحص ساعات العمل (نسخ السجل يطلبه المستخدم صراحة فلا يخضع لها)
+        if not backfill and not TimeHelper.is_working_hours(task['settings'].get('working_hours', {})):
+            return False
+        
+        bot_token = context.bot.token
+        
+        # فحص الفلاتر لكل جزء والاحتفاظ بالأجزاء المقبولة فقط
+        accepted = []
+        started_at = time.monotonic()
+        for message in album:
+            result_key = (filters_key, message.message_id)
+            if result_key not in filter_results:
+                filter_results[result_key] = await self.filter_manager.check_message(
+                    message, task['settings'].get('filters', {}),
+                    task['id'], self.task_snapshot.get_task_version(task['id'])
+                )
+            if filter_results[result_key]:
+                accepted.append(message)
+        forwarding_metrics.observe('filter', time.monotonic() - started_at, task['id'], bot_token)
+        
+        if not accepted:
+            forwarding_metrics.increment('filtered', task['id'], bot_token)
+            return False
+        
+        # فحص التكرار (الألبوم يُعرف بأول رسالة فيه)
+        if check_duplicates and await self.is_duplicate_message(accepted[0], task['id']):
+            forwarding_metrics.increment('duplicate', task['id'], bot_token)
+            return False
+        
+        # إضافة للطابور (جزء واحد متبقٍ يُرسل كرسالة عادية: send_media_group يتطلب 2-10 عناصر)
+        await self.enqueue_forward_request({
+            'task': task,
+            'message': accepted[0],
+            'album': accepted if len(accepted) > 1 else None,
+            'context': context,
+            'timestamp': datetime.now(),
+            'backfill': backfill
+        }, delay=0 if backfill else None)
+        return True
+    
+    async def enqueue_forward_request(self, forward_data: Dict[str, Any], delay: Optional[float] = None,
+                                      persist: bool = True):
+        """إضافة طلب توجيه للطابور أو لمرحلة التأخير"""
+        task = forward_data['task']
+        message = forward_data['message']
+        
+        if delay is None:
+            delay = task['settings'].get('delay_seconds', 0)
+        
+        # أوقات الاستلام والاستحقاق لقياس الانتظار في الطابور والزمن الكلي
+        now = time.monotonic()
+        forward_data.setdefault('received_at', now)
+        forward_data['due_at'] = now + max(delay, 0)
+        # الطلبات المستعادة من صندوق الصادر قُبلت وحُسبت في التشغيل السابق
+        forwarding_metrics.increment('accepted' if persist else 'recovered', task['id'], forward_data['context'].bot.token)
         
-        await self.forwarding_queue.put(forward_data)
+        # تسجيل مسبق في صندوق الصادر قبل الإضافة للطابور
+        if persist:
+            self.outbox.add(forward_data, delay)
+        
+        # الرسائل المؤجلة تنتظر في مرحلة التأخير دون حجز عامل التوجيه
+        if delay > 0:
+            await self.delay_queue.schedule(delay, message.chat_id, forward_data)
+        else:
+            await self.forwarding_queue.put(message.chat_id, forward_data)
         
         # تسجيل النشاط
         logger.log_message_forward(
             task['id'], 
-            chat_id, 
+            message.chat_id, 
             task['target_chat_ids'], 
             message.message_id, 
             True
@@ -117,280 +316,555 @@ class MessageForwarder:
         """معالجة طلب التوجيه"""
         task = forward_data['task']
         message = forward_data['message']
+        context = forward_data['context']
+        album = forward_data.get('album')
+        bot_token = context.bot.token
+        
+        started_at = time.monotonic()
+        if 'due_at' in forward_data:
+            forwarding_metrics.observe('queue_wait', max(0.0, started_at - forward_data['due_at']), task['id'], bot_token)
         
         try:
-            # تطبيق التأخير إذا كان محدداً
-            delay = task['settings'].get('delay_seconds', 0)
-            if delay > 0:
-                await asyncio.sleep(delay)
-            
             # معالجة النص إذا كان نوع التوجيه "copy"
             processed_content = None
             if task['forward_type'] == 'copy':
-                processed_content = await self.process_message_content(message, task['settings'])
+                if album:
+                    processed_content = await self.process_album_content(album, task)
+                else:
+                    processed_content = await self.process_message_content(message, task)
+                forwarding_metrics.observe('processing', time.monotonic() - started_at, task['id'], bot_token)
             
-            # توجيه للأهداف
-            successful_targets = []
-            failed_targets = []
+            # توجيه للأهداف بشكل متزامن (الطلب المستعاد يُكمل الأهداف التي كانت تنتظر إعادة المحاولة فقط)
+            targets = task['target_chat_ids']
+            if forward_data.get('targets') is not None:
+                targets = [target for target in forward_data['targets'] if target in targets]
+            outbox_key = self.open_delivery(forward_data.get('outbox_key'), targets)
+            successful_targets, failed_targets = await self.deliver_to_targets(
+                task, message, context, processed_content, album, targets=targets, outbox_key=outbox_key
+            )
+            self.settle_open_delivery(outbox_key, successful_targets + failed_targets)
             
-            for target_chat_id in task['target_chat_ids']:
-                try:
-                    if task['forward_type'] == 'forward':
-                        forwarded_msg = await self.forward_message(message, target_chat_id, task, context)
-                    else:
-                        forwarded_msg = await self.copy_message(message, target_chat_id, task, context, processed_content)
-                    
-                    if forwarded_msg:
-                        successful_targets.append({
-                            'chat_id': target_chat_id,
-                            'message_id': forwarded_msg.message_id
-                        })
-                        
-                        # تثبيت الرسالة إذا كان مطلوباً
-                        if task['settings'].get('advanced', {}).get('pin_messages', False):
-                            try:
-                                await context.bot.pin_chat_message(
-                                    chat_id=target_chat_id,
-                                    message_id=forwarded_msg.message_id,
-                                    disable_notification=True
-                                )
-                            except Exception:
-                                pass  # تجاهل أخطاء التثبيت
-                    
-                except Exception as e:
-                    failed_targets.append({
-                        'chat_id': target_chat_id,
-                        'error': str(e)
-                    })
-                    logger.log_error(e, {
-                        'task_id': task['id'],
-                        'target_chat_id': target_chat_id,
-                        'message_id': message.message_id
-                    })
+            if 'received_at' in forward_data:
+                forwarding_metrics.observe(
+                    'end_to_end', time.monotonic() - forward_data['received_at'], task['id'], bot_token
+                )
+            # الأهداف المجدولة لإعادة المحاولة تُحسب عند إعادة المحاولة وليس هنا
+            failed_count = sum(1 for result in failed_targets if not result.get('retrying'))
+            if failed_count:
+                forwarding_metrics.increment('failed', task['id'], bot_token, failed_count)
             
             # تسجيل النتائج
-            await self.log_forwarding_results(task, message, successful_targets, failed_targets)
+            await self.log_forwarding_results(task, message, successful_targets, failed_targets, album)
             
         except Exception as e:
+            self.open_deliveries.pop(forward_data.get('outbox_key'), None)
+            self.outbox.complete(forward_data, 'failed')
+            forwarding_metrics.increment('failed', task['id'], bot_token)
             logger.log_error(e, {
                 'task_id': task['id'],
                 'message_id': message.message_id,
                 'function': 'process_forward_request'
             })
     
-    async def forward_message(self, message: Message, target_chat_id: int, task: Dict[str, Any], context: ContextTypes.DEFAULT_TYPE) -> Optional[Message]:
-        """توجيه الرسالة (Forward)"""
+    def build_forward_data_from_outbox(self, entry: Dict[str, Any],
+                                       context: ContextTypes.DEFAULT_TYPE) -> Optional[Dict[str, Any]]:
+        """إعادة بناء طلب توجيه من سجل صندوق الصادر"""
+        task = self.active_tasks.get(entry['task_id'])
+        if not task:
+            # المهمة حُذفت أو أُوقفت منذ تسجيل الطلب
+            self.outbox.complete(entry, 'dropped')
+            return None
+        
+        messages = entry['messages']
+        forward_data = {
+            'task': task,
+            'message': messages[0],
+            'context': context,
+            'timestamp': datetime.now(),
+            'outbox_key': entry['outbox_key'],
+            'backfill': entry.get('backfill', False),
+            'targets': entry.get('targets')
+        }
+        if len(messages) > 1:
+            forward_data['album'] = messages
+        return forward_data
+    
+    async def recover_outbox(self, application: Application):
+        """استعادة طلبات التوجيه غير المكتملة من التشغيل السابق"""
+        entries = await self.outbox.load_unfinished(application.bot)
+        context = CallbackContext(application)
+        recovered = 0
+        
+        for entry in entries:
+            forward_data = self.build_forward_data_from_outbox(entry, context)
+            if not forward_data:
+                continue
+            
+            await self.enqueue_forward_request(forward_data, delay=entry['delay'], persist=False)
+            recovered += 1
+        
+        if entries:
+            logger.logger.info(f"تم استعادة {recovered} طلب توجيه من صندوق الصادر")
+    
+    def open_delivery(self, outbox_key: Optional[str], targets: List[int]) -> Optional[str]:
+        """تسجيل أهداف الطلب التي لم يُحسم إرسالها بعد"""
+        if outbox_key:
+            self.open_deliveries[outbox_key] = {'targets': set(targets), 'settled': False}
+        return outbox_key
+    
+    def settle_open_delivery(self, outbox_key: Optional[str], results: List[Dict[str, Any]]):
+        """حسم الأهداف بعد المحاولة الأولى: إغلاق السجل أو إبقاؤه مفتوحاً لأهداف إعادة المحاولة"""
+        delivery = self.open_deliveries.get(outbox_key)
+        if delivery is None:
+            return
+        
+        delivery['settled'] = True
+        retrying = {result['chat_id'] for result in results if result.get('retrying')}
+        # أهداف حُسمت إعادة محاولتها قبل انتهاء بقية الأهداف لا تعود للقائمة
+        delivery['targets'] &= retrying
+        if delivery['targets']:
+            self.outbox.keep_open(outbox_key, list(delivery['targets']))
+        else:
+            del self.open_deliveries[outbox_key]
+            self.outbox.complete({'outbox_key': outbox_key})
+    
+    def resolve_open_target(self, outbox_key: Optional[str], target_chat_id: int):
+        """حسم هدف واحد (إرسال ناجح أو فشل نهائي أو نقل للمخزن) بعد إعادة المحاولة"""
+        delivery = self.open_deliveries.get(outbox_key)
+        if delivery is None or target_chat_id not in delivery['targets']:
+            return
+        
+        delivery['targets'].discard(target_chat_id)
+        if not delivery['settled']:
+            return
+        if delivery['targets']:
+            self.outbox.keep_open(outbox_key, list(delivery['targets']))
+        else:
+            del self.open_deliveries[outbox_key]
+            self.outbox.complete({'outbox_key': outbox_key})
+    
+    def handle_dropped_request(self, forward_data: Dict[str, Any]):
+        """تسجيل طلب حُذف من الطابور الممتلئ لصالح طلب أعلى أولوية"""
+        self.outbox.complete(forward_data, 'dropped')
+        logger.logger.warning(
+            f"تم حذف طلب توجيه للمهمة {forward_data['task']['id']} "
+            f"(الرسالة {forward_data['message'].message_id}) بسبب امتلاء الطابور"
+        )
+    
+    def handle_spilled_request(self, forward_data: Dict[str, Any], shard: int):
+        """نقل طلب من الطابور الممتلئ لصندوق الصادر على القرص"""
+        self.outbox.spill(forward_data, shard)
+    
+    async def refill_spilled_requests(self, shard: int, limit: int) -> Tuple[List[Dict[str, Any]], int]:
+        """إعادة تحميل الطلبات المنقولة للقرص عند انخفاض امتلاء العامل"""
+        if not self.application:
+            return [], 0
+        
+        entries, consumed = await self.outbox.load_spilled(self.application.bot, shard, limit)
+        context = CallbackContext(self.application)
+        
+        items = []
+        for entry in entries:
+            forward_data = self.build_forward_data_from_outbox(entry, context)
+            if forward_data:
+                items.append(forward_data)
+        return items, consumed
+    
+    async def handle_queue_watermark(self, shard: int, level: str, depth: int):
+        """تسجيل تجاوز حدود امتلاء الطابور وتنبيه المشرفين عند الارتفاع"""
+        if level == 'low':
+            logger.logger.info(f"عاد امتلاء عامل التوجيه {shard} للمستوى الطبيعي ({depth} طلب)")
+            return
+        
+        details = (
+            f"طابور التوجيه: العامل {shard} وصل إلى {depth} من {self.forwarding_queue.max_depth} طلب "
+            f"(سياسة الامتلاء: {self.forwarding_queue.overflow_policy})"
+        )
+        logger.logger.warning(details)
+        
+        if self.notification_service:
+            try:
+                await self.notification_service.notify_high_usage(details)
+            except Exception as e:
+                logger.log_error(e, {'function': 'handle_queue_watermark', 'shard': shard})
+    
+    def get_delivery_concurrency(self, task: Dict[str, Any]) -> int:
+        """حد الإرسال المتزامن للأهداف حسب إعدادات المهمة"""
+        limit = task['settings'].get('advanced', {}).get(
+            'max_concurrent_sends', self.DEFAULT_DELIVERY_CONCURRENCY
+        )
         try:
-            # استخدام البوت الحالي من context
-            bot = context.bot
+            return max(1, int(limit))
+        except (TypeError, ValueError):
+            return self.DEFAULT_DELIVERY_CONCURRENCY
+    
+    async def deliver_to_targets(self, task: Dict[str, Any], message: Message, context: ContextTypes.DEFAULT_TYPE,
+                                 processed_content: Dict[str, Any] = None,
+                                 album: Optional[List[Message]] = None, targets: Optional[List[int]] = None,
+                                 outbox_key: Optional[str] = None) -> Tuple[List[Dict], List[Dict]]:
+        """إرسال الرسالة لجميع الأهداف بالتوازي مع حد أقصى للتزامن"""
+        semaphore = asyncio.Semaphore(self.get_delivery_concurrency(task))
+        fingerprint = self.get_content_fingerprint(task, album or [message])
+        
+        async def deliver(target_chat_id: int) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.deliver_to_target(
+                    task, message, target_chat_id, context, processed_content,
+                    album=album, fingerprint=fingerprint, outbox_key=outbox_key
+                )
+        
+        results = await asyncio.gather(*(deliver(target) for target in (task['target_chat_ids'] if targets is None else targets)))
+        if fingerprint:
+            self.release_failed_fingerprints(fingerprint, message.chat_id, results)
+        
+        # الحفاظ على ترتيب الأهداف في النتائج (الأهداف المتخطاة كمكررة لا تُحسب نجاحاً ولا فشلاً)
+        successful_targets = [result for result in results if 'message_id' in result]
+        failed_targets = [result for result in results if 'error' in result]
+        return successful_targets, failed_targets
+    
+    async def deliver_to_target(self, task: Dict[str, Any], message: Message, target_chat_id: int,
+                                context: ContextTypes.DEFAULT_TYPE, processed_content: Dict[str, Any] = None,
+                                attempt: int = 0, album: Optional[List[Message]] = None,
+                                fingerprint: Optional[str] = None, outbox_key: Optional[str] = None) -> Dict[str, Any]:
+        """إرسال الرسالة لهدف واحد وإرجاع نتيجة الإرسال"""
+        retry_item = {
+            'task': task,
+            'message': message,
+            'album': album,
+            'context': context,
+            'target_chat_id': target_chat_id,
+            'processed_content': processed_content,
+            'fingerprint': fingerprint,
+            'outbox_key': outbox_key,
+            'attempt': attempt
+        }
+        
+        # تخطي المحتوى الذي وصل لهذا الهدف من مصدر آخر خلال النافذة (إعادة المحاولة لا تُفحص)
+        # الفحص والتسجيل في خطوة واحدة حتى لا تمر نسختان متزامنتان من مصدرين
+        bot_token = context.bot.token
+        if fingerprint and attempt == 0 and self.content_deduplicator.check_and_add(
+            target_chat_id, fingerprint, message.chat_id
+        ):
+            forwarding_metrics.increment('duplicate', task['id'], bot_token)
+            return {'chat_id': target_chat_id, 'skipped': 'duplicate_content'}
+        
+        if not self.circuit_breaker.allow(bot_token, target_chat_id):
+            # الهدف متوقف حتى انتهاء مهلة التهدئة: لا طلب ولا سجل خطأ
+            return {'chat_id': target_chat_id, 'error': "الهدف متوقف مؤقتاً بسبب أخطاء متكررة", 'circuit_open': True}
+        
+        try:
+            # انتظار رمز من محدد المعدل المشترك
+            await rate_limiter.acquire(context.bot.token, target_chat_id)
             
-            forwarded_message = await bot.forward_message(
-                chat_id=target_chat_id,
-                from_chat_id=message.chat_id,
-                message_id=message.message_id
-            )
+            # زمن الإرسال يُقاس بعد انتظار محدد المعدل (الانتظار يظهر في الزمن الكلي)
+            send_started_at = time.monotonic()
+            if album:
+                # الألبوم يُرسل بطلب واحد لكل هدف
+                message_ids = await self.send_album(album, target_chat_id, task, context, processed_content)
+            else:
+                if task['forward_type'] == 'forward':
+                    forwarded_msg = await self.forward_message(message, target_chat_id, task, context)
+                else:
+                    forwarded_msg = await self.copy_message(message, target_chat_id, task, context, processed_content)
+                
+                if not forwarded_msg:
+                    self.circuit_breaker.release(bot_token, target_chat_id)
+                    return {'chat_id': target_chat_id, 'error': "نوع رسالة غير مدعوم"}
+                
+                message_ids = [forwarded_msg.message_id]
             
-            return forwarded_message
+            forwarding_metrics.observe('send', time.monotonic() - send_started_at, task['id'], bot_token)
+            forwarding_metrics.increment('delivered', task['id'], bot_token)
             
-        except Forbidden:
-            # البوت محظور أو لا يملك صلاحيات
-            await self.handle_forwarding_error(task, target_chat_id, "البوت محظور أو لا يملك صلاحيات")
-            return None
+            # تثبيت الرسالة إذا كان مطلوباً
+            if task['settings'].get('advanced', {}).get('pin_messages', False):
+                try:
+                    await context.bot.pin_chat_message(
+                        chat_id=target_chat_id,
+                        message_id=message_ids[0],
+                        disable_notification=True
+                    )
+                except Exception:
+                    pass  # تجاهل أخطاء التثبيت
+            
+            if self.circuit_breaker.record_success(bot_token, target_chat_id):
+                await self.notify_target_state(task, target_chat_id, TargetCircuitBreaker.CLOSED)
+            
+            return {'chat_id': target_chat_id, 'message_id': message_ids[0], 'message_ids': message_ids}
+            
+        except RetryAfter as e:
+            # تجاوز حد الإرسال: إيقاف الهدف مؤقتاً وإعادة المحاولة بعد المهلة المحددة بالضبط
+            self.circuit_breaker.release(bot_token, target_chat_id)
+            retry_after = get_retry_after_seconds(e)
+            rate_limiter.report_retry_after(bot_token, target_chat_id, retry_after)
+            retrying = await self.retry_queue.schedule(retry_item, e, retry_after=retry_after)
+            return {'chat_id': target_chat_id, 'error': str(e), 'retrying': retrying}
+        except Forbidden as e:
+            # البوت محظور أو لا يملك صلاحيات - خطأ دائم
+            await self.handle_forwarding_error(task, target_chat_id, "البوت محظور أو لا يملك صلاحيات", e, bot_token)
+            return {'chat_id': target_chat_id, 'error': str(e)}
         except BadRequest as e:
-            # خطأ في الطلب
-            await self.handle_forwarding_error(task, target_chat_id, f"خطأ في الطلب: {str(e)}")
-            return None
+            # خطأ في الطلب - خطأ دائم
+            await self.handle_forwarding_error(task, target_chat_id, f"خطأ في الطلب: {str(e)}", e, bot_token)
+            return {'chat_id': target_chat_id, 'error': str(e)}
+        except (TimedOut, NetworkError) as e:
+            # خطأ شبكة مؤقت: إعادة المحاولة مع انتظار تصاعدي
+            self.circuit_breaker.release(bot_token, target_chat_id)
+            retrying = await self.retry_queue.schedule(retry_item, e)
+            return {'chat_id': target_chat_id, 'error': str(e), 'retrying': retrying}
         except Exception as e:
+            self.circuit_breaker.release(bot_token, target_chat_id)
             logger.log_error(e, {
                 'task_id': task['id'],
                 'target_chat_id': target_chat_id,
-                'function': 'forward_message'
+                'message_id': message.message_id
             })
+            return {'chat_id': target_chat_id, 'error': str(e)}
+    
+    def get_content_fingerprint(self, task: Dict[str, Any], messages: List[Message]) -> Optional[str]:
+        """بصمة المحتوى إذا كان كشف المحتوى المكرر مفعلاً للمهمة"""
+        if not self.content_deduplicator.enabled:
             return None
+        if not task['settings'].get('advanced', {}).get('skip_duplicate_content', True):
+            return None
+        return get_content_fingerprint(messages)
+    
+    def release_failed_fingerprints(self, fingerprint: str, source_chat_id: int, results: List[Dict[str, Any]]):
+        """إلغاء تسجيل المحتوى للأهداف التي فشل الإرسال لها نهائياً"""
+        for result in results:
+            if 'error' in result and not result.get('retrying'):
+                self.content_deduplicator.discard(result['chat_id'], fingerprint, source_chat_id)
+    
+    async def retry_delivery(self, item: Dict[str, Any]):
+        """إعادة محاولة إرسال لهدف واحد من طابور إعادة المحاولة"""
+        task = item['task']
+        message = item['message']
+        forwarding_metrics.increment('retried', task['id'], item['context'].bot.token)
+        
+        result = await self.deliver_to_target(
+            task, message, item['target_chat_id'], item['context'],
+            item.get('processed_content'), attempt=item['attempt'], album=item.get('album'),
+            fingerprint=item.get('fingerprint'), outbox_key=item.get('outbox_key')
+        )
+        if not result.get('retrying'):
+            self.resolve_open_target(item.get('outbox_key'), item['target_chat_id'])
+        
+        if 'message_id' in result:
+            await self.log_forwarding_results(task, message, [result], [], item.get('album'), complete=False)
+        elif 'error' in result and not result.get('retrying'):
+            forwarding_metrics.increment('failed', task['id'], item['context'].bot.token)
+            if item.get('fingerprint'):
+                self.release_failed_fingerprints(item['fingerprint'], message.chat_id, [result])
+    
+    async def forward_message(self, message: Message, target_chat_id: int, task: Dict[str, Any], context: ContextTypes.DEFAULT_TYPE) -> Optional[Message]:
+        """توجيه الرسالة (Forward)"""
+        # استخدام البوت الحالي من context
+        bot = context.bot
+        
+        # الأخطاء تُصنّف في deliver_to_target لتحديد إمكانية إعادة المحاولة
+        forwarded_message = await bot.forward_message(
+            chat_id=target_chat_id,
+            from_chat_id=message.chat_id,
+            message_id=message.message_id
+        )
+        
+        return forwarded_message
     
     async def copy_message(self, message: Message, target_chat_id: int, task: Dict[str, Any], context: ContextTypes.DEFAULT_TYPE,
                           processed_content: Dict[str, Any] = None) -> Optional[Message]:
         """نسخ الرسالة (Copy)"""
-        try:
-            # استخدام البوت الحالي من context
-            bot = context.bot
-            
-            # تحديد المحتوى المُعالج
-            if processed_content:
-                text = processed_content.get('text')
-                caption = processed_content.get('caption')
-                reply_markup = processed_content.get('reply_markup')
-            else:
-                text = message.text
-                caption = message.caption
-                reply_markup = message.reply_markup
-            
-            # تحديد نوع الرسالة وإرسالها
-            if message.text:
-                sent_message = await bot.send_message(
-                    chat_id=target_chat_id,
-                    text=text,
-                    parse_mode='HTML',
-                    reply_markup=reply_markup,
-                    disable_web_page_preview=task['settings'].get('disable_web_preview', False)
-                )
-            elif message.photo:
-                sent_message = await bot.send_photo(
-                    chat_id=target_chat_id,
-                    photo=message.photo[-1].file_id,
-                    caption=caption,
-                    parse_mode='HTML',
-                    reply_markup=reply_markup
-                )
-            elif message.video:
-                sent_message = await bot.send_video(
-                    chat_id=target_chat_id,
-                    video=message.video.file_id,
-                    caption=caption,
-                    parse_mode='HTML',
-                    reply_markup=reply_markup
-                )
-            elif message.document:
-                sent_message = await bot.send_document(
-                    chat_id=target_chat_id,
-                    document=message.document.file_id,
-                    caption=caption,
-                    parse_mode='HTML',
-                    reply_markup=reply_markup
-                )
-            elif message.audio:
-                sent_message = await bot.send_audio(
-                    chat_id=target_chat_id,
-                    audio=message.audio.file_id,
-                    caption=caption,
-                    parse_mode='HTML',
-                    reply_markup=reply_markup
-                )
-            elif message.voice:
-                sent_message = await bot.send_voice(
-                    chat_id=target_chat_id,
-                    voice=message.voice.file_id,
-                    caption=caption,
-                    parse_mode='HTML',
-                    reply_markup=reply_markup
-                )
-            elif message.sticker:
-                sent_message = await bot.send_sticker(
-                    chat_id=target_chat_id,
-                    sticker=message.sticker.file_id,
-                    reply_markup=reply_markup
-                )
-            elif message.location:
-                sent_message = await bot.send_location(
-                    chat_id=target_chat_id,
-                    latitude=message.location.latitude,
-                    longitude=message.location.longitude,
-                    reply_markup=reply_markup
-                )
-            elif message.contact:
-                sent_message = await bot.send_contact(
-                    chat_id=target_chat_id,
-                    phone_number=message.contact.phone_number,
-                    first_name=message.contact.first_name,
-                    last_name=message.contact.last_name,
-                    reply_markup=reply_markup
-                )
-            else:
-                # نوع رسالة غير مدعوم
-                return None
-            
-            return sent_message
-            
-        except Exception as e:
-            logger.log_error(e, {
-                'task_id': task['id'],
-                'target_chat_id': target_chat_id,
-                'function': 'copy_message'
-            })
+        # استخدام البوت الحالي من context
+        bot = context.bot
+        
+        # تحديد المحتوى المُعالج
+        if processed_content:
+            text = processed_content.get('text')
+            caption = processed_content.get('caption')
+            reply_markup = processed_content.get('reply_markup')
+        else:
+            text = message.text
+            caption = message.caption
+            reply_markup = message.reply_markup
+        
+        # تحديد نوع الرسالة وإرسالها
+        if message.text:
+            sent_message = await bot.send_message(
+                chat_id=target_chat_id,
+                text=text,
+                parse_mode='HTML',
+                reply_markup=reply_markup,
+                disable_web_page_preview=task['settings'].get('disable_web_preview', False)
+            )
+        elif message.photo:
+            sent_message = await bot.send_photo(
+                chat_id=target_chat_id,
+                photo=message.photo[-1].file_id,
+                caption=caption,
+                parse_mode='HTML',
+                reply_markup=reply_markup
+            )
+        elif message.video:
+            sent_message = await bot.send_video(
+                chat_id=target_chat_id,
+                video=message.video.file_id,
+                caption=caption,
+                parse_mode='HTML',
+                reply_markup=reply_markup
+            )
+        elif message.document:
+            sent_message = await bot.send_document(
+                chat_id=target_chat_id,
+                document=message.document.file_id,
+                caption=caption,
+                parse_mode='HTML',
+                reply_markup=reply_markup
+            )
+        elif message.audio:
+            sent_message = await bot.send_audio(
+                chat_id=target_chat_id,
+                audio=message.audio.file_id,
+                caption=caption,
+                parse_mode='HTML',
+                reply_markup=reply_markup
+            )
+        elif message.voice:
+            sent_message = await bot.send_voice(
+                chat_id=target_chat_id,
+                voice=message.voice.file_id,
+                caption=caption,
+                parse_mode='HTML',
+                reply_markup=reply_markup
+            )
+        elif message.sticker:
+            sent_message = await bot.send_sticker(
+                chat_id=target_chat_id,
+                sticker=message.sticker.file_id,
+                reply_markup=reply_markup
+            )
+        elif message.location:
+            sent_message = await bot.send_location(
+                chat_id=target_chat_id,
+                latitude=message.location.latitude,
+                longitude=message.location.longitude,
+                reply_markup=reply_markup
+            )
+        elif message.contact:
+            sent_message = await bot.send_contact(
+                chat_id=target_chat_id,
+                phone_number=message.contact.phone_number,
+                first_name=message.contact.first_name,
+                last_name=message.contact.last_name,
+                reply_markup=reply_markup
+            )
+        else:
+            # نوع رسالة غير مدعوم
             return None
+        
+        return sent_message
     
-    async def process_message_content(self, message: Message, settings: Dict[str, Any]) -> Dict[str, Any]:
-        """معالجة محتوى الرسالة"""
-        text_processing = settings.get('text_processing', {})
+    async def send_album(self, album: List[Message], target_chat_id: int, task: Dict[str, Any],
+                         context: ContextTypes.DEFAULT_TYPE, processed_content: Dict[str, Any] = None) -> List[int]:
+        """إرسال ألبوم كامل لهدف واحد بطلب واحد وإرجاع معرفات الرسائل المرسلة"""
+        bot = context.bot
+        source_chat_id = album[0].chat_id
+        source_message_ids = [message.message_id for message in album]
         
-        # النص الأساسي
-        original_text = message.text or message.caption or ""
+        if task['forward_type'] == 'forward':
+            sent = await bot.forward_messages(
+                chat_id=target_chat_id,
+                from_chat_id=source_chat_id,
+                message_ids=source_message_ids
+            )
+            return [message_id.message_id for message_id in sent]
         
-        # تطبيق معالجة النصوص
-        processed_text = TextProcessor.clean_text(original_text, text_processing)
+        captions = (processed_content or {}).get('captions') or [message.caption for message in album]
+        media = [self.build_input_media(message, caption) for message, caption in zip(album, captions)]
         
-        # إضافة رأس وتذييل
-        processed_text = TextProcessor.add_header_footer(
-            processed_text,
-            text_processing.get('add_header'),
-            text_processing.get('add_footer')
-        )
+        if any(item is None for item in media):
+            # أنواع لا يمكن إرسالها عبر send_media_group: نسخ الألبوم كما هو
+            sent = await bot.copy_messages(
+                chat_id=target_chat_id,
+                from_chat_id=source_chat_id,
+                message_ids=source_message_ids
+            )
+            return [message_id.message_id for message_id in sent]
+        
+        sent = await bot.send_media_group(chat_id=target_chat_id, media=media)
+        return [message.message_id for message in sent]
+    
+    @staticmethod
+    def build_input_media(message: Message, caption: Optional[str]):
+        """تحويل جزء من الألبوم إلى عنصر InputMedia"""
+        if message.photo:
+            return InputMediaPhoto(media=message.photo[-1].file_id, caption=caption, parse_mode='HTML')
+        if message.video:
+            return InputMediaVideo(media=message.video.file_id, caption=caption, parse_mode='HTML')
+        if message.document:
+            return InputMediaDocument(media=message.document.file_id, caption=caption, parse_mode='HTML')
+        if message.audio:
+            return InputMediaAudio(media=message.audio.file_id, caption=caption, parse_mode='HTML')
+        return None
+    
+    async def process_album_content(self, album: List[Message], task: Dict[str, Any]) -> Dict[str, Any]:
+        """معالجة تعليقات أجزاء الألبوم"""
+        plan = processing_plans.get(task)
+        captions = [plan.apply(message.caption) if message.caption else None for message in album]
         
-        # تحديد طول النص
-        char_limit = settings.get('advanced', {}).get('char_limit', 0)
-        if char_limit > 0:
-            processed_text = TextProcessor.limit_text_length(processed_text, char_limit)
-        
-        # معالجة الأزرار المخصصة
-        custom_buttons = settings.get('advanced', {}).get('custom_buttons', [])
-        reply_markup = None
-        
-        if custom_buttons:
-            from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-            keyboard = []
-            for button_row in custom_buttons:
-                row = []
-                for button in button_row:
-                    row.append(InlineKeyboardButton(
-                        text=button['text'],
-                        url=button.get('url'),
-                        callback_data=button.get('callback_data')
-                    ))
-                keyboard.append(row)
-            reply_markup = InlineKeyboardMarkup(keyboard)
+        # أزرار الرسائل غير مدعومة في الألبومات
+        return {'captions': captions}
+    
+    async def process_message_content(self, message: Message, task: Dict[str, Any]) -> Dict[str, Any]:
+        """معالجة محتوى الرسالة باستخدام خطة المهمة المُجمّعة مسبقاً"""
+        plan = processing_plans.get(task)
+        processed_text = plan.apply(message.text or message.caption or "")
         
         return {
             'text': processed_text if message.text else None,
             'caption': processed_text if message.caption else None,
-            'reply_markup': reply_markup
+            'reply_markup': plan.reply_markup
         }
     
     async def is_duplicate_message(self, message: Message, task_id: int) -> bool:
         """فحص تكرار الرسالة"""
-        # إنشاء مفتاح فريد للرسالة
-        message_key = f"{message.chat_id}_{message.message_id}"
-        
-        # فحص إذا كانت الرسالة مُعالجة مؤخراً
-        if task_id in self.last_messages:
-            if message_key in self.last_messages[task_id]:
-                return True
-        else:
-            self.last_messages[task_id] = set()
-        
-        # إضافة الرسالة للقائمة
-        self.last_messages[task_id].add(message_key)
-        
-        # تنظيف القائمة (الاحتفاظ بآخر 1000 رسالة)
-        if len(self.last_messages[task_id]) > 1000:
-            # إزالة أقدم 200 رسالة
-            old_messages = list(self.last_messages[task_id])[:200]
-            for old_msg in old_messages:
-                self.last_messages[task_id].discard(old_msg)
-        
-        return False
+        return self.deduplicator.check_and_add(task_id, message.chat_id, message.message_id)
     
-    async def handle_forwarding_error(self, task: Dict[str, Any], target_chat_id: int, error_message: str):
+    async def handle_forwarding_error(self, task: Dict[str, Any], target_chat_id: int, error_message: str,
+                                      error: Optional[TelegramError] = None, bot_token: Optional[str] = None):
         """معالجة أخطاء التوجيه"""
         # تسجيل الخطأ
         logger.logger.error(f"خطأ في توجيه المهمة {task['id']} للهدف {target_chat_id}: {error_message}")
         
-        # إشعار المستخدم إذا كان الخطأ خطيراً
-        if "محظور" in error_message or "صلاحيات" in error_message:
-            # يمكن إضافة إشعار للمستخدم هنا
-            pass
+        if error is None or bot_token is None:
+            return
+        
+        # فقدان الوصول للهدف يُحسب في قاطع الدائرة، وأخطاء الرسالة نفسها لا تؤثر فيه
+        if not is_target_unavailable(error):
+            self.circuit_breaker.release(bot_token, target_chat_id)
+            return
+        
+        if self.circuit_breaker.record_failure(bot_token, target_chat_id, error):
+            logger.logger.warning(f"تم فتح قاطع الدائرة للهدف {target_chat_id} بعد أخطاء متكررة: {error}")
+            await self.notify_target_state(task, target_chat_id, TargetCircuitBreaker.OPEN, error_message)
+    
+    async def notify_target_state(self, task: Dict[str, Any], target_chat_id: int, state: str,
+                                  error_message: Optional[str] = None):
+        """إبلاغ صاحب المهمة بتغير حالة دائرة الهدف"""
+        if not self.notification_service:
+            return
+        
+        try:
+            if state == TargetCircuitBreaker.OPEN:
+                await self.notification_service.notify_target_unavailable(
+                    task['user_id'], task['id'], target_chat_id, error_message
+                )
+            else:
+                await self.notification_service.notify_target_recovered(task['user_id'], task['id'], target_chat_id)
+        except Exception as e:
+            logger.log_error(e, {'function': 'notify_target_state', 'target_chat_id': target_chat_id})
     
     async def log_forwarding_results(self, task: Dict[str, Any], message: Message, 
-                                   successful_targets: List[Dict], failed_targets: List[Dict]):
+                                   successful_targets: List[Dict], failed_targets: List[Dict],
+                                   album: Optional[List[Message]] = None, complete: bool = True):
         """تسجيل نتائج التوجيه"""
         # تسجيل في قاعدة البيانات
         target_message_ids = {
@@ -398,11 +872,16 @@ class MessageForwarder:
             for target in successful_targets
         }
         
-        await self.db.log_forwarded_message(
-            task['id'],
-            message.message_id,
-            target_message_ids
-        )
+        self.message_log.add((task['id'], message.message_id, json.dumps(target_message_ids)))
+        
+        # تسجيل نسخ كل رسالة مصدر (كل جزء من الألبوم يقابل نسخته في الهدف)
+        source_message_ids = [part.message_id for part in album] if album else [message.message_id]
+        copies = {source_message_id: [] for source_message_id in source_message_ids}
+        for target in successful_targets:
+            for source_message_id, target_message_id in zip(source_message_ids, target['message_ids']):
+                copies[source_message_id].append((target['chat_id'], target_message_id))
+        
+        await self.message_map.record(task['id'], message.chat_id, copies, complete=complete)
         
         # تسجيل الإحصائيات
         logger.log_message_forward(
@@ -416,26 +895,109 @@ class MessageForwarder:
     
     async def handle_message_edit(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """معالجة تعديل الرسائل"""
-        if not update.edited_message:
+        edited_message = update.edited_message or update.edited_channel_post
+        if not edited_message:
             return
         
-        edited_message = update.edited_message
         chat_id = edited_message.chat_id
         
-        # فحص إذا كانت الدردشة مصدر لأي مهمة
-        if chat_id not in self.active_tasks:
+        # النسخ المُوجهة (forward) لا يمكن تعديلها، فالمزامنة لمهام النسخ فقط
+        tasks = [task for task in self.get_source_tasks(chat_id) if task['forward_type'] == 'copy']
+        if not tasks:
             return
         
-        task = self.active_tasks[chat_id]
+        copies = await self.message_map.lookup(chat_id, edited_message.message_id, [task['id'] for task in tasks])
         
-        # البحث عن الرسالة الأصلية في قاعدة البيانات
-        # وتحديث الرسائل المُوجهة
-        # سيتم تطوير هذه الوظيفة في المرحلة التالية
+        for task in tasks:
+            task_copies = copies.get(task['id'])
+            if not task_copies:
+                continue
+            
+            processed_content = await self.process_message_content(edited_message, task)
+            semaphore = asyncio.Semaphore(self.get_delivery_concurrency(task))
+            
+            async def edit(target_chat_id: int, target_message_id: int):
+                async with semaphore:
+                    await self.edit_copy(edited_message, target_chat_id, target_message_id, processed_content, task, context)
+            
+            await asyncio.gather(*(edit(*copy) for copy in task_copies))
+    
+    async def edit_copy(self, edited_message: Message, target_chat_id: int, target_message_id: int,
+                        processed_content: Dict[str, Any], task: Dict[str, Any], context: ContextTypes.DEFAULT_TYPE):
+        """تعديل نسخة واحدة من الرسالة في هدف"""
+        try:
+            await rate_limiter.acquire(context.bot.token, target_chat_id)
+            
+            if edited_message.text:
+                await context.bot.edit_message_text(
+                    chat_id=target_chat_id,
+                    message_id=target_message_id,
+                    text=processed_content['text'],
+                    parse_mode='HTML',
+                    reply_markup=processed_content.get('reply_markup'),
+                    disable_web_page_preview=task['settings'].get('disable_web_preview', False)
+                )
+            elif edited_message.caption is not None:
+                await context.bot.edit_message_caption(
+                    chat_id=target_chat_id,
+                    message_id=target_message_id,
+                    caption=processed_content['caption'],
+                    parse_mode='HTML'
+                )
+        
+        except RetryAfter as e:
+            rate_limiter.report_retry_after(context.bot.token, target_chat_id, get_retry_after_seconds(e))
+        except BadRequest as e:
+            # تجاهل حالة عدم تغير المحتوى بعد المعالجة
+            if 'not modified' not in str(e).lower():
+                logger.log_error(e, {'function': 'edit_copy', 'task_id': task['id'], 'target_chat_id': target_chat_id})
+        except Exception as e:
+            logger.log_error(e, {'function': 'edit_copy', 'task_id': task['id'], 'target_chat_id': target_chat_id})
     
     async def handle_message_delete(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """معالجة حذف الرسائل"""
-        # سيتم تطوير هذه الوظيفة في المرحلة التالية
-        pass
+        # واجهة البوتات لا ترسل أحداث حذف إلا لدردشات الأعمال
+        deleted = getattr(update, 'deleted_business_messages', None)
+        if not deleted:
+            return
+        
+        await self.delete_copies(deleted.chat.id, list(deleted.message_ids), context)
+    
+    async def delete_copies(self, source_chat_id: int, source_message_ids: List[int], context: ContextTypes.DEFAULT_TYPE):
+        """حذف نسخ رسائل مصدر من جميع الأهداف"""
+        tasks = self.get_source_tasks(source_chat_id)
+        if not tasks:
+            return
+        
+        task_ids = [task['id'] for task in tasks]
+        
+        for source_message_id in source_message_ids:
+            copies = await self.message_map.lookup(source_chat_id, source_message_id, task_ids)
+            
+            # تجميع النسخ حسب الهدف لحذفها بطلب واحد لكل هدف
+            targets = {}
+            for task_copies in copies.values():
+                for target_chat_id, target_message_id in task_copies:
+                    targets.setdefault(target_chat_id, []).append(target_message_id)
+            
+            if not targets:
+                continue
+            
+            await asyncio.gather(*(
+                self.delete_target_copies(target_chat_id, message_ids, context)
+                for target_chat_id, message_ids in targets.items()
+            ))
+            await self.message_map.forget(source_chat_id, source_message_id, task_ids)
+    
+    async def delete_target_copies(self, target_chat_id: int, message_ids: List[int], context: ContextTypes.DEFAULT_TYPE):
+        """حذف نسخ من هدف واحد"""
+        try:
+            await rate_limiter.acquire(context.bot.token, target_chat_id)
+            await context.bot.delete_messages(chat_id=target_chat_id, message_ids=message_ids)
+        except RetryAfter as e:
+            rate_limiter.report_retry_after(context.bot.token, target_chat_id, get_retry_after_seconds(e))
+        except Exception as e:
+            logger.log_error(e, {'function': 'delete_target_copies', 'target_chat_id': target_chat_id})
     
     async def reload_tasks(self):
         """إعادة تحميل المهام النشطة"""
@@ -444,4 +1006,35 @@ class MessageForwarder:
     async def stop_forwarding(self):
         """إيقاف خدمة التوجيه"""
         self.is_processing = False
+        await self.backfill.stop()
+        # الألبومات داخل مهلة التجميع لم تُسجل بعد في صندوق الصادر
+        await self.media_groups.flush_all()
+        await self.delay_queue.stop()
+        await self.forwarding_queue.stop()
+        await self.retry_queue.stop()
+        await self.message_log.stop()
+        await self.message_map.stop()
+        await self.outbox.stop()
         logger.logger.info("تم إيقاف خدمة توجيه الرسائل")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات مسار التوجيه لجميع مراحله"""
+        return {
+            'active_tasks': len(self.active_tasks),
+            'queue_size': self.forwarding_queue.qsize(),
+            'is_processing': self.is_processing,
+            'queue': self.forwarding_queue.get_stats(),
+            'delay_queue': self.delay_queue.get_stats(),
+            'media_groups': self.media_groups.get_stats(),
+            'message_map': self.message_map.get_stats(),
+            'message_log': self.message_log.get_stats(),
+            'outbox': self.outbox.get_stats(),
+            'deduplication': self.deduplicator.get_stats(),
+            'content_deduplication': self.content_deduplicator.get_stats(),
+            'retry_queue': self.retry_queue.get_stats(),
+            'circuit_breaker': self.circuit_breaker.get_stats(),
+            'backfill': self.backfill.get_stats(),
+            'catch_up': self.catch_up.get_stats(),
+            'compiled_filters': self.filter_manager.compiled_filters.get_stats(),
+            'metrics': forwarding_metrics.get_summary()
+        }
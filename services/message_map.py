@@ -0,0 +1,117 @@
+"""
+خريطة الرسائل المصدر إلى نسخها في الأهداف
+Source-to-Target Message Map
+"""
+
+from collections import OrderedDict
+from typing import Dict, List, Any, Tuple
+from database.db_manager import DatabaseManager
+from services.write_behind import WriteBehindBuffer
+from utils.logger import BotLogger
+
+logger = BotLogger()
+
+class MessageMap:
+    """فهرس نسخ الرسائل مع ذاكرة LRU أمام جدول message_map"""
+    
+    DEFAULT_CACHE_SIZE = 20000
+    
+    def __init__(self, db: DatabaseManager, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.db = db
+        self.cache_size = cache_size
+        # (المهمة، المصدر، الرسالة) -> [(الهدف، معرف النسخة)]
+        self.cache: "OrderedDict[Tuple[int, int, int], List[Tuple[int, int]]]" = OrderedDict()
+        self.writer = WriteBehindBuffer('message_map', db.add_message_mappings)  # تجميع الكتابات في دفعات
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'recorded': 0
+        }
+    
+    async def start(self):
+        """تشغيل حفظ الكتابات المؤجلة"""
+        await self.writer.start()
+    
+    async def stop(self):
+        """حفظ جميع الكتابات المعلقة"""
+        await self.writer.stop()
+    
+    def cache_put(self, key: Tuple[int, int, int], copies: List[Tuple[int, int]]):
+        """إضافة مدخل للذاكرة مع إزالة الأقدم عند الامتلاء"""
+        self.cache[key] = copies
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+    
+    async def record(self, task_id: int, source_chat_id: int, copies: Dict[int, List[Tuple[int, int]]],
+                     complete: bool = True):
+        """تسجيل نسخ الرسائل: معرف الرسالة المصدر -> [(الهدف، معرف النسخة)]"""
+        rows = []
+        for source_message_id, targets in copies.items():
+            key = (task_id, source_chat_id, source_message_id)
+            if key in self.cache:
+                self.cache[key] = self.cache[key] + targets
+                self.cache.move_to_end(key)
+            elif complete:
+                # التسجيل الجزئي (مثل نجاح إعادة محاولة) لا يُنشئ مدخلاً ناقصاً في الذاكرة
+                self.cache_put(key, list(targets))
+            
+            rows.extend(
+                (task_id, source_chat_id, source_message_id, target_chat_id, target_message_id)
+                for target_chat_id, target_message_id in targets
+            )
+        
+        for row in rows:
+            self.writer.add(row)
+        self.stats['recorded'] += len(rows)
+    
+    async def lookup(self, source_chat_id: int, source_message_id: int,
+                     task_ids: List[int]) -> Dict[int, List[Tuple[int, int]]]:
+        """البحث عن نسخ رسالة مصدر لكل مهمة"""
+        results = {}
+        missing = []
+        
+        for task_id in task_ids:
+            key = (task_id, source_chat_id, source_message_id)
+            copies = self.cache.get(key)
+            if copies is None:
+                missing.append(task_id)
+            else:
+                self.cache.move_to_end(key)
+                results[task_id] = copies
+        
+        self.stats['hits'] += len(task_ids) - len(missing)
+        self.stats['misses'] += len(missing)
+        
+        if missing:
+            # الصفوف المعلقة يجب أن تصل للجدول قبل القراءة منه
+            await self.writer.drain()
+            
+            # استعلام واحد يستخدم المفتاح الأساسي (task_id, source_chat_id, source_message_id)
+            loaded = {task_id: [] for task_id in missing}
+            for row in await self.db.get_message_mappings(source_chat_id, source_message_id, missing):
+                loaded[row['task_id']].append((row['target_chat_id'], row['target_message_id']))
+            
+            for task_id, copies in loaded.items():
+                self.cache_put((task_id, source_chat_id, source_message_id), copies)
+                results[task_id] = copies
+        
+        return results
+    
+    async def forget(self, source_chat_id: int, source_message_id: int, task_ids: List[int]):
+        """حذف نسخ رسالة مصدر من الخريطة"""
+        for task_id in task_ids:
+            self.cache.pop((task_id, source_chat_id, source_message_id), None)
+        # حفظ المعلق أولاً حتى لا يُعاد إدخال ما حُذف
+        await self.writer.drain()
+        await self.db.delete_message_mappings(source_chat_id, source_message_id, task_ids)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات خريطة الرسائل"""
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'cached': len(self.cache),
+            'writer': self.writer.get_stats(),
+            'hit_rate': self.stats['hits'] / lookups if lookups else 0.0
+        }
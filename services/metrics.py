@@ -0,0 +1,172 @@
+"""
+مقاييس زمن وإنتاجية التوجيه
+Forwarding Latency Histograms and Counters
+"""
+
+import json
+import time
+from bisect import bisect_left
+from typing import Dict, List, Any, Optional, Tuple
+
+# حدود دلاء المدرجات بالثواني (الدلو الأخير لما هو أكبر)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# مراحل الزمن المقاسة
+STAGES = ('queue_wait', 'filter', 'processing', 'send', 'end_to_end')
+
+# العدادات
+COUNTERS = ('accepted', 'filtered', 'duplicate', 'delivered', 'failed', 'retried', 'recovered')
+
+class Histogram:
+    """مدرج تكراري بدلاء ثابتة"""
+    
+    __slots__ = ('counts', 'total', 'count', 'max')
+    
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+    
+    def observe(self, value: float):
+        """تسجيل قيمة"""
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+    
+    def quantile(self, q: float) -> float:
+        """تقدير النسبة المئوية من حدود الدلاء (الحد الأعلى للدلو الذي تقع فيه)"""
+        if not self.count:
+            return 0.0
+        
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return min(LATENCY_BUCKETS[index], self.max) if index < len(LATENCY_BUCKETS) else self.max
+        return self.max
+    
+    def get_summary(self) -> Dict[str, Any]:
+        """ملخص المدرج"""
+        return {
+            'count': self.count,
+            'avg': self.total / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'max': self.max
+        }
+
+class ForwardingMetrics:
+    """مدرجات زمن وعدادات لكل مهمة ولكل بوت"""
+    
+    def __init__(self):
+        # (النطاق، المعرف) -> المرحلة -> مدرج ؛ النطاق 'task' أو 'bot'
+        self.histograms: Dict[Tuple[str, Any], Dict[str, Histogram]] = {}
+        self.counters: Dict[Tuple[str, Any], Dict[str, int]] = {}
+        self.started_at = time.time()
+    
+    @staticmethod
+    def get_bot_id(bot_token: Optional[str]) -> Optional[str]:
+        """معرف البوت من الرمز (الجزء العام قبل النقطتين فقط)"""
+        return bot_token.split(':', 1)[0] if bot_token else None
+    
+    def get_scopes(self, task_id: Optional[int], bot_token: Optional[str]) -> List[Tuple[str, Any]]:
+        """النطاقات التي يُسجل فيها الحدث"""
+        scopes = []
+        if task_id is not None:
+            scopes.append(('task', task_id))
+        bot_id = self.get_bot_id(bot_token)
+        if bot_id:
+            scopes.append(('bot', bot_id))
+        return scopes
+    
+    def observe(self, stage: str, seconds: float, task_id: Optional[int] = None,
+                bot_token: Optional[str] = None):
+        """تسجيل زمن مرحلة"""
+        for scope in self.get_scopes(task_id, bot_token):
+            stages = self.histograms.get(scope)
+            if stages is None:
+                stages = self.histograms[scope] = {}
+            histogram = stages.get(stage)
+            if histogram is None:
+                histogram = stages[stage] = Histogram()
+            histogram.observe(seconds)
+    
+    def increment(self, name: str, task_id: Optional[int] = None, bot_token: Optional[str] = None,
+                  amount: int = 1):
+        """زيادة عداد"""
+        for scope in self.get_scopes(task_id, bot_token):
+            counters = self.counters.get(scope)
+            if counters is None:
+                counters = self.counters[scope] = dict.fromkeys(COUNTERS, 0)
+            counters[name] = counters.get(name, 0) + amount
+    
+    def forget_task(self, task_id: int):
+        """حذف مقاييس مهمة محذوفة"""
+        self.histograms.pop(('task', task_id), None)
+        self.counters.pop(('task', task_id), None)
+    
+    def get_scope_summary(self, scope: str, scope_id: Any) -> Dict[str, Any]:
+        """ملخص مقاييس مهمة أو بوت"""
+        key = (scope, scope_id)
+        return {
+            'counters': dict(self.counters.get(key) or dict.fromkeys(COUNTERS, 0)),
+            'latency': {
+                stage: histogram.get_summary()
+                for stage, histogram in (self.histograms.get(key) or {}).items()
+            }
+        }
+    
+    def get_summary(self) -> Dict[str, Any]:
+        """ملخص جميع المهام والبوتات"""
+        summary = {'uptime_seconds': time.time() - self.started_at, 'task': {}, 'bot': {}}
+        for scope, scope_id in set(self.histograms) | set(self.counters):
+            summary[scope][scope_id] = self.get_scope_summary(scope, scope_id)
+        return summary
+    
+    def get_top_tasks(self, limit: int = 10) -> List[Tuple[int, Dict[str, int]]]:
+        """المهام الأكثر نشاطاً حسب عدد الرسائل المقبولة"""
+        tasks = [(scope_id, counters) for (scope, scope_id), counters in self.counters.items() if scope == 'task']
+        tasks.sort(key=lambda item: item[1].get('accepted', 0), reverse=True)
+        return tasks[:limit]
+    
+    def export_json(self) -> str:
+        """تصدير المقاييس كـ JSON (مع الدلاء الخام)"""
+        data = self.get_summary()
+        data['buckets'] = list(LATENCY_BUCKETS)
+        data['histograms'] = [
+            {'scope': scope, 'id': scope_id, 'stage': stage, 'counts': histogram.counts, 'sum': histogram.total}
+            for (scope, scope_id), stages in self.histograms.items()
+            for stage, histogram in stages.items()
+        ]
+        return json.dumps(data, ensure_ascii=False, default=str)
+    
+    def export_prometheus(self) -> str:
+        """تصدير المقاييس بصيغة Prometheus النصية"""
+        lines = [
+            '# TYPE forwarding_stage_seconds histogram',
+        ]
+        for (scope, scope_id), stages in self.histograms.items():
+            for stage, histogram in stages.items():
+                labels = f'{scope}="{scope_id}",stage="{stage}"'
+                cumulative = 0
+                for bound, bucket_count in zip(LATENCY_BUCKETS, histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f'forwarding_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'forwarding_stage_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f'forwarding_stage_seconds_sum{{{labels}}} {histogram.total}')
+                lines.append(f'forwarding_stage_seconds_count{{{labels}}} {histogram.count}')
+        
+        lines.append('# TYPE forwarding_messages_total counter')
+        for (scope, scope_id), counters in self.counters.items():
+            for name, value in counters.items():
+                lines.append(f'forwarding_messages_total{{{scope}="{scope_id}",result="{name}"}} {value}')
+        
+        return '\n'.join(lines) + '\n'
+
+# مقاييس مشتركة بين خدمة التوجيه ولوحة الإدارة
+forwarding_metrics = ForwardingMetrics()
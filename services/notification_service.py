@@ -12,6 +12,7 @@ from telegram.error import TelegramError
 from database.db_manager import DatabaseManager
 from config.messages import NotificationMessages
 from utils.logger import BotLogger
+from services.rate_limiter import rate_limiter
 
 logger = BotLogger()
 
@@ -72,6 +73,7 @@ class NotificationService:
             icon = icons.get(notification_type, 'ℹ️')
             formatted_message = f"{icon} {message}"
             
+            await rate_limiter.acquire(self.bot.token, user_id)
             await self.bot.send_message(
                 chat_id=user_id,
                 text=formatted_message,
@@ -168,6 +170,23 @@ class NotificationService:
         for admin_id in admins:
             await self.queue_notification(admin_id, admin_message, 'error')
     
+    async def notify_target_unavailable(self, user_id: int, task_id: int, target_chat_id: int, error_message: str):
+        """إشعار صاحب المهمة بإيقاف الإرسال لهدف غير متاح"""
+        message = NotificationMessages.TARGET_UNAVAILABLE.format(
+            task_id=task_id,
+            target_chat_id=target_chat_id,
+            error_message=error_message
+        )
+        await self.queue_notification(user_id, message, 'warning', priority=3)
+    
+    async def notify_target_recovered(self, user_id: int, task_id: int, target_chat_id: int):
+        """إشعار صاحب المهمة بعودة الإرسال للهدف"""
+        message = NotificationMessages.TARGET_RECOVERED.format(
+            task_id=task_id,
+            target_chat_id=target_chat_id
+        )
+        await self.queue_notification(user_id, message, 'success')
+    
     async def notify_system_error(self, error_details: str):
         """إشعار خطأ في النظام"""
         message = NotificationMessages.SYSTEM_ERROR.format(error_details=error_details)
@@ -0,0 +1,202 @@
+"""
+صندوق الصادر الدائم لطابور التوجيه
+Durable Forwarding Outbox
+"""
+
+import asyncio
+import json
+import time
+from typing import Dict, List, Any, Tuple
+from telegram import Bot, Message
+from database.db_manager import DatabaseManager
+from utils.logger import BotLogger
+
+logger = BotLogger()
+
+class ForwardingOutbox:
+    """تسجيل مسبق لطلبات التوجيه في قاعدة البيانات مع تجميع عمليات الكتابة"""
+    
+    FLUSH_INTERVAL_SECONDS = 0.05  # أقصى مدة تبقى فيها الكتابات في الذاكرة قبل حفظها
+    MAX_BATCH_SIZE = 500  # حفظ فوري عند تجاوز هذا العدد من الكتابات المعلقة
+    PURGE_INTERVAL_SECONDS = 3600  # الفترة بين عمليات حذف السجلات المكتملة
+    
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+        self.pending_inserts: List[tuple] = []
+        self.pending_completions: List[tuple] = []
+        self.pending_spills: List[tuple] = []
+        self.pending_target_updates: List[tuple] = []
+        self.wakeup = asyncio.Event()
+        self.flusher = None
+        self.is_running = False
+        self.last_purge = time.monotonic()
+        self.stats = {
+            'written': 0,
+            'completed': 0,
+            'flushes': 0,
+            'recovered': 0,
+            'spilled': 0,
+            'refilled': 0,
+            'kept_open': 0
+        }
+    
+    @staticmethod
+    def get_entry_key(forward_data: Dict[str, Any]) -> str:
+        """مفتاح فريد لطلب التوجيه (المهمة + الرسالة المصدر)"""
+        message = forward_data['message']
+        return f"{forward_data['task']['id']}_{message.chat_id}_{message.message_id}"
+    
+    async def start(self):
+        """تشغيل معالج الحفظ الدوري"""
+        if not self.is_running:
+            self.is_running = True
+            self.flusher = asyncio.create_task(self.run_flusher())
+    
+    async def stop(self):
+        """إيقاف المعالج مع حفظ جميع الكتابات المعلقة"""
+        self.is_running = False
+        self.wakeup.set()
+        if self.flusher:
+            await asyncio.gather(self.flusher, return_exceptions=True)
+            self.flusher = None
+        self.flush()
+    
+    def add(self, forward_data: Dict[str, Any], delay: float = 0):
+        """تسجيل طلب توجيه جديد قبل إضافته للطابور"""
+        key = self.get_entry_key(forward_data)
+        messages = forward_data.get('album') or [forward_data['message']]
+        
+        forward_data['outbox_key'] = key
+        self.pending_inserts.append((
+            key,
+            forward_data['task']['id'],
+            forward_data['message'].chat_id,
+            json.dumps([message.to_dict() for message in messages], ensure_ascii=False),
+            time.time() + delay,
+            'backfill' if forward_data.get('backfill') else 'live'  # مسار الطابور بعد الاستعادة
+        ))
+        self.notify()
+    
+    def complete(self, forward_data: Dict[str, Any], status: str = 'done'):
+        """تسجيل انتهاء معالجة طلب التوجيه"""
+        key = forward_data.get('outbox_key')
+        if key:
+            self.pending_completions.append((status, key))
+            self.notify()
+    
+    def keep_open(self, outbox_key: str, targets: List[int]):
+        """إبقاء الطلب مفتوحاً للأهداف التي تنتظر إعادة المحاولة (تُستعاد وحدها بعد إعادة التشغيل)"""
+        if outbox_key:
+            self.pending_target_updates.append((json.dumps(sorted(targets)), outbox_key))
+            self.notify()
+    
+    def spill(self, forward_data: Dict[str, Any], shard: int):
+        """نقل طلب مسجل من طابور الذاكرة للقرص حتى يتوفر مكان في عامله"""
+        key = forward_data.get('outbox_key')
+        if key:
+            self.pending_spills.append((shard, key))
+            self.notify()
+    
+    def get_pending_count(self) -> int:
+        """عدد الكتابات المعلقة في الذاكرة"""
+        return (
+            len(self.pending_inserts) + len(self.pending_completions)
+            + len(self.pending_spills) + len(self.pending_target_updates)
+        )
+    
+    def notify(self):
+        """إيقاظ المعالج عند امتلاء الدفعة"""
+        if self.get_pending_count() >= self.MAX_BATCH_SIZE:
+            self.wakeup.set()
+    
+    async def run_flusher(self):
+        """حفظ الكتابات المعلقة دفعة واحدة كل فترة قصيرة"""
+        while self.is_running:
+            try:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=self.FLUSH_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self.wakeup.clear()
+                self.flush()
+                
+                if time.monotonic() - self.last_purge >= self.PURGE_INTERVAL_SECONDS:
+                    self.last_purge = time.monotonic()
+                    await self.db.purge_outbox_entries()
+            
+            except Exception as e:
+                logger.log_error(e, {'function': 'run_flusher'})
+                await asyncio.sleep(1)
+    
+    def flush(self):
+        """حفظ جميع الكتابات المعلقة في معاملة واحدة"""
+        if not self.get_pending_count():
+            return
+        
+        inserts, self.pending_inserts = self.pending_inserts, []
+        completions, self.pending_completions = self.pending_completions, []
+        spills, self.pending_spills = self.pending_spills, []
+        target_updates, self.pending_target_updates = self.pending_target_updates, []
+        
+        if self.db.flush_outbox(inserts, completions, spills, target_updates):
+            self.stats['written'] += len(inserts)
+            self.stats['completed'] += len(completions)
+            self.stats['spilled'] += len(spills)
+            self.stats['kept_open'] += len(target_updates)
+            self.stats['flushes'] += 1
+        else:
+            # إعادة الكتابات للمحاولة في الدفعة التالية
+            self.pending_inserts = inserts + self.pending_inserts
+            self.pending_completions = completions + self.pending_completions
+            self.pending_spills = spills + self.pending_spills
+            self.pending_target_updates = target_updates + self.pending_target_updates
+    
+    def decode_rows(self, rows: List[Dict[str, Any]], bot: Bot) -> List[Dict[str, Any]]:
+        """إعادة بناء الرسائل من سجلات صندوق الصادر"""
+        entries = []
+        
+        for row in rows:
+            try:
+                messages = [Message.de_json(data, bot) for data in json.loads(row['message_data'])]
+                entries.append({
+                    'outbox_key': row['entry_key'],
+                    'task_id': row['task_id'],
+                    'messages': messages,
+                    'backfill': row.get('lane') == 'backfill',
+                    # None: جميع أهداف المهمة، وإلا الأهداف التي كانت تنتظر إعادة المحاولة فقط
+                    'targets': json.loads(row['remaining_targets']) if row.get('remaining_targets') else None,
+                    'delay': max(0.0, row['due_at'] - time.time())
+                })
+            except Exception as e:
+                logger.log_error(e, {'function': 'decode_rows', 'entry_key': row['entry_key']})
+                self.pending_completions.append(('failed', row['entry_key']))
+        
+        return entries
+    
+    async def load_unfinished(self, bot: Bot) -> List[Dict[str, Any]]:
+        """تحميل الطلبات غير المكتملة (بما فيها المنقولة للقرص) من تشغيل سابق وإعادتها لحالة الانتظار"""
+        self.flush()
+        entries = self.decode_rows(await self.db.get_unfinished_outbox_entries(), bot)
+        self.stats['recovered'] += len(entries)
+        return entries
+    
+    async def load_spilled(self, bot: Bot, shard: int, limit: int) -> Tuple[List[Dict[str, Any]], int]:
+        """تحميل أقدم الطلبات المنقولة للقرص لعامل معين وإعادتها لحالة الانتظار"""
+        # حفظ عمليات النقل المعلقة أولاً حتى لا يفوت التحميل أياً منها
+        self.flush()
+        rows = await self.db.get_spilled_outbox_entries(shard, limit)
+        
+        for row in rows:
+            self.pending_completions.append(('pending', row['entry_key']))
+        self.notify()
+        
+        entries = self.decode_rows(rows, bot)
+        self.stats['refilled'] += len(entries)
+        return entries, len(rows)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات صندوق الصادر"""
+        return {
+            **self.stats,
+            'pending_writes': self.get_pending_count()
+        }
@@ -0,0 +1,174 @@
+"""
+خطط معالجة المحتوى المُجمّعة للمهام
+Compiled Per-Task Processing Plans
+"""
+
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Callable, Tuple
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+import emoji
+from utils.keyword_matcher import KeywordMatcher
+
+# الأنماط الثابتة تُجمّع مرة واحدة عند تحميل الوحدة (نفس أنماط TextProcessor.clean_text)
+URL_PATTERN = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\$$\$$,]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+HASHTAG_PATTERN = re.compile(r'#\w+')
+EMOJI_ALIAS_PATTERN = re.compile(r':[a-zA-Z_]+:')
+
+@dataclass(frozen=True)
+class ProcessingPlan:
+    """خطة معالجة ثابتة مبنية من إعدادات مهمة واحدة"""
+    
+    settings_hash: str
+    steps: Tuple[Callable[[str], str], ...]
+    header: Optional[str]
+    footer: Optional[str]
+    char_limit: int
+    reply_markup: Optional[InlineKeyboardMarkup]
+    
+    def apply(self, text: str) -> str:
+        """تطبيق الخطة على نص"""
+        if text:
+            for step in self.steps:
+                text = step(text)
+            text = text.strip()
+        
+        if self.header:
+            text = f"{self.header}\n\n{text}"
+        if self.footer:
+            text = f"{text}\n\n{self.footer}"
+        
+        if self.char_limit > 0 and len(text) > self.char_limit:
+            text = text[:self.char_limit - 3] + "..."
+        
+        return text
+
+def get_settings_hash(settings: Dict[str, Any]) -> str:
+    """بصمة الإعدادات المؤثرة في معالجة المحتوى"""
+    relevant = {
+        'text_processing': settings.get('text_processing', {}),
+        'char_limit': settings.get('advanced', {}).get('char_limit', 0),
+        'custom_buttons': settings.get('advanced', {}).get('custom_buttons', [])
+    }
+    encoded = json.dumps(relevant, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()
+
+def build_replacement_step(replacements: Dict[str, str]) -> Callable[[str], str]:
+    """دمج جميع الاستبدالات في نمط واحد يُطبق بمرور واحد على النص"""
+    # ترتيب الأطول أولاً ليُفضّل أطول تطابق عند نفس الموضع
+    keys = sorted(replacements, key=len, reverse=True)
+    pattern = re.compile('|'.join(re.escape(key) for key in keys))
+    
+    def replace(text: str) -> str:
+        return pattern.sub(lambda match: replacements[match.group(0)], text)
+    
+    return replace
+
+def build_line_filter_step(words) -> Callable[[str], str]:
+    """حذف الأسطر التي تحتوي على أي من الكلمات المحددة (آلة واحدة تُبنى مع الخطة)"""
+    return KeywordMatcher(words).remove_lines
+
+def build_reply_markup(custom_buttons) -> Optional[InlineKeyboardMarkup]:
+    """بناء لوحة الأزرار المخصصة مرة واحدة"""
+    if not custom_buttons:
+        return None
+    
+    keyboard = []
+    for button_row in custom_buttons:
+        row = []
+        for button in button_row:
+            row.append(InlineKeyboardButton(
+                text=button['text'],
+                url=button.get('url'),
+                callback_data=button.get('callback_data')
+            ))
+        keyboard.append(row)
+    return InlineKeyboardMarkup(keyboard)
+
+def compile_processing_plan(settings: Dict[str, Any], settings_hash: Optional[str] = None) -> ProcessingPlan:
+    """تجميع إعدادات مهمة إلى خطة معالجة ثابتة"""
+    text_processing = settings.get('text_processing', {})
+    advanced = settings.get('advanced', {})
+    steps = []
+    
+    # نفس ترتيب خطوات TextProcessor.clean_text
+    if text_processing.get('remove_links', False):
+        steps.append(lambda text: URL_PATTERN.sub('', text))
+    
+    if text_processing.get('remove_hashtags', False):
+        steps.append(lambda text: HASHTAG_PATTERN.sub('', text))
+    
+    if text_processing.get('remove_emojis', False):
+        steps.append(lambda text: EMOJI_ALIAS_PATTERN.sub('', emoji.demojize(text)))
+    
+    if text_processing.get('remove_lines_with_words'):
+        steps.append(build_line_filter_step(text_processing['remove_lines_with_words']))
+    
+    if text_processing.get('remove_empty_lines', False):
+        steps.append(lambda text: '\n'.join(line for line in text.split('\n') if line.strip()))
+    
+    replacements = {old: new for old, new in (text_processing.get('text_replacements') or {}).items() if old}
+    if replacements:
+        steps.append(build_replacement_step(replacements))
+    
+    return ProcessingPlan(
+        settings_hash=settings_hash or get_settings_hash(settings),
+        steps=tuple(steps),
+        header=text_processing.get('add_header'),
+        footer=text_processing.get('add_footer'),
+        char_limit=advanced.get('char_limit', 0) or 0,
+        reply_markup=build_reply_markup(advanced.get('custom_buttons', []))
+    )
+
+class ProcessingPlanCache:
+    """كاش خطط المعالجة حسب المهمة وبصمة إعداداتها"""
+    
+    def __init__(self):
+        # معرف المهمة -> (كائن الإعدادات، الخطة)
+        self.plans: Dict[int, Tuple[Dict[str, Any], ProcessingPlan]] = {}
+        self.stats = {
+            'compiled': 0,
+            'hits': 0,
+            'invalidated': 0
+        }
+    
+    def get(self, task: Dict[str, Any]) -> ProcessingPlan:
+        """الحصول على خطة المهمة، وتجميعها فقط عند تغير إعداداتها"""
+        settings = task['settings']
+        cached = self.plans.get(task['id'])
+        
+        # نفس كائن الإعدادات: لا حاجة لحساب البصمة
+        if cached and cached[0] is settings:
+            self.stats['hits'] += 1
+            return cached[1]
+        
+        settings_hash = get_settings_hash(settings)
+        if cached and cached[1].settings_hash == settings_hash:
+            # إعادة تحميل المهمة دون تغيير إعدادات المعالجة
+            plan = cached[1]
+            self.stats['hits'] += 1
+        else:
+            plan = compile_processing_plan(settings, settings_hash)
+            self.stats['compiled'] += 1
+        
+        self.plans[task['id']] = (settings, plan)
+        return plan
+    
+    def invalidate(self, task_id: int):
+        """إلغاء خطة مهمة بعد تحديثها"""
+        if self.plans.pop(task_id, None) is not None:
+            self.stats['invalidated'] += 1
+    
+    def retain(self, task_ids):
+        """حذف خطط المهام غير النشطة"""
+        for task_id in set(self.plans) - set(task_ids):
+            self.invalidate(task_id)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات كاش الخطط"""
+        return {**self.stats, 'plans': len(self.plans)}
+
+# كاش مشترك: يُلغى من خلاله أي خطة عند تحديث مهمتها
+processing_plans = ProcessingPlanCache()
@@ -0,0 +1,180 @@
+"""
+محدد معدل الإرسال المتوافق مع حدود تلغرام
+Telegram-Aware Rate Limiter
+"""
+
+import asyncio
+import time
+from typing import Dict, Any, Optional, Tuple
+from utils.logger import BotLogger
+
+logger = BotLogger()
+
+class TokenBucket:
+    """دلو رموز لتحديد معدل الطلبات"""
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate  # عدد الرموز المضافة في الثانية
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0  # حظر مؤقت بعد RetryAfter من الخادم
+    
+    def refill(self, now: float):
+        """إعادة ملء الدلو حسب الوقت المنقضي"""
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+    
+    def wait_time(self, now: float) -> float:
+        """الوقت المتبقي حتى توفر رمز واحد"""
+        self.refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+    
+    def consume(self):
+        """استهلاك رمز واحد"""
+        self.tokens -= 1
+    
+    def is_idle(self, now: float) -> bool:
+        """فحص إذا كان الدلو ممتلئاً وغير محظور"""
+        self.refill(now)
+        return self.tokens >= self.capacity and self.blocked_until <= now
+
+class TelegramRateLimiter:
+    """محدد معدل هرمي: لكل بوت، ثم لكل دردشة، ثم حسب نوع الدردشة"""
+    
+    # حدود تلغرام التقريبية (المعدل في الثانية، السعة)
+    BOT_LIMIT = (30.0, 30)  # 30 رسالة/ثانية لكل بوت
+    CHAT_LIMIT = (1.0, 1)  # رسالة واحدة/ثانية لكل دردشة
+    CHAT_TYPE_LIMITS = {
+        'group': (20 / 60, 20),  # 20 رسالة/دقيقة لكل مجموعة
+        'supergroup': (20 / 60, 20),
+        'channel': (20 / 60, 20)
+    }
+    
+    MAX_IDLE_BUCKETS = 10000  # تنظيف الدلاء الخاملة عند تجاوز هذا العدد
+    CLEANUP_INTERVAL = 60  # أقل فترة بين عمليتي تنظيف (ثانية)
+    
+    def __init__(self):
+        self.buckets: Dict[Tuple, TokenBucket] = {}
+        self.stats = {
+            'acquired': 0,
+            'waited': 0,
+            'total_wait_seconds': 0.0,
+            'max_wait_seconds': 0.0,
+            'retry_after_events': 0
+        }
+        self.bot_stats: Dict[str, Dict[str, float]] = {}
+        self.last_cleanup = time.monotonic()
+    
+    @staticmethod
+    def get_bot_key(bot_token: str) -> str:
+        """مفتاح البوت (معرف البوت فقط دون الجزء السري من التوكن)"""
+        return bot_token.split(':', 1)[0] if bot_token else 'default'
+    
+    @staticmethod
+    def infer_chat_type(chat_id: int) -> str:
+        """تخمين نوع الدردشة من المعرف"""
+        return 'private' if chat_id > 0 else 'group'
+    
+    def get_bucket(self, key: Tuple, limit: Tuple[float, float]) -> TokenBucket:
+        """الحصول على دلو أو إنشاؤه"""
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(*limit)
+            self.buckets[key] = bucket
+        return bucket
+    
+    def get_chain(self, bot_key: str, chat_id: int, chat_type: str) -> list:
+        """سلسلة الدلاء التي يجب أن يمر بها الطلب"""
+        chain = [
+            self.get_bucket(('bot', bot_key), self.BOT_LIMIT),
+            self.get_bucket(('chat', bot_key, chat_id), self.CHAT_LIMIT)
+        ]
+        type_limit = self.CHAT_TYPE_LIMITS.get(chat_type)
+        if type_limit:
+            chain.append(self.get_bucket(('type', bot_key, chat_id), type_limit))
+        return chain
+    
+    async def acquire(self, bot_token: str, chat_id: int, chat_type: Optional[str] = None) -> float:
+        """انتظار رمز إرسال لهدف معين وإرجاع مدة الانتظار"""
+        bot_key = self.get_bot_key(bot_token)
+        chat_type = chat_type or self.infer_chat_type(chat_id)
+        started_at = time.monotonic()
+        
+        while True:
+            now = time.monotonic()
+            chain = self.get_chain(bot_key, chat_id, chat_type)
+            wait = max(bucket.wait_time(now) for bucket in chain)
+            
+            if wait <= 0:
+                # الاستهلاك من جميع المستويات معاً لتجنب الحجز الجزئي
+                for bucket in chain:
+                    bucket.consume()
+                break
+            
+            await asyncio.sleep(wait)
+        
+        waited = time.monotonic() - started_at
+        self.record_wait(bot_key, waited)
+        self.cleanup_idle_buckets()
+        return waited
+    
+    def report_retry_after(self, bot_token: str, chat_id: Optional[int], retry_after: float):
+        """إيقاف الإرسال مؤقتاً بعد استلام RetryAfter من تلغرام"""
+        bot_key = self.get_bot_key(bot_token)
+        blocked_until = time.monotonic() + retry_after
+        
+        if chat_id is None:
+            bucket = self.get_bucket(('bot', bot_key), self.BOT_LIMIT)
+        else:
+            bucket = self.get_bucket(('chat', bot_key, chat_id), self.CHAT_LIMIT)
+        
+        bucket.blocked_until = max(bucket.blocked_until, blocked_until)
+        self.stats['retry_after_events'] += 1
+        logger.logger.warning(f"RetryAfter للبوت {bot_key} والدردشة {chat_id}: {retry_after} ثانية")
+    
+    def record_wait(self, bot_key: str, waited: float):
+        """تسجيل إحصائيات الانتظار"""
+        self.stats['acquired'] += 1
+        bot_stats = self.bot_stats.setdefault(bot_key, {
+            'acquired': 0, 'waited': 0, 'total_wait_seconds': 0.0, 'max_wait_seconds': 0.0
+        })
+        bot_stats['acquired'] += 1
+        
+        if waited > 0.001:
+            for stats in (self.stats, bot_stats):
+                stats['waited'] += 1
+                stats['total_wait_seconds'] += waited
+                stats['max_wait_seconds'] = max(stats['max_wait_seconds'], waited)
+    
+    def cleanup_idle_buckets(self):
+        """حذف الدلاء الممتلئة غير المستخدمة للحد من استهلاك الذاكرة"""
+        now = time.monotonic()
+        if len(self.buckets) <= self.MAX_IDLE_BUCKETS or now - self.last_cleanup < self.CLEANUP_INTERVAL:
+            return
+        
+        self.last_cleanup = now
+        idle_keys = [
+            key for key, bucket in self.buckets.items()
+            if key[0] != 'bot' and bucket.is_idle(now)
+        ]
+        for key in idle_keys:
+            del self.buckets[key]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """الحصول على إحصائيات محدد المعدل"""
+        acquired = self.stats['acquired']
+        return {
+            **self.stats,
+            'avg_wait_seconds': self.stats['total_wait_seconds'] / acquired if acquired else 0.0,
+            'buckets': len(self.buckets),
+            'bots': {key: dict(value) for key, value in self.bot_stats.items()}
+        }
+
+# محدد مشترك بين جميع مسارات الإرسال
+rate_limiter = TelegramRateLimiter()
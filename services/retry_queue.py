@@ -0,0 +1,237 @@
+"""
+طابور إعادة المحاولة وتخزين الرسائل الفاشلة
+Retry Queue and Dead-Letter Storage
+"""
+
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from datetime import timedelta
+from typing import Dict, List, Any, Optional, Callable, Awaitable
+from telegram import Bot
+from telegram.error import TelegramError, RetryAfter
+from database.db_manager import DatabaseManager
+from utils.logger import BotLogger
+from services.rate_limiter import rate_limiter
+
+logger = BotLogger()
+
+def get_retry_after_seconds(error: RetryAfter) -> float:
+    """استخراج مدة الانتظار المطلوبة من خطأ RetryAfter"""
+    retry_after = error.retry_after
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+class DeadLetterQueue:
+    """مخزن الرسائل التي استنفدت محاولات الإرسال"""
+    
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+    
+    async def add(self, item: Dict[str, Any], error: str) -> int:
+        """إضافة عملية إرسال فاشلة للمخزن"""
+        task = item['task']
+        message = item['message']
+        processed_content = item.get('processed_content') or {}
+        
+        payload = {
+            'forward_type': task['forward_type'],
+            'text': processed_content.get('text'),
+            'caption': processed_content.get('caption')
+        }
+        
+        if item.get('album'):
+            # الألبوم يُعاد إرساله كاملاً بمعرفات رسائله الأصلية
+            payload['message_ids'] = [album_message.message_id for album_message in item['album']]
+        
+        return await self.db.add_dead_letter(
+            task_id=task['id'],
+            source_chat_id=message.chat_id,
+            source_message_id=message.message_id,
+            target_chat_id=item['target_chat_id'],
+            attempts=item.get('attempt', 0),
+            last_error=error,
+            payload=payload
+        )
+    
+    async def get_pending(self, task_id: Optional[int] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """الحصول على الرسائل المعلقة في المخزن"""
+        return await self.db.get_dead_letters(status='pending', task_id=task_id, limit=limit)
+    
+    async def get_summary(self) -> Dict[str, Any]:
+        """ملخص محتوى المخزن"""
+        return await self.db.get_dead_letters_stats()
+    
+    async def replay(self, bot: Bot, task_id: Optional[int] = None, limit: int = 100) -> Dict[str, int]:
+        """إعادة إرسال الرسائل المخزنة دفعة واحدة"""
+        dead_letters = await self.get_pending(task_id=task_id, limit=limit)
+        results = {'total': len(dead_letters), 'replayed': 0, 'failed': 0}
+        
+        for dead_letter in dead_letters:
+            try:
+                await rate_limiter.acquire(bot.token, dead_letter['target_chat_id'])
+                await self.resend(bot, dead_letter)
+                await self.db.mark_dead_letter_replayed(dead_letter['id'])
+                results['replayed'] += 1
+            
+            except RetryAfter as e:
+                # إيقاف الدفعة واحترام مهلة الخادم
+                rate_limiter.report_retry_after(bot.token, dead_letter['target_chat_id'], get_retry_after_seconds(e))
+                await self.db.update_dead_letter_error(dead_letter['id'], str(e))
+                results['failed'] += 1
+                break
+            
+            except TelegramError as e:
+                await self.db.update_dead_letter_error(dead_letter['id'], str(e))
+                results['failed'] += 1
+        
+        return results
+    
+    async def resend(self, bot: Bot, dead_letter: Dict[str, Any]):
+        """إعادة إرسال رسالة واحدة من المخزن"""
+        payload = dead_letter['payload']
+        
+        if payload.get('message_ids'):
+            send_album = bot.forward_messages if payload.get('forward_type') == 'forward' else bot.copy_messages
+            await send_album(
+                chat_id=dead_letter['target_chat_id'],
+                from_chat_id=dead_letter['source_chat_id'],
+                message_ids=payload['message_ids']
+            )
+        elif payload.get('forward_type') == 'forward':
+            await bot.forward_message(
+                chat_id=dead_letter['target_chat_id'],
+                from_chat_id=dead_letter['source_chat_id'],
+                message_id=dead_letter['source_message_id']
+            )
+        elif payload.get('text') is not None:
+            await bot.send_message(
+                chat_id=dead_letter['target_chat_id'],
+                text=payload['text'],
+                parse_mode='HTML'
+            )
+        else:
+            await bot.copy_message(
+                chat_id=dead_letter['target_chat_id'],
+                from_chat_id=dead_letter['source_chat_id'],
+                message_id=dead_letter['source_message_id'],
+                caption=payload.get('caption'),
+                parse_mode='HTML'
+            )
+
+class RetryQueue:
+    """طابور مؤجل لإعادة محاولة الإرسال الفاشل"""
+    
+    MAX_RETRIES = 5
+    BASE_BACKOFF_SECONDS = 2.0
+    MAX_BACKOFF_SECONDS = 300.0
+    MAX_CONCURRENT_RETRIES = 20
+    
+    def __init__(self, db: DatabaseManager, deliver_callback: Callable[[Dict[str, Any]], Awaitable[Any]]):
+        self.deliver_callback = deliver_callback
+        self.dead_letters = DeadLetterQueue(db)
+        self.pending = []  # كومة (وقت الاستحقاق، ترتيب، العنصر)
+        self.sequence = itertools.count()
+        self.wakeup = asyncio.Event()
+        self.semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_RETRIES)
+        self.is_running = False
+        self.stats = {
+            'scheduled': 0,
+            'retried': 0,
+            'flood_waits': 0,
+            'dead_lettered': 0
+        }
+    
+    async def start(self):
+        """بدء معالج إعادة المحاولة"""
+        if not self.is_running:
+            self.is_running = True
+            asyncio.create_task(self.process_retries())
+    
+    async def stop(self):
+        """إيقاف معالج إعادة المحاولة"""
+        self.is_running = False
+        self.wakeup.set()
+    
+    def get_backoff_delay(self, attempt: int) -> float:
+        """حساب مدة الانتظار التصاعدية مع عشوائية بسيطة"""
+        delay = min(self.BASE_BACKOFF_SECONDS * (2 ** (attempt - 1)), self.MAX_BACKOFF_SECONDS)
+        return delay + random.uniform(0, delay * 0.1)
+    
+    async def schedule(self, item: Dict[str, Any], error: Exception, retry_after: Optional[float] = None) -> bool:
+        """جدولة إعادة محاولة، أو نقل العنصر للمخزن عند استنفاد المحاولات"""
+        attempt = item.get('attempt', 0) + 1
+        item['attempt'] = attempt
+        item['last_error'] = str(error)
+        
+        if attempt > self.MAX_RETRIES:
+            await self.move_to_dead_letters(item)
+            return False
+        
+        if retry_after is not None:
+            # احترام المهلة التي حددها الخادم بدقة
+            delay = retry_after
+            self.stats['flood_waits'] += 1
+        else:
+            delay = self.get_backoff_delay(attempt)
+        
+        heapq.heappush(self.pending, (time.monotonic() + delay, next(self.sequence), item))
+        self.stats['scheduled'] += 1
+        self.wakeup.set()
+        return True
+    
+    async def move_to_dead_letters(self, item: Dict[str, Any]):
+        """نقل عنصر استنفد محاولاته إلى مخزن الرسائل الفاشلة"""
+        try:
+            await self.dead_letters.add(item, item.get('last_error', ''))
+            self.stats['dead_lettered'] += 1
+            logger.logger.warning(
+                f"تم نقل رسالة المهمة {item['task']['id']} للهدف {item['target_chat_id']} "
+                f"إلى مخزن الرسائل الفاشلة بعد {item['attempt'] - 1} محاولة"
+            )
+        except Exception as e:
+            logger.log_error(e, {'function': 'move_to_dead_letters', 'task_id': item['task']['id']})
+    
+    async def process_retries(self):
+        """إطلاق العناصر المستحقة لإعادة الإرسال"""
+        while self.is_running:
+            try:
+                if not self.pending:
+                    self.wakeup.clear()
+                    await self.wakeup.wait()
+                    continue
+                
+                due_at = self.pending[0][0]
+                wait = due_at - time.monotonic()
+                if wait > 0:
+                    self.wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self.wakeup.wait(), timeout=wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                
+                _, _, item = heapq.heappop(self.pending)
+                await self.semaphore.acquire()
+                asyncio.create_task(self.run_retry(item))
+            
+            except Exception as e:
+                logger.log_error(e, {'function': 'process_retries'})
+                await asyncio.sleep(1)
+    
+    async def run_retry(self, item: Dict[str, Any]):
+        """تنفيذ محاولة إرسال واحدة"""
+        try:
+            self.stats['retried'] += 1
+            await self.deliver_callback(item)
+        except Exception as e:
+            logger.log_error(e, {'function': 'run_retry', 'task_id': item['task']['id']})
+        finally:
+            self.semaphore.release()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات طابور إعادة المحاولة"""
+        return {**self.stats, 'pending': len(self.pending)}
@@ -12,6 +12,7 @@ from telegram.error import TelegramError
 from database.db_manager import DatabaseManager
 from utils.helpers import TimeHelper
 from utils.logger import BotLogger
+from services.rate_limiter import rate_limiter
 
 logger = BotLogger()
 
@@ -82,13 +83,13 @@ class MessageScheduler:
             
             for target_id in target_ids:
                 try:
+                    await rate_limiter.acquire(user_bot_token, target_id)
                     await bot.send_message(
                         chat_id=target_id,
                         text=message_text,
                         parse_mode='HTML'
                     )
                     sent_count += 1
-                    await asyncio.sleep(0.1)  # تأخير صغير
                     
                 except TelegramError as e:
                     failed_count += 1
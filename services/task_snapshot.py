@@ -0,0 +1,67 @@
+"""
+لقطة المهام النشطة وفهرس التوجيه
+Versioned Active Task Snapshot
+"""
+
+import json
+from typing import Dict, List, Any, Optional, Tuple
+
+Route = Tuple[Dict[str, Any], str]  # (المهمة، مفتاح الفلاتر)
+
+def get_filters_key(task: Dict[str, Any]) -> str:
+    """مفتاح الفلاتر يسمح بمشاركة نتيجة الفحص بين المهام ذات الفلاتر المتطابقة"""
+    return json.dumps(task['settings'].get('filters', {}), sort_keys=True, ensure_ascii=False)
+
+class TaskSnapshot:
+    """لقطة ثابتة للمهام النشطة؛ التعديل ينشئ لقطة جديدة فلا يرى القارئ حالة نصف محدثة"""
+    
+    def __init__(self, version: int, tasks: Dict[int, Dict[str, Any]], source_index: Dict[int, List[Route]],
+                 task_versions: Dict[int, int]):
+        self.version = version
+        self.tasks = tasks  # معرف المهمة -> المهمة
+        self.source_index = source_index  # معرف المصدر -> المهام المرتبطة به
+        self.task_versions = task_versions  # معرف المهمة -> إصدار اللقطة الذي تغيرت فيه آخر مرة
+    
+    @classmethod
+    def build(cls, tasks: List[Dict[str, Any]], version: int = 0) -> 'TaskSnapshot':
+        """بناء لقطة كاملة من قائمة المهام"""
+        source_index = {}
+        for task in tasks:
+            source_index.setdefault(task['source_chat_id'], []).append((task, get_filters_key(task)))
+        
+        return cls(
+            version,
+            {task['id']: task for task in tasks},
+            source_index,
+            {task['id']: version for task in tasks}
+        )
+    
+    def get_task_version(self, task_id: int) -> int:
+        """إصدار المهمة (يتغير عند كل تعديل عليها)"""
+        return self.task_versions.get(task_id, 0)
+    
+    def with_task(self, task_id: int, task: Optional[Dict[str, Any]]) -> 'TaskSnapshot':
+        """لقطة جديدة بعد إضافة مهمة أو استبدالها أو حذفها (None) دون إعادة بناء الباقي"""
+        version = self.version + 1
+        tasks = dict(self.tasks)
+        source_index = dict(self.source_index)
+        task_versions = dict(self.task_versions)
+        
+        old_task = tasks.pop(task_id, None)
+        task_versions.pop(task_id, None)
+        if old_task:
+            # قائمة جديدة للمصدر القديم؛ القوائم في اللقطة السابقة لا تُعدل
+            routes = [route for route in source_index.get(old_task['source_chat_id'], []) if route[0]['id'] != task_id]
+            if routes:
+                source_index[old_task['source_chat_id']] = routes
+            else:
+                source_index.pop(old_task['source_chat_id'], None)
+        
+        if task:
+            tasks[task_id] = task
+            task_versions[task_id] = version
+            source_index[task['source_chat_id']] = (
+                source_index.get(task['source_chat_id'], []) + [(task, get_filters_key(task))]
+            )
+        
+        return TaskSnapshot(version, tasks, source_index, task_versions)
@@ -0,0 +1,133 @@
+"""
+تجميع الكتابات المؤجلة لقاعدة البيانات
+Write-Behind Batch Buffer
+"""
+
+import asyncio
+import time
+from typing import Dict, List, Any, Callable, Awaitable
+from utils.logger import BotLogger
+
+logger = BotLogger()
+
+class WriteBehindBuffer:
+    """تجميع صفوف الكتابة في الذاكرة وحفظها دفعة واحدة كل N صف أو T ميلي ثانية"""
+    
+    DEFAULT_MAX_BATCH_SIZE = 500
+    DEFAULT_FLUSH_INTERVAL_MS = 200
+    MAX_PENDING_ROWS = 50000  # حد الذاكرة عند تعطل قاعدة البيانات؛ الأقدم يُحذف بعده
+    
+    def __init__(self, name: str, flush_callback: Callable[[List[tuple]], Awaitable[bool]],
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 flush_interval_ms: int = DEFAULT_FLUSH_INTERVAL_MS):
+        self.name = name
+        self.flush_callback = flush_callback  # تكتب الصفوف في معاملة واحدة وتعيد True عند النجاح
+        self.max_batch_size = max(1, max_batch_size)
+        self.flush_interval = max(1, flush_interval_ms) / 1000
+        self.pending: List[tuple] = []
+        self.wakeup = asyncio.Event()
+        self.flusher = None
+        self.is_running = False
+        self.stats = {
+            'rows_added': 0,
+            'rows_written': 0,
+            'rows_discarded': 0,
+            'flushes': 0,
+            'failed_flushes': 0,
+            'last_batch_size': 0,
+            'max_batch_size_seen': 0,
+            'total_flush_seconds': 0.0,
+            'max_flush_seconds': 0.0
+        }
+    
+    async def start(self):
+        """تشغيل معالج الحفظ الدوري"""
+        if not self.is_running:
+            self.is_running = True
+            self.flusher = asyncio.create_task(self.run_flusher())
+    
+    async def stop(self):
+        """إيقاف المعالج مع حفظ جميع الصفوف المعلقة"""
+        self.is_running = False
+        self.wakeup.set()
+        if self.flusher:
+            await asyncio.gather(self.flusher, return_exceptions=True)
+            self.flusher = None
+        
+        if not await self.drain():
+            logger.logger.error(f"تعذر حفظ {len(self.pending)} صف معلق في {self.name} عند الإيقاف")
+    
+    def add(self, row: tuple):
+        """إضافة صف للحفظ لاحقاً"""
+        self.pending.append(row)
+        self.stats['rows_added'] += 1
+        
+        if len(self.pending) > self.MAX_PENDING_ROWS:
+            discarded = len(self.pending) - self.MAX_PENDING_ROWS
+            del self.pending[:discarded]
+            self.stats['rows_discarded'] += discarded
+        
+        if len(self.pending) >= self.max_batch_size:
+            self.wakeup.set()
+    
+    async def run_flusher(self):
+        """حفظ الصفوف المعلقة عند امتلاء الدفعة أو انتهاء المهلة"""
+        while self.is_running:
+            try:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self.wakeup.clear()
+                await self.flush()
+            
+            except Exception as e:
+                logger.log_error(e, {'function': 'run_flusher', 'buffer': self.name})
+                await asyncio.sleep(1)
+    
+    async def flush(self) -> bool:
+        """حفظ دفعة واحدة من الصفوف المعلقة"""
+        if not self.pending:
+            return True
+        
+        batch = self.pending[:self.max_batch_size]
+        del self.pending[:len(batch)]
+        
+        started_at = time.monotonic()
+        written = await self.flush_callback(batch)
+        elapsed = time.monotonic() - started_at
+        
+        if not written:
+            # إعادة الدفعة لمقدمة الطابور للمحاولة التالية
+            self.pending = batch + self.pending
+            self.stats['failed_flushes'] += 1
+            return False
+        
+        self.stats['rows_written'] += len(batch)
+        self.stats['flushes'] += 1
+        self.stats['last_batch_size'] = len(batch)
+        self.stats['max_batch_size_seen'] = max(self.stats['max_batch_size_seen'], len(batch))
+        self.stats['total_flush_seconds'] += elapsed
+        self.stats['max_flush_seconds'] = max(self.stats['max_flush_seconds'], elapsed)
+        
+        if self.pending:
+            # ما زالت هناك صفوف معلقة من دفعة كبيرة
+            self.wakeup.set()
+        return True
+    
+    async def drain(self) -> bool:
+        """حفظ جميع الصفوف المعلقة الآن (مثلاً قبل قراءة تعتمد عليها)"""
+        while self.pending:
+            if not await self.flush():
+                return False
+        return True
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات المجمع"""
+        flushes = self.stats['flushes']
+        return {
+            **self.stats,
+            'pending': len(self.pending),
+            'avg_batch_size': self.stats['rows_written'] / flushes if flushes else 0.0,
+            'avg_flush_seconds': self.stats['total_flush_seconds'] / flushes if flushes else 0.0
+        }
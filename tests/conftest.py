@@ -0,0 +1,9 @@
+"""
+إعدادات الاختبارات المشتركة
+Shared Test Configuration
+"""
+
+import os
+
+# الإعدادات تُقرأ عند الاستيراد وتتطلب رمز البوت
+os.environ.setdefault('BOT_TOKEN', '123:test')
@@ -0,0 +1,19 @@
+"""
+اختبارات معالج الإدارة
+Admin Handler Tests
+"""
+
+from unittest.mock import MagicMock
+from handlers.admin_handler import AdminHandler
+from services.message_forwarder import MessageForwarder
+
+def test_forwarding_stats_are_formatted_from_live_forwarder():
+    """إحصائيات مسار التوجيه تُعرض من خدمة التوجيه الفعلية"""
+    forwarder = MessageForwarder(MagicMock())
+    forwarder.circuit_breaker.record_failure('123:test', -1002, Exception("chat not found"))
+    
+    text = AdminHandler.format_forwarding_stats(forwarder.get_stats())
+    
+    assert "طابور التوجيه" in text
+    assert "كشف التكرار" in text
+    assert "وضع اللحاق" in text
@@ -0,0 +1,56 @@
+"""
+اختبارات نسخ السجل
+History Backfill Tests
+"""
+
+import pytest
+from unittest.mock import MagicMock
+from telegram import Message
+from services.backfill import BackfillEngine
+
+SOURCE_CHAT = {'id': -1001, 'type': 'channel', 'title': "المصدر"}
+BOT_USER = {'id': 42, 'is_bot': True, 'first_name': "البوت"}
+POSTED_AT = 1700000000
+STAGED_AT = 1800000000
+
+@pytest.fixture
+def engine():
+    return BackfillEngine(MagicMock(), MagicMock())
+
+def make_staged(origin: dict) -> dict:
+    """النسخة الوسيطة كما يعيدها forward_message"""
+    return {
+        'message_id': 900,
+        'date': STAGED_AT,
+        'chat': {'id': 5, 'type': 'private', 'first_name': "وسيط"},
+        'from': BOT_USER,
+        'text': "منشور",
+        'forward_origin': origin
+    }
+
+def test_plain_post_drops_staging_forward_fields(engine):
+    """منشور عادي: تُحذف حقول التوجيه ويعود تاريخه الأصلي"""
+    staged = make_staged({
+        'type': 'channel', 'chat': SOURCE_CHAT, 'message_id': 15, 'date': POSTED_AT
+    })
+    
+    message = Message.de_json(engine.restore_source_message(staged, SOURCE_CHAT, 15), None)
+    
+    assert message.chat_id == SOURCE_CHAT['id']
+    assert message.message_id == 15
+    assert message.forward_origin is None
+    assert message.date.timestamp() == POSTED_AT
+    assert message.sender_chat.id == SOURCE_CHAT['id']
+
+def test_forwarded_post_keeps_forward_metadata(engine):
+    """منشور معاد توجيهه في المصدر يبقى معاد توجيه للفلاتر"""
+    other_channel = {'id': -1009, 'type': 'channel', 'title': "قناة أخرى"}
+    staged = make_staged({
+        'type': 'channel', 'chat': other_channel, 'message_id': 3, 'date': POSTED_AT
+    })
+    
+    message = Message.de_json(engine.restore_source_message(staged, SOURCE_CHAT, 15), None)
+    
+    assert message.chat_id == SOURCE_CHAT['id']
+    assert message.forward_origin.chat.id == other_channel['id']
+    assert message.from_user is None
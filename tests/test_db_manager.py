@@ -0,0 +1,58 @@
+"""
+اختبارات مدير قاعدة البيانات
+Database Manager Tests
+"""
+
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock
+from database.db_manager import DatabaseManager
+
+USER_ID = 42
+
+async def make_db_with_task():
+    """قاعدة بيانات في الذاكرة بمستخدم ومهمة ومستمع لتغييرات المهام"""
+    db = DatabaseManager(':memory:')
+    await db.initialize()
+    await db.add_user(USER_ID, 'owner')
+    task_id = await db.create_task(USER_ID, 'task', -1001, [-1002])
+    listener = AsyncMock()
+    db.add_task_listener(listener)
+    return db, task_id, listener
+
+@pytest.mark.asyncio
+async def test_premium_activation_notifies_owner_tasks():
+    """تفعيل الاشتراك يحدّث مهام المستخدم في الذاكرة"""
+    db, task_id, listener = await make_db_with_task()
+    
+    await db.set_premium(USER_ID, days=30)
+    
+    listener.assert_awaited_once_with(task_id, 'updated')
+    task = await db.get_active_task(task_id)
+    assert task['owner_is_premium']
+    assert task['owner_premium_until'] > datetime.now().timestamp()
+
+@pytest.mark.asyncio
+async def test_trial_and_deactivation_notify_owner_tasks():
+    """بدء التجربة وإلغاء الاشتراك يحدّثان مهام المستخدم"""
+    db, task_id, listener = await make_db_with_task()
+    
+    assert await db.activate_trial(USER_ID)
+    await db.deactivate_premium(USER_ID)
+    
+    assert listener.await_count == 2
+    assert not (await db.get_active_task(task_id))['owner_is_premium']
+
+@pytest.mark.asyncio
+async def test_expired_premium_notifies_owner_tasks():
+    """اكتشاف انتهاء الاشتراك يعيد مهام المستخدم للمسار المجاني"""
+    db, task_id, listener = await make_db_with_task()
+    db.execute_update(
+        "UPDATE users SET is_premium = TRUE, premium_expires = ? WHERE user_id = ?",
+        (datetime.now() - timedelta(hours=1), USER_ID)
+    )
+    
+    assert not await db.check_premium(USER_ID)
+    
+    listener.assert_awaited_once_with(task_id, 'updated')
+    assert not (await db.get_active_task(task_id))['owner_is_premium']
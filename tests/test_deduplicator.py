@@ -0,0 +1,50 @@
+"""
+اختبارات كشف التكرار
+Deduplication Tests
+"""
+
+from unittest.mock import MagicMock
+from services.deduplicator import ContentDeduplicator, get_content_fingerprint
+
+TARGET_CHAT_ID = -1002
+
+def make_photo(file_unique_id: str, caption=None) -> MagicMock:
+    """رسالة صورة"""
+    message = MagicMock()
+    message.photo = [MagicMock(file_unique_id=file_unique_id)]
+    message.caption = caption
+    message.text = None
+    return message
+
+def test_same_source_repost_is_not_duplicate():
+    """إعادة النشر من نفس المصدر لا تُتخطى"""
+    deduplicator = ContentDeduplicator(3600)
+    
+    assert not deduplicator.check_and_add(TARGET_CHAT_ID, 't:abc', -1001)
+    assert not deduplicator.check_and_add(TARGET_CHAT_ID, 't:abc', -1001)
+
+def test_content_from_another_source_is_duplicate():
+    """نفس المحتوى من مصدر آخر يُتخطى مرة واحدة فقط حتى مع التزامن"""
+    deduplicator = ContentDeduplicator(3600)
+    
+    assert not deduplicator.check_and_add(TARGET_CHAT_ID, 't:abc', -1001)
+    assert deduplicator.check_and_add(TARGET_CHAT_ID, 't:abc', -1003)
+    assert not deduplicator.check_and_add(-1004, 't:abc', -1003)
+
+def test_discarded_content_can_arrive_from_another_source():
+    """المحتوى الذي فشل إرساله لا يمنع نسخته من مصدر آخر"""
+    deduplicator = ContentDeduplicator(3600)
+    deduplicator.check_and_add(TARGET_CHAT_ID, 't:abc', -1001)
+    
+    deduplicator.discard(TARGET_CHAT_ID, 't:abc', -1001)
+    
+    assert not deduplicator.check_and_add(TARGET_CHAT_ID, 't:abc', -1003)
+
+def test_media_fingerprint_includes_caption():
+    """نفس الصورة بتعليق مختلف لها بصمة مختلفة"""
+    first = get_content_fingerprint([make_photo('photo-1', "الخبر الأول")])
+    second = get_content_fingerprint([make_photo('photo-1', "الخبر الثاني")])
+    same = get_content_fingerprint([make_photo('photo-1', "  الخبر   الأول ")])
+    
+    assert first != second
+    assert first == same
@@ -0,0 +1,70 @@
+"""
+اختبارات مطابقة الدومينات
+Domain Matcher Tests
+"""
+
+from utils.domain_matcher import DomainMatcher, DomainMatcherCache, normalize_domain_rule
+
+def test_rule_normalization_strips_url_parts():
+    """القاعدة المكتوبة كرابط تُختصر إلى الدومين"""
+    assert normalize_domain_rule('https://user@Example.COM:8443/path?q=1') == ('example.com', False)
+    assert normalize_domain_rule('*.x.com') == ('x.com', True)
+    assert normalize_domain_rule('.x.com.') == ('x.com', True)
+    assert normalize_domain_rule('  ') == ('', False)
+
+def test_rule_matches_domain_and_subdomains():
+    """القاعدة العادية تطابق الدومين نفسه وكل نطاقاته الفرعية"""
+    matcher = DomainMatcher(['t.me'])
+    
+    assert matcher.match('t.me') == 't.me'
+    assert matcher.match('a.b.t.me') == 't.me'
+    assert 't.me.' in matcher
+
+def test_labels_are_compared_whole():
+    """المطابقة بأجزاء كاملة وليست بنهاية النص"""
+    matcher = DomainMatcher(['t.me'])
+    
+    assert 'evil-t.me.com' not in matcher
+    assert 'evilt.me' not in matcher
+    assert 'me' not in matcher
+    assert '' not in matcher
+
+def test_wildcard_rule_matches_subdomains_only():
+    """قاعدة *.x.com لا تطابق x.com نفسه"""
+    matcher = DomainMatcher(['*.x.com'])
+    
+    assert matcher.match('a.x.com') == '*.x.com'
+    assert 'x.com' not in matcher
+
+def test_invalid_rules_are_skipped():
+    """القيم الفارغة وغير النصية لا تُحسب قواعد"""
+    matcher = DomainMatcher(['', None, 5, 'example.com'])
+    
+    assert len(matcher) == 1
+
+def test_matches_agree_with_naive_suffix_check():
+    """النتائج تطابق الفحص المباشر لكل قاعدة"""
+    rules = ['t.me', '*.x.com', 'bit.ly', 'a.b.c']
+    hosts = ['t.me', 'x.t.me', 'tt.me', 'x.com', 'y.x.com', 'bit.ly.evil', 'b.c', 'z.a.b.c', 'com']
+    matcher = DomainMatcher(rules)
+    
+    for host in hosts:
+        expected = any(
+            (host == domain and not subdomains_only) or host.endswith('.' + domain)
+            for domain, subdomains_only in map(normalize_domain_rule, rules)
+        )
+        assert (host in matcher) == expected, host
+
+def test_cache_reuses_matcher_for_same_rules():
+    """نفس القائمة أو قائمة مساوية لا تُبنى مرة أخرى"""
+    cache = DomainMatcherCache(max_entries=2)
+    rules = ['t.me']
+    
+    matcher = cache.get(rules)
+    
+    assert cache.get(rules) is matcher
+    assert cache.get(list(rules)) is matcher
+    assert cache.stats['compiled'] == 1
+    cache.get(['a.com'])
+    cache.get(['b.com'])
+    assert cache.stats['evicted'] == 1
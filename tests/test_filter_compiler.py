@@ -0,0 +1,107 @@
+"""
+اختبارات تجميع الفلاتر وترتيبها حسب التكلفة
+Compiled Filter Tests
+"""
+
+import pytest
+from filters.filter_compiler import (
+    FilterPredicate, CompiledFilter, CompiledFilterCache, COST_CHEAP, COST_REGEX, COST_NETWORK
+)
+
+def make_predicate(name, cost, accept=True, calls=None):
+    """فحص يسجل استدعاءه ويعيد نتيجة ثابتة"""
+    def check(message):
+        if calls is not None:
+            calls.append(name)
+        return accept
+    return FilterPredicate(name, check, cost)
+
+def test_predicates_are_ordered_by_estimated_cost():
+    """الفحوصات الأرخص تُنفذ أولاً قبل جمع أي قياسات"""
+    compiled = CompiledFilter([
+        make_predicate('network', COST_NETWORK),
+        make_predicate('regex', COST_REGEX),
+        make_predicate('media', COST_CHEAP)
+    ])
+    
+    assert [predicate.name for predicate in compiled.predicates] == ['media', 'regex', 'network']
+
+@pytest.mark.asyncio
+async def test_evaluation_stops_at_first_rejection():
+    """أول رفض يوقف التقييم ولا تُستدعى الفحوصات الأغلى"""
+    calls = []
+    compiled = CompiledFilter([
+        make_predicate('network', COST_NETWORK, calls=calls),
+        make_predicate('media', COST_CHEAP, accept=False, calls=calls)
+    ])
+    
+    assert await compiled.evaluate(object()) == (False, 'media')
+    assert calls == ['media']
+
+@pytest.mark.asyncio
+async def test_async_checks_and_reasons_are_supported():
+    """الفحوصات غير المتزامنة تُنتظر وسبب الرفض المرفق يُعاد كما هو"""
+    async def check(message):
+        return False, 'سبب مخصص'
+    compiled = CompiledFilter([make_predicate('media', COST_CHEAP), FilterPredicate('remote', check, COST_NETWORK)])
+    
+    assert await compiled.evaluate(object()) == (False, 'سبب مخصص')
+    assert await CompiledFilter([make_predicate('media', COST_CHEAP)]).evaluate(object()) == (True, None)
+
+@pytest.mark.asyncio
+async def test_reorder_moves_selective_predicate_first():
+    """الفحص الذي يرفض كثيراً يتقدم على فحص بنفس التكلفة لا يرفض أبداً"""
+    never = make_predicate('never', COST_REGEX)
+    often = FilterPredicate('often', lambda message: message % 2 == 0, COST_REGEX * 1.5)
+    compiled = CompiledFilter([often, never])
+    assert compiled.predicates[0] is never
+    
+    for number in range(CompiledFilter.REORDER_EVERY):
+        await compiled.evaluate(number)
+    # القياسات الفعلية تحل محل التقدير بعد عدد كافٍ من العينات
+    never.total_seconds, often.total_seconds = COST_REGEX * never.runs, COST_REGEX * 1.5 * often.runs
+    compiled.reorder()
+    
+    assert compiled.predicates[0] is often
+    assert compiled.reorders == 1
+
+def test_cache_recompiles_only_when_version_changes():
+    """الفلتر المجمع يُعاد استخدامه حتى يتغير إصدار المهمة أو يُلغى"""
+    cache = CompiledFilterCache()
+    builds = []
+    def build(filters):
+        builds.append(filters)
+        return CompiledFilter([])
+    filters = {'media_types': ['photo']}
+    
+    compiled = cache.get(1, 1, filters, build)
+    
+    assert cache.get(1, 1, dict(filters), build) is compiled
+    assert cache.get(1, 2, filters, build) is not compiled
+    cache.invalidate(1)
+    cache.get(1, 2, filters, build)
+    assert len(builds) == 3
+    assert cache.stats['invalidated'] == 1
+
+def test_cache_without_task_id_uses_filters_identity():
+    """بدون معرف مهمة يُعاد التجميع لكائن إعدادات مختلف"""
+    cache = CompiledFilterCache()
+    build = lambda filters: CompiledFilter([])
+    filters = {}
+    
+    compiled = cache.get(None, 0, filters, build)
+    
+    assert cache.get(None, 0, filters, build) is compiled
+    assert cache.get(None, 0, {}, build) is not compiled
+
+def test_retain_drops_inactive_tasks():
+    """المهام غير النشطة تُحذف من الكاش"""
+    cache = CompiledFilterCache()
+    build = lambda filters: CompiledFilter([])
+    cache.get(1, 1, {}, build)
+    cache.get(2, 1, {}, build)
+    
+    cache.retain([2])
+    
+    assert cache.get_task_stats(1) is None
+    assert cache.get_task_stats(2) is not None
@@ -0,0 +1,119 @@
+"""
+اختبارات طابور التوجيه المقسم
+Sharded Forwarding Queue Tests
+"""
+
+import asyncio
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from services.forwarding_queue import ShardedForwardingQueue
+
+def make_item(priority: int = 1, premium: bool = False, premium_until=None, backfill: bool = False) -> dict:
+    """طلب توجيه لمهمة بأولوية واشتراك محددين"""
+    return {
+        'task': {'id': 1, 'priority': priority, 'owner_is_premium': premium, 'owner_premium_until': premium_until},
+        'backfill': backfill
+    }
+
+def test_lane_key_drops_premium_after_expiry():
+    """انتهاء الاشتراك ينقل الطلبات للمسار المجاني دون انتظار إعادة التحميل"""
+    assert ShardedForwardingQueue.get_lane_key(make_item(premium=True, premium_until=time.time() + 60)) == (1, True)
+    assert ShardedForwardingQueue.get_lane_key(make_item(premium=True, premium_until=time.time() - 60)) == (1, False)
+    assert ShardedForwardingQueue.get_lane_key(make_item(premium=True)) == (1, True)
+
+def make_queue(policy: str, max_depth: int = 2, **callbacks) -> ShardedForwardingQueue:
+    """طابور بجزء واحد وسياسة امتلاء محددة"""
+    return ShardedForwardingQueue(1, AsyncMock(), max_depth=max_depth, overflow_policy=policy, **callbacks)
+
+@pytest.mark.asyncio
+async def test_drop_policy_evicts_newest_item_of_lowest_lane():
+    """سياسة الحذف تحذف أحدث عنصر في المسار الأقل وزناً لصالح عنصر أهم"""
+    on_drop = MagicMock()
+    queue = make_queue(ShardedForwardingQueue.POLICY_DROP, on_drop=on_drop)
+    first, second, urgent = make_item(), make_item(), make_item(priority=3)
+    await queue.put('source', first)
+    await queue.put('source', second)
+    
+    assert await queue.put('source', urgent)
+    
+    on_drop.assert_called_once_with(second)
+    assert queue.shards[0].depth() == 2
+
+@pytest.mark.asyncio
+async def test_drop_policy_rejects_item_not_more_important():
+    """العنصر الجديد بنفس الأولوية هو الذي يُحذف"""
+    on_drop = MagicMock()
+    queue = make_queue(ShardedForwardingQueue.POLICY_DROP, on_drop=on_drop)
+    await queue.put('source', make_item())
+    await queue.put('source', make_item())
+    late = make_item()
+    
+    assert not await queue.put('source', late)
+    
+    on_drop.assert_called_once_with(late)
+
+@pytest.mark.asyncio
+async def test_spill_policy_keeps_order_behind_spilled_items():
+    """بعد أول نقل للقرص تلحق العناصر الجديدة بالقرص حتى مع توفر مكان"""
+    on_spill = MagicMock()
+    queue = make_queue(ShardedForwardingQueue.POLICY_SPILL, on_spill=on_spill)
+    await queue.put('source', make_item())
+    await queue.put('source', make_item())
+    overflow = make_item()
+    
+    assert not await queue.put('source', overflow)
+    on_spill.assert_called_once_with(overflow, 0)
+    
+    await queue.get(queue.shards[0])
+    later = make_item()
+    assert not await queue.put('source', later)
+    assert on_spill.call_args[0][0] is later
+    assert queue.qsize() == 3
+
+@pytest.mark.asyncio
+async def test_refill_reloads_spilled_items_at_low_watermark():
+    """انخفاض الامتلاء لحد الانخفاض يعيد تحميل العناصر من القرص"""
+    spilled_items = [make_item(), make_item()]
+    on_refill = AsyncMock(return_value=(spilled_items, 2))
+    queue = make_queue(ShardedForwardingQueue.POLICY_SPILL, max_depth=4, on_spill=MagicMock(), on_refill=on_refill)
+    shard = queue.shards[0]
+    for _ in range(6):
+        await queue.put('source', make_item())
+    assert shard.spilled == 2
+    
+    await queue.get(shard)
+    on_refill.assert_not_called()
+    await queue.get(shard)
+    await asyncio.sleep(0)
+    
+    on_refill.assert_awaited_once_with(0, 2)
+    assert shard.spilled == 0
+    assert shard.depth() == 4
+
+@pytest.mark.asyncio
+async def test_block_policy_waits_for_space():
+    """سياسة الإيقاف تنتظر حتى يسحب العامل عنصراً"""
+    queue = make_queue(ShardedForwardingQueue.POLICY_BLOCK, max_depth=1)
+    await queue.put('source', make_item())
+    blocked = asyncio.create_task(queue.put('source', make_item()))
+    await asyncio.sleep(0)
+    assert not blocked.done()
+    
+    await queue.get(queue.shards[0])
+    
+    assert await asyncio.wait_for(blocked, 1)
+    assert queue.shards[0].blocked_puts == 1
+
+def test_weighted_lanes_share_worker_without_starvation():
+    """المسار المميز يحصل على حصة أكبر دون حرمان المسار المجاني"""
+    queue = make_queue(ShardedForwardingQueue.POLICY_BLOCK, max_depth=100)
+    shard = queue.shards[0]
+    for _ in range(10):
+        for item in (make_item(), make_item(premium=True)):
+            queue.append(shard, item)
+    
+    served = [shard.pop()['task']['owner_is_premium'] for _ in range(10)]
+    
+    assert served.count(True) == 8
+    assert served.count(False) == 2
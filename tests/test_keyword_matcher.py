@@ -0,0 +1,74 @@
+"""
+اختبارات مطابقة الكلمات المتعددة
+Multi-Keyword Matcher Tests
+"""
+
+import random
+from utils.keyword_matcher import KeywordMatcher, KeywordMatcherCache, fold_text
+
+def test_fold_text_unifies_case_letter_forms_and_marks():
+    """التوحيد يتجاهل حالة الأحرف وأشكال الألف والتشكيل والتطويل"""
+    assert fold_text('SPAM') == 'spam'
+    assert fold_text('إعلان') == fold_text('اعلان')
+    assert fold_text('مَجّانـــي') == fold_text('مجاني')
+    assert fold_text('مكتبة') == fold_text('مكتبه')
+
+def test_overlapping_keywords_are_all_found():
+    """الكلمات المتداخلة وكلمات اللواحق تُكتشف في مرور واحد"""
+    matcher = KeywordMatcher(['he', 'she', 'his', 'hers'])
+    
+    assert matcher.find_all('ushers') == {'he', 'she', 'hers'}
+    assert matcher.search('ushers') == 'she'
+    assert matcher.search('nothing to see') is None
+
+def test_matching_uses_folded_text_and_returns_original_words():
+    """المطابقة على النص الموحد والنتيجة بالكلمة كما كتبها المستخدم"""
+    matcher = KeywordMatcher(['إعلان', 'Promo'])
+    
+    assert matcher.search('هذا اعلان ممول') == 'إعلان'
+    assert matcher.find_all('PROMO code') == {'Promo'}
+
+def test_duplicate_words_after_folding_are_merged():
+    """الكلمات المتطابقة بعد التوحيد تُحسب مرة واحدة"""
+    matcher = KeywordMatcher(['Spam', 'spam', 'SPAM', ''])
+    
+    assert len(matcher) == 1
+    assert matcher.contains_all('spam here')
+
+def test_contains_all_requires_every_word():
+    """فلتر الكلمات المطلوبة يتطلب وجودها جميعاً"""
+    matcher = KeywordMatcher(['buy', 'now'])
+    
+    assert matcher.contains_all('buy it now')
+    assert not matcher.contains_all('buy it later')
+
+def test_keywords_do_not_span_lines():
+    """الكلمة لا تُطابق عبر سطرين ويُحذف فقط السطر الذي يحتويها"""
+    matcher = KeywordMatcher(['ab'])
+    
+    assert matcher.search('a\nb') is None
+    assert matcher.find_lines('first\nxaby\nlast ab') == {1, 2}
+    assert matcher.remove_lines('keep\ndrop ab\nkeep too') == 'keep\nkeep too'
+
+def test_matches_agree_with_naive_search():
+    """النتائج تطابق البحث المباشر لكل كلمة على نصوص عشوائية"""
+    rng = random.Random(7)
+    for _ in range(200):
+        words = [''.join(rng.choice('abc') for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 6))]
+        text = ''.join(rng.choice('abc') for _ in range(rng.randint(0, 30)))
+        
+        assert KeywordMatcher(words).find_all(text) == {word for word in words if word in text}
+
+def test_cache_reuses_matcher_for_same_words():
+    """نفس القائمة أو قائمة مساوية لا تُبنى مرة أخرى"""
+    cache = KeywordMatcherCache(max_entries=2)
+    words = ['spam']
+    
+    matcher = cache.get(words)
+    
+    assert cache.get(words) is matcher
+    assert cache.get(list(words)) is matcher
+    assert cache.stats['compiled'] == 1
+    cache.get(['a'])
+    cache.get(['b'])
+    assert cache.stats['evicted'] == 1
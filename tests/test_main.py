@@ -0,0 +1,43 @@
+"""
+اختبارات ربط معالجات البوت
+Bot Handler Wiring Tests
+"""
+
+import pytest
+from unittest.mock import AsyncMock, patch
+from telegram import Bot, Update, User
+from telegram.ext import ApplicationBuilder
+
+SOURCE_CHAT_ID = 5001
+
+def make_deleted_messages_update() -> Update:
+    """تحديث حذف رسائل من دردشة أعمال"""
+    return Update.de_json({
+        'update_id': 1,
+        'deleted_business_messages': {
+            'business_connection_id': 'connection',
+            'chat': {'id': SOURCE_CHAT_ID, 'type': 'private', 'first_name': 'source'},
+            'message_ids': [10, 11]
+        }
+    }, None)
+
+@pytest.mark.asyncio
+async def test_deleted_business_messages_reach_delete_handler(tmp_path, monkeypatch):
+    """حذف الرسائل في المصدر يصل لحذف النسخ الموجهة"""
+    monkeypatch.chdir(tmp_path)  # استيراد main ينشئ مجلد السجلات
+    from main import TelegramBot
+    
+    bot = TelegramBot()
+    bot.message_forwarder.delete_copies = AsyncMock()
+    bot.message_forwarder.handle_message = AsyncMock()
+    application = ApplicationBuilder().token('123:test').build()
+    bot.setup_handlers(application)
+    
+    with patch.object(Bot, 'get_me', AsyncMock(return_value=User(1, 'bot', True, username='test_bot'))):
+        await application.initialize()
+    await application.process_update(make_deleted_messages_update())
+    
+    bot.message_forwarder.delete_copies.assert_awaited_once()
+    source_chat_id, message_ids, _ = bot.message_forwarder.delete_copies.call_args[0]
+    assert (source_chat_id, message_ids) == (SOURCE_CHAT_ID, [10, 11])
+    bot.message_forwarder.handle_message.assert_not_called()
@@ -0,0 +1,32 @@
+"""
+اختبارات تجميع الألبومات
+Media Group Aggregation Tests
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from services.media_group import MediaGroupAggregator
+
+def make_album_part(message_id: int) -> MagicMock:
+    """جزء من ألبوم"""
+    message = MagicMock()
+    message.chat_id = -1001
+    message.message_id = message_id
+    message.media_group_id = 'album-1'
+    return message
+
+@pytest.mark.asyncio
+async def test_flush_all_routes_buffered_albums_immediately():
+    """الإيقاف يمرر الألبومات المجمعة دون انتظار نهاية المهلة"""
+    flush_callback = AsyncMock()
+    aggregator = MediaGroupAggregator(flush_callback)
+    context = MagicMock()
+    await aggregator.add(make_album_part(2), context)
+    await aggregator.add(make_album_part(1), context)
+    
+    await aggregator.flush_all()
+    
+    messages, flushed_context = flush_callback.call_args[0]
+    assert [message.message_id for message in messages] == [1, 2]
+    assert flushed_context is context
+    assert not aggregator.groups
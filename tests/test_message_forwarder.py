@@ -0,0 +1,161 @@
+"""
+اختبارات خدمة توجيه الرسائل
+Message Forwarder Tests
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from telegram.error import NetworkError
+from services.message_forwarder import MessageForwarder
+from services.task_snapshot import TaskSnapshot
+
+SOURCE_CHAT_ID = -1001
+TARGET_CHAT_ID = -1002
+OTHER_TARGET_CHAT_ID = -1003
+
+def make_task() -> dict:
+    """مهمة نسخ بسيطة من مصدر واحد لهدف واحد"""
+    return {
+        'id': 1,
+        'source_chat_id': SOURCE_CHAT_ID,
+        'target_chat_ids': [TARGET_CHAT_ID],
+        'forward_type': 'copy',
+        'settings': {}
+    }
+
+def make_album_part(message_id: int) -> MagicMock:
+    """جزء من ألبوم صور"""
+    message = MagicMock()
+    message.chat_id = SOURCE_CHAT_ID
+    message.message_id = message_id
+    message.media_group_id = 'album-1'
+    message.text = None
+    message.caption = f"صورة {message_id}"
+    return message
+
+def make_context() -> MagicMock:
+    """سياق ببوت وهمي"""
+    context = MagicMock()
+    context.bot.token = '123:test'
+    context.bot.send_media_group = AsyncMock()
+    return context
+
+@pytest.fixture
+def forwarder():
+    forwarder = MessageForwarder(MagicMock())
+    forwarder.task_snapshot = TaskSnapshot.build([make_task()], 1)
+    return forwarder
+
+@pytest.mark.asyncio
+async def test_single_accepted_album_part_is_enqueued_as_plain_message(forwarder):
+    """جزء واحد مقبول من الألبوم لا يُرسل عبر send_media_group"""
+    album = [make_album_part(10), make_album_part(11), make_album_part(12)]
+    forwarder.filter_manager.check_message = AsyncMock(side_effect=[False, True, False])
+    forwarder.enqueue_forward_request = AsyncMock()
+    
+    routed = await forwarder.route_album_to_task(
+        album, make_task(), 'filters', {}, make_context(), backfill=True
+    )
+    
+    assert routed
+    forward_data = forwarder.enqueue_forward_request.call_args[0][0]
+    assert forward_data['message'] is album[1]
+    assert not forward_data.get('album')
+
+@pytest.mark.asyncio
+async def test_single_album_part_is_delivered_with_copy_message(forwarder):
+    """طلب التوجيه لجزء واحد يمر بمسار الرسالة العادية"""
+    task = make_task()
+    message = make_album_part(11)
+    context = make_context()
+    sent = MagicMock()
+    sent.message_id = 99
+    forwarder.copy_message = AsyncMock(return_value=sent)
+    forwarder.log_forwarding_results = AsyncMock()
+    forwarder.outbox = MagicMock()
+    
+    await forwarder.process_forward_request({
+        'task': task,
+        'message': message,
+        'album': None,
+        'context': context
+    })
+    
+    forwarder.copy_message.assert_awaited_once()
+    assert forwarder.copy_message.call_args[0][1] == TARGET_CHAT_ID
+    context.bot.send_media_group.assert_not_called()
+    successful_targets = forwarder.log_forwarding_results.call_args[0][2]
+    assert successful_targets[0]['message_id'] == 99
+
+def test_single_message_outbox_entry_is_not_rebuilt_as_album(forwarder):
+    """طلب مستعاد من صندوق الصادر بجزء واحد لا يُعامل كألبوم"""
+    entry = {
+        'outbox_key': '1_-1001_11',
+        'task_id': 1,
+        'messages': [make_album_part(11)],
+        'backfill': False
+    }
+    
+    forward_data = forwarder.build_forward_data_from_outbox(entry, make_context())
+    
+    assert 'album' not in forward_data
+
+@pytest.mark.asyncio
+async def test_outbox_entry_stays_open_until_retries_settle(forwarder):
+    """سجل صندوق الصادر لا يُغلق بينما ينتظر هدف إعادة المحاولة"""
+    task = make_task()
+    task['target_chat_ids'] = [TARGET_CHAT_ID, OTHER_TARGET_CHAT_ID]
+    context = make_context()
+    sent = MagicMock()
+    sent.message_id = 99
+    failures = [NetworkError("connection reset")]
+    
+    async def copy_message(message, target_chat_id, *args):
+        if target_chat_id == OTHER_TARGET_CHAT_ID and failures:
+            raise failures.pop()
+        return sent
+    
+    forwarder.copy_message = copy_message
+    forwarder.log_forwarding_results = AsyncMock()
+    forwarder.outbox = MagicMock()
+    
+    await forwarder.process_forward_request({
+        'task': task,
+        'message': make_album_part(11),
+        'context': context,
+        'outbox_key': 'key'
+    })
+    
+    forwarder.outbox.complete.assert_not_called()
+    forwarder.outbox.keep_open.assert_called_once_with('key', [OTHER_TARGET_CHAT_ID])
+    
+    _, _, retry_item = forwarder.retry_queue.pending[0]
+    await forwarder.retry_delivery(retry_item)
+    
+    forwarder.outbox.complete.assert_called_once_with({'outbox_key': 'key'})
+    assert 'key' not in forwarder.open_deliveries
+
+@pytest.mark.asyncio
+async def test_recovered_entry_delivers_only_remaining_targets(forwarder):
+    """الطلب المستعاد يُرسل فقط للأهداف التي كانت تنتظر إعادة المحاولة"""
+    task = make_task()
+    task['target_chat_ids'] = [TARGET_CHAT_ID, OTHER_TARGET_CHAT_ID]
+    forwarder.task_snapshot = TaskSnapshot.build([task], 2)
+    sent = MagicMock()
+    sent.message_id = 99
+    forwarder.copy_message = AsyncMock(return_value=sent)
+    forwarder.log_forwarding_results = AsyncMock()
+    forwarder.outbox = MagicMock()
+    entry = {
+        'outbox_key': 'key',
+        'task_id': 1,
+        'messages': [make_album_part(11)],
+        'backfill': False,
+        'targets': [OTHER_TARGET_CHAT_ID]
+    }
+    
+    await forwarder.process_forward_request(forwarder.build_forward_data_from_outbox(entry, make_context()))
+    
+    forwarder.copy_message.assert_awaited_once()
+    assert forwarder.copy_message.call_args[0][1] == OTHER_TARGET_CHAT_ID
+    forwarder.outbox.complete.assert_called_once_with({'outbox_key': 'key'})
@@ -0,0 +1,59 @@
+"""
+اختبارات صندوق الصادر الدائم
+Durable Outbox Tests
+"""
+
+import pytest
+from telegram import Message
+from database.db_manager import DatabaseManager
+from services.outbox import ForwardingOutbox
+
+SOURCE_CHAT_ID = -1001
+
+def make_message(message_id: int) -> Message:
+    """رسالة نصية من المصدر"""
+    return Message.de_json({
+        'message_id': message_id,
+        'date': 1700000000,
+        'chat': {'id': SOURCE_CHAT_ID, 'type': 'channel', 'title': 'source'},
+        'text': f"رسالة {message_id}"
+    }, None)
+
+def make_forward_data(message_id: int) -> dict:
+    return {'task': {'id': 1}, 'message': make_message(message_id)}
+
+async def make_outbox() -> ForwardingOutbox:
+    """صندوق صادر على قاعدة بيانات في الذاكرة"""
+    db = DatabaseManager(':memory:')
+    await db.initialize()
+    return ForwardingOutbox(db)
+
+@pytest.mark.asyncio
+async def test_recovered_spilled_rows_are_not_refilled_again():
+    """السجلات المنقولة للقرص المستعادة عند التشغيل لا يعيد تحميلها أول نقل جديد"""
+    outbox = await make_outbox()
+    pending, spilled = make_forward_data(1), make_forward_data(2)
+    outbox.add(pending)
+    outbox.add(spilled)
+    outbox.spill(spilled, 0)
+    outbox.flush()
+    
+    entries = await outbox.load_unfinished(None)
+    refilled, consumed = await outbox.load_spilled(None, 0, 10)
+    
+    assert [entry['messages'][0].message_id for entry in entries] == [1, 2]
+    assert (refilled, consumed) == ([], 0)
+
+@pytest.mark.asyncio
+async def test_refill_loads_spilled_rows_once():
+    """إعادة التحميل تعيد السجل لحالة الانتظار فلا يُحمل مرتين"""
+    outbox = await make_outbox()
+    spilled = make_forward_data(3)
+    outbox.add(spilled)
+    outbox.spill(spilled, 1)
+    
+    first, _ = await outbox.load_spilled(None, 1, 10)
+    second, _ = await outbox.load_spilled(None, 1, 10)
+    
+    assert [entry['outbox_key'] for entry in first] == [spilled['outbox_key']]
+    assert second == []
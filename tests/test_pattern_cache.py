@@ -0,0 +1,95 @@
+"""
+اختبارات كاش الأنماط والحماية من التراجع الأسي
+Pattern Cache ReDoS Protection Tests
+"""
+
+import asyncio
+import time
+from unittest.mock import MagicMock
+import pytest
+from utils.pattern_cache import PatternCache, RegexWorkerPool, find_backtracking_construct, sre_parse
+
+@pytest.mark.parametrize('pattern', [r'(a+)+$', r'(\w+\s?)+$', r'(a|aa)*c', r'(.*a){12}', r'(\w+)\1'])
+def test_non_linear_patterns_are_rejected(pattern):
+    """البنى غير الخطية تُرفض عند الحفظ بدون محرك خطي"""
+    assert find_backtracking_construct(sre_parse.parse(pattern)) is not None
+
+@pytest.mark.parametrize('pattern', [r'spam\d+', r'(foo|bar)+', r'(\d{3}-)+\d{4}', r'(a|b)*c', r'https?://\S+'])
+def test_linear_patterns_are_accepted(pattern):
+    """الأنماط الشائعة السليمة لا تُرفض"""
+    assert find_backtracking_construct(sre_parse.parse(pattern)) is None
+
+@pytest.mark.asyncio
+async def test_search_runs_in_worker():
+    """المطابقة تعمل في العملية المنفصلة مع الخيارات"""
+    cache = PatternCache()
+    try:
+        assert await cache.search(r'spam\d+', 'buy SPAM42 now', 2) is True
+        assert await cache.search(r'spam\d+', 'hello') is False
+    finally:
+        await cache.workers.stop()
+
+@pytest.mark.asyncio
+async def test_catastrophic_match_is_killed_and_pattern_disabled():
+    """المطابقة الكارثية تُنهى عند المهلة ويُعطل النمط ثم تستمر المطابقات الأخرى"""
+    cache = PatternCache()
+    cache.workers = RegexWorkerPool(size=1)
+    # نمط محفوظ قبل التحقق عند الحفظ: يُجمع مباشرة دون فحص
+    compiled = cache.get(r'(a+)+$')
+    compiled.disabled = False
+    compiled.error = None
+    
+    try:
+        started_at = time.perf_counter()
+        assert await cache.search(r'(a+)+$', 'a' * 64 + 'b') is None
+        assert time.perf_counter() - started_at < cache.MATCH_TIMEOUT_SECONDS + 1
+        assert compiled.disabled
+        assert cache.stats['timeouts'] == 1
+        
+        assert await cache.search(r'b$', 'a' * 64 + 'b') is True
+        assert cache.workers.get_stats()['started'] == 2
+    finally:
+        await cache.workers.stop()
+
+@pytest.mark.asyncio
+async def test_concurrent_searches_do_not_count_waiting_time():
+    """انتظار عملية متاحة وتشغيلها لا يُحسب من زمن المطابقة"""
+    cache = PatternCache()
+    try:
+        results = await asyncio.gather(*[cache.search(r'spam\d+', f'spam{i}') for i in range(200)])
+        
+        assert all(result is True for result in results)
+        assert not cache.get(r'spam\d+').disabled
+        assert cache.stats['disabled'] == 0
+    finally:
+        await cache.workers.stop()
+
+@pytest.mark.asyncio
+async def test_pattern_is_disabled_once():
+    """المطابقات المتزامنة لنمط كارثي تعطله مرة واحدة"""
+    cache = PatternCache()
+    compiled = cache.get(r'(a+)+$')
+    compiled.disabled = False
+    compiled.error = None
+    
+    try:
+        results = await asyncio.gather(*[cache.search(r'(a+)+$', 'a' * 64 + 'b') for _ in range(2)])
+        
+        assert results == [None, None]
+        assert cache.stats['timeouts'] == 2
+        assert cache.stats['disabled'] == 1
+    finally:
+        await cache.workers.stop()
+
+@pytest.mark.asyncio
+async def test_disabled_block_pattern_fails_closed():
+    """نمط حظر معطل لتكلفته يحجب النص بدل تجاوزه"""
+    from filters.message_filters import MessageFilterManager
+    
+    manager = MessageFilterManager()
+    compiled = manager.filter_cache.get(r'(x+)+y')
+    message = MagicMock(text='hello world', caption=None)
+    text_filter = {'enabled': True, 'regex_patterns': [r'(x+)+y']}
+    
+    assert compiled.disabled
+    assert await manager.check_text_filter(message, text_filter) is False
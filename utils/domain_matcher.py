@@ -0,0 +1,123 @@
+"""
+مطابقة الدومينات مع قوائم الحظر والسماح
+Exact-Host Set and Reversed-Label Suffix Trie Domain Matcher
+"""
+
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Sequence, Tuple
+
+# مفتاح نهاية القاعدة في عقدة الشجرة (لا يوجد جزء دومين فارغ بعد التوحيد)
+RULE_KEY = ''
+
+def normalize_domain_rule(rule: str) -> Tuple[str, bool]:
+    """توحيد قاعدة دومين وإرجاع (الدومين، للنطاقات الفرعية فقط)"""
+    # 'example.com' تطابق الدومين ونطاقاته الفرعية، و '*.example.com' النطاقات الفرعية فقط
+    rule = (rule or '').strip().lower()
+    if '://' in rule:
+        rule = rule.split('://', 1)[1]
+    # حذف المسار وبيانات الدخول والمنفذ إن كُتب رابط بدل الدومين
+    rule = rule.split('/', 1)[0].rsplit('@', 1)[-1]
+    if rule.count(':') == 1:
+        rule = rule.split(':', 1)[0]
+    
+    subdomains_only = rule.startswith('*.') or rule.startswith('.')
+    return rule.lstrip('*.').rstrip('.'), subdomains_only
+
+class DomainMatcher:
+    """مجموعة للدومينات الكاملة وشجرة لواحق بأجزاء الدومين المعكوسة: البحث بعدد أجزاء الدومين لا بحجم القائمة"""
+    
+    def __init__(self, rules: Sequence[str]):
+        self.exact: Dict[str, str] = {}  # الدومين -> القاعدة الأصلية
+        self.suffixes: Dict[str, Any] = {}  # 'com' -> 'example' -> {RULE_KEY: القاعدة}
+        self.size = 0
+        
+        for rule in rules:
+            if not isinstance(rule, str):
+                continue
+            domain, subdomains_only = normalize_domain_rule(rule)
+            if not domain:
+                continue
+            self.size += 1
+            if not subdomains_only:
+                self.exact.setdefault(domain, rule)
+            
+            node = self.suffixes
+            for label in reversed(domain.split('.')):
+                node = node.setdefault(label, {})
+            node.setdefault(RULE_KEY, rule)
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    def match(self, host: str) -> Optional[str]:
+        """القاعدة التي تطابق الدومين أو None"""
+        if not host:
+            return None
+        host = host.rstrip('.')
+        
+        rule = self.exact.get(host)
+        if rule is not None:
+            return rule
+        
+        # النطاق الفرعي يجب أن يكون أطول من القاعدة بجزء واحد على الأقل (evil-t.me.com لا تطابق t.me)
+        labels = host.split('.')
+        node = self.suffixes
+        for depth in range(len(labels) - 1, 0, -1):
+            node = node.get(labels[depth])
+            if node is None:
+                return None
+            rule = node.get(RULE_KEY)
+            if rule is not None:
+                return rule
+        return None
+    
+    def __contains__(self, host: str) -> bool:
+        return self.match(host) is not None
+
+class DomainMatcherCache:
+    """كاش محدود للقوائم المبنية حسب قائمة الدومينات"""
+    
+    MAX_ENTRIES = 256
+    
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        # معرف كائن القائمة -> (القائمة، المطابق): القوائم الكبيرة لا تُعاد تجزئتها لكل رسالة
+        self.by_identity: OrderedDict = OrderedDict()
+        self.by_rules: OrderedDict = OrderedDict()
+        self.stats = {
+            'compiled': 0,
+            'hits': 0,
+            'evicted': 0
+        }
+    
+    def get(self, rules: Sequence[str]) -> DomainMatcher:
+        """الحصول على مطابق قائمة الدومينات وبناؤه عند أول استخدام فقط"""
+        cached = self.by_identity.get(id(rules))
+        if cached and cached[0] is rules:
+            self.stats['hits'] += 1
+            return cached[1]
+        
+        key = tuple(rules)
+        matcher = self.by_rules.get(key)
+        if matcher is None:
+            matcher = DomainMatcher(key)
+            self.by_rules[key] = matcher
+            self.stats['compiled'] += 1
+            if len(self.by_rules) > self.max_entries:
+                self.by_rules.popitem(last=False)
+                self.stats['evicted'] += 1
+        else:
+            self.by_rules.move_to_end(key)
+            self.stats['hits'] += 1
+        
+        self.by_identity[id(rules)] = (rules, matcher)
+        if len(self.by_identity) > self.max_entries:
+            self.by_identity.popitem(last=False)
+        return matcher
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات الكاش"""
+        return {**self.stats, 'matchers': len(self.by_rules)}
+
+# كاش مشترك بين فلاتر الروابط وكاشف السبام
+domain_matchers = DomainMatcherCache()
@@ -10,6 +10,7 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional, Union
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 import emoji
+from utils.keyword_matcher import keyword_matchers
 
 class TextProcessor:
     """معالج النصوص المتقدم"""
@@ -38,20 +39,8 @@ class TextProcessor:
         
         # حذف الأسطر التي تحتوي على كلمات معينة
         if settings.get('remove_lines_with_words'):
-            words_to_remove = settings['remove_lines_with_words']
-            lines = cleaned_text.split('\n')
-            filtered_lines = []
-            
-            for line in lines:
-                should_remove = False
-                for word in words_to_remove:
-                    if word.lower() in line.lower():
-                        should_remove = True
-                        break
-                if not should_remove:
-                    filtered_lines.append(line)
-            
-            cleaned_text = '\n'.join(filtered_lines)
+            matcher = keyword_matchers.get(settings['remove_lines_with_words'])
+            cleaned_text = matcher.remove_lines(cleaned_text)
         
         # إزالة الأسطر الفارغة
         if settings.get('remove_empty_lines', False):
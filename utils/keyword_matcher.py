@@ -0,0 +1,179 @@
+"""
+مطابقة الكلمات المتعددة بمرور واحد
+Aho-Corasick Multi-Keyword Matcher
+"""
+
+import re
+import unicodedata
+from collections import OrderedDict, deque
+from typing import Dict, List, Any, Optional, Sequence, Set, Tuple
+
+# التشكيل والتطويل لا يغيران الكلمة
+ARABIC_MARKS_PATTERN = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+
+# توحيد أشكال الحروف التي يكتبها المستخدمون بالتبادل
+ARABIC_LETTER_MAP = str.maketrans({
+    'أ': 'ا',
+    'إ': 'ا',
+    'آ': 'ا',
+    'ٱ': 'ا',
+    'ى': 'ي',
+    'ة': 'ه'
+})
+
+def fold_text(text: str) -> str:
+    """توحيد النص للمقارنة: حالة الأحرف وأشكال الحروف العربية والتشكيل"""
+    text = unicodedata.normalize('NFKC', text).casefold()
+    return ARABIC_MARKS_PATTERN.sub('', text).translate(ARABIC_LETTER_MAP)
+
+class KeywordMatcher:
+    """آلة Aho-Corasick لقائمة كلمات: تجد جميع الكلمات الموجودة في النص بمرور واحد"""
+    
+    def __init__(self, words: Sequence[str]):
+        self.words: List[str] = []  # الكلمة الأصلية لكل نمط (بعد حذف المكرر بعد التوحيد)
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[Tuple[int, ...]] = [()]
+        
+        seen = set()
+        for word in words:
+            folded = fold_text(word) if word else ''
+            if not folded or folded in seen:
+                continue
+            seen.add(folded)
+            self.add_pattern(folded, len(self.words))
+            self.words.append(word)
+        
+        self.build_failure_links()
+    
+    def add_pattern(self, pattern: str, index: int):
+        """إضافة نمط للشجرة"""
+        state = 0
+        for char in pattern:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(())
+            state = next_state
+        self.output[state] += (index,)
+    
+    def build_failure_links(self):
+        """بناء روابط الفشل بالعرض ودمج مخرجات اللواحق"""
+        pending = deque(self.goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, next_state in self.goto[state].items():
+                pending.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.output[next_state] += self.output[self.fail[next_state]]
+    
+    def __len__(self) -> int:
+        return len(self.words)
+    
+    def iter_matches(self, folded_text: str):
+        """المرور على النص الموحد وإرجاع (رقم السطر، أرقام الأنماط) لكل موضع فيه تطابق"""
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        line = 0
+        for char in folded_text:
+            if char == '\n':
+                # الكلمة لا تمتد عبر الأسطر
+                line += 1
+                state = 0
+                continue
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                yield line, output[state]
+    
+    def search(self, text: str, is_folded: bool = False) -> Optional[str]:
+        """أول كلمة موجودة في النص أو None (is_folded: النص موحد مسبقاً بـ fold_text)"""
+        if not self.words or not text:
+            return None
+        for _, matches in self.iter_matches(text if is_folded else fold_text(text)):
+            return self.words[matches[0]]
+        return None
+    
+    def find_all(self, text: str, is_folded: bool = False) -> Set[str]:
+        """جميع الكلمات الموجودة في النص"""
+        found = set()
+        if not self.words or not text:
+            return found
+        for _, matches in self.iter_matches(text if is_folded else fold_text(text)):
+            found.update(matches)
+            if len(found) == len(self.words):
+                break
+        return {self.words[index] for index in found}
+    
+    def contains_all(self, text: str, is_folded: bool = False) -> bool:
+        """هل يحتوي النص على جميع الكلمات"""
+        return len(self.find_all(text, is_folded)) == len(self.words)
+    
+    def find_lines(self, text: str) -> Set[int]:
+        """أرقام الأسطر (حسب '\\n') التي تحتوي على أي كلمة"""
+        if not self.words or not text:
+            return set()
+        return {line for line, _ in self.iter_matches(fold_text(text))}
+    
+    def remove_lines(self, text: str) -> str:
+        """حذف الأسطر التي تحتوي على أي كلمة"""
+        hit_lines = self.find_lines(text)
+        if not hit_lines:
+            return text
+        return '\n'.join(line for index, line in enumerate(text.split('\n')) if index not in hit_lines)
+
+class KeywordMatcherCache:
+    """كاش محدود للآلات المبنية حسب قائمة الكلمات"""
+    
+    MAX_ENTRIES = 512
+    
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        # معرف كائن القائمة -> (القائمة، الآلة): يتجنب إعادة بناء المفتاح لنفس إعدادات المهمة
+        self.by_identity: OrderedDict = OrderedDict()
+        self.by_words: OrderedDict = OrderedDict()
+        self.stats = {
+            'compiled': 0,
+            'hits': 0,
+            'evicted': 0
+        }
+    
+    def get(self, words: Sequence[str]) -> KeywordMatcher:
+        """الحصول على آلة قائمة الكلمات وبناؤها عند أول استخدام فقط"""
+        cached = self.by_identity.get(id(words))
+        if cached and cached[0] is words:
+            self.stats['hits'] += 1
+            return cached[1]
+        
+        key = tuple(words)
+        matcher = self.by_words.get(key)
+        if matcher is None:
+            matcher = KeywordMatcher(key)
+            self.by_words[key] = matcher
+            self.stats['compiled'] += 1
+            if len(self.by_words) > self.max_entries:
+                self.by_words.popitem(last=False)
+                self.stats['evicted'] += 1
+        else:
+            self.by_words.move_to_end(key)
+            self.stats['hits'] += 1
+        
+        self.by_identity[id(words)] = (words, matcher)
+        if len(self.by_identity) > self.max_entries:
+            self.by_identity.popitem(last=False)
+        return matcher
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات الكاش"""
+        return {**self.stats, 'matchers': len(self.by_words)}
+
+# كاش مشترك بين الفلاتر ومعالجة النصوص
+keyword_matchers = KeywordMatcherCache()
@@ -0,0 +1,417 @@
+"""
+كاش أنماط الفلاتر المجمعة مع حماية من الأنماط الكارثية
+Compiled Filter Pattern Cache with ReDoS Protection
+"""
+
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+from utils.logger import BotLogger
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+try:
+    import re2  # محرك خطي الزمن (اختياري)
+except ImportError:
+    re2 = None
+
+logger = BotLogger()
+
+REPEAT_OPCODES = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+if hasattr(sre_parse, 'POSSESSIVE_REPEAT'):
+    REPEAT_OPCODES.add(sre_parse.POSSESSIVE_REPEAT)
+BACKREFERENCE_OPCODES = {sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS}
+
+def get_children(op, av) -> list:
+    """الأنماط الفرعية لعقدة في شجرة النمط"""
+    if op in REPEAT_OPCODES:
+        return [av[2]]
+    if op == sre_parse.SUBPATTERN:
+        return [av[3]]
+    if op == sre_parse.BRANCH:
+        return list(av[1])
+    if op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+        return [av[1]]
+    if op == sre_parse.GROUPREF_EXISTS:
+        return [branch for branch in av[1:] if branch is not None]
+    if op == getattr(sre_parse, 'ATOMIC_GROUP', None):
+        return [av]
+    return []
+
+def is_ambiguous_branch(alternatives) -> bool:
+    """بدائل يمكن أن تطابق نفس البداية مثل (a|aa) (البدائل ذات الحرف الأول المختلف حتمية)"""
+    first_literals = set()
+    for alternative in alternatives:
+        if not len(alternative) or alternative[0][0] != sre_parse.LITERAL:
+            return True
+        if alternative[0][1] in first_literals:
+            return True
+        first_literals.add(alternative[0][1])
+    return False
+
+def has_ambiguous_body(subpattern) -> bool:
+    """هل يمكن للنمط مطابقة نفس النص بأكثر من طريقة (تكرار متغير أو بدائل متداخلة)"""
+    for op, av in subpattern:
+        if op in REPEAT_OPCODES and av[0] != av[1]:
+            return True
+        if op == sre_parse.BRANCH and is_ambiguous_branch(av[1]):
+            return True
+        if any(has_ambiguous_body(child) for child in get_children(op, av)):
+            return True
+    return False
+
+def find_backtracking_construct(subpattern) -> Optional[str]:
+    """البحث عن بنية تسبب تراجعاً أسياً في محرك re وإرجاع وصفها"""
+    for op, av in subpattern:
+        if op in BACKREFERENCE_OPCODES:
+            return "الإحالات الخلفية غير مدعومة بدون محرك خطي"
+        # تكرار لجسم غامض: (a+)+ و (\w+\s?)+ و (a|aa)* و (.*a){12}
+        if op in REPEAT_OPCODES and av[1] > 1 and has_ambiguous_body(av[2]):
+            return "النمط يحتوي على تكرار متداخل قد يُبطئ البوت (مثل (a+)+ أو (a|aa)*)"
+        for child in get_children(op, av):
+            reason = find_backtracking_construct(child)
+            if reason:
+                return reason
+    return None
+
+class RegexWorker:
+    """عملية منفصلة لمطابقة أنماط re: المطابقة لا يمكن مقاطعتها داخل البوت، أما العملية فتُنهى عند تجاوز المهلة"""
+    
+    SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'regex_worker.py')
+    START_TIMEOUT_SECONDS = 10
+    
+    def __init__(self):
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.stats = {
+            'started': 0,
+            'timeouts': 0,
+            'failures': 0
+        }
+    
+    @property
+    def is_running(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+    
+    async def start(self):
+        """تشغيل عملية المطابقة وانتظار جاهزيتها"""
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, self.SCRIPT_PATH,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        self.stats['started'] += 1
+        try:
+            ready = await asyncio.wait_for(self.process.stdout.readline(), self.START_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            ready = b''
+        if ready.strip() != b'ready':
+            await self.stop()
+            raise RuntimeError("تعذر تشغيل عملية مطابقة الأنماط")
+    
+    async def stop(self):
+        """إنهاء عملية المطابقة"""
+        process, self.process = self.process, None
+        if process is not None and process.returncode is None:
+            process.kill()
+            await process.wait()
+    
+    def kill(self):
+        """إنهاء العملية دون انتظار (عند تغير حلقة الأحداث)"""
+        process, self.process = self.process, None
+        if process is not None and process.returncode is None:
+            try:
+                process.kill()
+            except Exception:
+                pass
+    
+    async def search(self, pattern: str, flags: int, text: str, timeout: float) -> Optional[Tuple[bool, float]]:
+        """مطابقة النمط وإرجاع (النتيجة، زمن المطابقة داخل العملية)؛ None إذا تعذرت، و TimeoutError عند تجاوز المهلة"""
+        if not self.is_running:
+            # زمن التشغيل لا يُحسب من مهلة المطابقة
+            try:
+                await self.start()
+            except (OSError, RuntimeError) as e:
+                self.stats['failures'] += 1
+                logger.log_error(e, {'function': 'RegexWorker.start'})
+                return None
+        
+        request = json.dumps([pattern, flags, text]) + '\n'
+        try:
+            self.process.stdin.write(request.encode('ascii'))
+            await self.process.stdin.drain()
+            reply = await asyncio.wait_for(self.process.stdout.readline(), timeout)
+        except asyncio.TimeoutError:
+            # العملية عالقة في تراجع أسي: إنهاؤها وتشغيل غيرها عند الطلب التالي
+            self.stats['timeouts'] += 1
+            await self.stop()
+            raise
+        except asyncio.CancelledError:
+            # رد المطابقة الملغاة سيبقى في القناة: العملية لا تصلح للطلب التالي
+            self.kill()
+            raise
+        except (OSError, ConnectionError):
+            reply = b''
+        
+        parts = reply.split()
+        if len(parts) != 2 or parts[0] not in (b'0', b'1'):
+            self.stats['failures'] += 1
+            if not reply:
+                # انتهت العملية (نفاد الذاكرة مثلاً)
+                await self.stop()
+            return None
+        return parts[0] == b'1', float(parts[1])
+
+class RegexWorkerPool:
+    """مجموعة صغيرة من عمليات المطابقة: نمط بطيء يشغل عملية واحدة ولا يؤخر أنماط المهام الأخرى"""
+    
+    POOL_SIZE = 4
+    
+    def __init__(self, size: int = POOL_SIZE):
+        self.size = size
+        self.workers = [RegexWorker() for _ in range(size)]
+        self.loop = None
+        self.idle: Optional[asyncio.Queue] = None  # العمليات المتاحة (كل عملية تخدم طلباً واحداً في كل مرة)
+    
+    def bind_loop(self):
+        """ربط طابور العمليات المتاحة بحلقة الأحداث الحالية"""
+        loop = asyncio.get_running_loop()
+        if self.loop is loop:
+            return
+        for worker in self.workers:
+            worker.kill()
+        self.loop = loop
+        self.idle = asyncio.Queue()
+        for worker in self.workers:
+            self.idle.put_nowait(worker)
+    
+    async def search(self, pattern: str, flags: int, text: str, timeout: float) -> Optional[Tuple[bool, float]]:
+        """مطابقة النمط في أول عملية متاحة"""
+        self.bind_loop()
+        worker = await self.idle.get()
+        try:
+            return await worker.search(pattern, flags, text, timeout)
+        finally:
+            self.idle.put_nowait(worker)
+    
+    async def stop(self):
+        """إنهاء جميع العمليات"""
+        for worker in self.workers:
+            await worker.stop()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات عمليات المطابقة"""
+        stats = {key: sum(worker.stats[key] for worker in self.workers) for key in ('started', 'timeouts', 'failures')}
+        stats['workers'] = self.size
+        stats['running'] = sum(worker.is_running for worker in self.workers)
+        stats['busy'] = self.size - self.idle.qsize() if self.idle else 0
+        return stats
+
+class CompiledPattern:
+    """نمط مجمع مع عدادات تكلفة تنفيذه"""
+    
+    __slots__ = ('pattern', 'flags', 'regex', 'is_linear', 'error', 'disabled',
+                 'runs', 'matches', 'total_seconds', 'max_seconds', 'slow_runs')
+    
+    def __init__(self, pattern: str, flags: int):
+        self.pattern = pattern
+        self.flags = flags
+        self.regex = None
+        self.is_linear = False  # مجمع بمحرك re2
+        self.error: Optional[str] = None
+        self.disabled = False
+        self.runs = 0
+        self.matches = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.slow_runs = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """عدادات تكلفة النمط"""
+        return {
+            'pattern': self.pattern,
+            'engine': 're2' if self.is_linear else 're',
+            'runs': self.runs,
+            'matches': self.matches,
+            'avg_ms': self.total_seconds / self.runs * 1000 if self.runs else 0.0,
+            'max_ms': self.max_seconds * 1000,
+            'slow_runs': self.slow_runs,
+            'disabled': self.disabled,
+            'error': self.error
+        }
+
+class PatternCache:
+    """كاش محدود للأنماط المجمعة حسب (النمط، الخيارات) مع ميزانية زمنية للمطابقة"""
+    
+    MAX_ENTRIES = 1024
+    MAX_PATTERN_LENGTH = 500
+    MAX_TEXT_LENGTH = 4096  # حد طول رسالة تلغرام
+    SLOW_MATCH_SECONDS = 0.05  # الميزانية الزمنية لمطابقة واحدة
+    MAX_SLOW_RUNS = 3  # يُعطل النمط بعد تجاوز الميزانية هذا العدد من المرات
+    MATCH_TIMEOUT_SECONDS = 0.5  # مهلة إنهاء مطابقة re في العملية المنفصلة
+    
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.patterns: OrderedDict = OrderedDict()
+        self.workers = RegexWorkerPool()  # مطابقات re تعمل خارج حلقة الأحداث
+        self.stats = {
+            'compiled': 0,
+            'hits': 0,
+            'evicted': 0,
+            'disabled': 0,
+            'timeouts': 0
+        }
+    
+    def validate(self, pattern: str) -> Optional[str]:
+        """فحص النمط قبل حفظه وإرجاع سبب الرفض أو None"""
+        if not isinstance(pattern, str) or not pattern:
+            return "النمط فارغ"
+        if len(pattern) > self.MAX_PATTERN_LENGTH:
+            return f"النمط أطول من {self.MAX_PATTERN_LENGTH} حرف"
+        
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            return f"نمط غير صالح: {e}"
+        
+        if re2 is not None and self.compile_linear(pattern, 0) is not None:
+            # محرك re2 خطي الزمن: لا خطر تراجع أسي
+            return None
+        
+        # بدون محرك خطي: رفض البنى غير الخطية من شجرة النمط نفسها
+        return find_backtracking_construct(sre_parse.parse(pattern))
+    
+    @staticmethod
+    def compile_linear(pattern: str, flags: int):
+        """تجميع النمط بمحرك re2 إذا كان يدعمه"""
+        if flags & ~re.IGNORECASE:
+            return None
+        try:
+            return re2.compile(('(?i)' if flags & re.IGNORECASE else '') + pattern)
+        except Exception:
+            # re2 لا يدعم الإحالات الخلفية والنظر للأمام/الخلف
+            return None
+    
+    def get(self, pattern: str, flags: int = 0) -> CompiledPattern:
+        """الحصول على النمط المجمع وتجميعه عند أول استخدام فقط"""
+        key = (pattern, flags)
+        compiled = self.patterns.get(key)
+        if compiled is not None:
+            self.patterns.move_to_end(key)
+            self.stats['hits'] += 1
+            return compiled
+        
+        compiled = CompiledPattern(pattern, flags)
+        if re2 is not None:
+            compiled.regex = self.compile_linear(pattern, flags)
+            compiled.is_linear = compiled.regex is not None
+        
+        if compiled.regex is None:
+            # الأنماط المحفوظة قبل التحقق عند الحفظ تُفحص هنا أيضاً
+            # (مطابقة re تتم في عملية المطابقة المنفصلة لا هنا)
+            compiled.error = self.validate(pattern)
+            compiled.disabled = compiled.error is not None
+        
+        self.patterns[key] = compiled
+        self.stats['compiled'] += 1
+        if len(self.patterns) > self.max_entries:
+            self.patterns.popitem(last=False)
+            self.stats['evicted'] += 1
+        return compiled
+    
+    async def search(self, pattern: str, text: str, flags: int = 0) -> Optional[bool]:
+        """مطابقة النمط مع النص؛ None إذا تعذر الحكم (نمط غير صالح أو معطل لتكلفته)"""
+        compiled = self.get(pattern, flags)
+        if compiled.disabled:
+            return None
+        
+        text = text[:self.MAX_TEXT_LENGTH]
+        if compiled.is_linear:
+            started_at = time.perf_counter()
+            matched = compiled.regex.search(text) is not None
+            elapsed = time.perf_counter() - started_at
+        else:
+            # الزمن المحسوب هو زمن المطابقة داخل العملية، لا انتظار عملية متاحة أو تشغيلها
+            try:
+                result = await self.workers.search(pattern, flags, text, self.MATCH_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                self.stats['timeouts'] += 1
+                compiled.runs += 1
+                compiled.slow_runs += 1
+                compiled.total_seconds += self.MATCH_TIMEOUT_SECONDS
+                compiled.max_seconds = max(compiled.max_seconds, self.MATCH_TIMEOUT_SECONDS)
+                self.disable(compiled, f"تجاوز مهلة المطابقة {self.MATCH_TIMEOUT_SECONDS:g} ث")
+                return None
+            if result is None:
+                return None
+            matched, elapsed = result
+        
+        compiled.runs += 1
+        compiled.total_seconds += elapsed
+        if elapsed > compiled.max_seconds:
+            compiled.max_seconds = elapsed
+        if matched:
+            compiled.matches += 1
+        
+        if elapsed > self.SLOW_MATCH_SECONDS:
+            compiled.slow_runs += 1
+            # تجاوز كبير واحد يكفي للتعطيل
+            too_slow = compiled.slow_runs >= self.MAX_SLOW_RUNS or elapsed > self.SLOW_MATCH_SECONDS * 10
+            if not compiled.is_linear and too_slow:
+                self.disable(compiled, f"تجاوز الميزانية الزمنية {compiled.slow_runs} مرات")
+        return matched
+    
+    def disable(self, compiled: CompiledPattern, reason: str):
+        """تعطيل نمط مكلف (مرة واحدة حتى مع المطابقات المتزامنة)"""
+        if compiled.disabled:
+            return
+        compiled.disabled = True
+        compiled.error = reason
+        self.stats['disabled'] += 1
+        logger.logger.warning(
+            f"⚠️ تم تعطيل نمط فلتر مكلف ({compiled.max_seconds * 1000:.0f} ms): {compiled.pattern[:100]}"
+        )
+    
+    def get_expensive_patterns(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """الأنماط الأعلى تكلفة أو المعطلة"""
+        flagged = [
+            compiled for compiled in self.patterns.values()
+            if compiled.disabled or compiled.slow_runs
+        ]
+        flagged.sort(key=lambda compiled: (compiled.disabled, compiled.max_seconds), reverse=True)
+        return [compiled.get_stats() for compiled in flagged[:limit]]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات الكاش"""
+        return {
+            **self.stats,
+            'patterns': len(self.patterns),
+            'linear_engine': re2 is not None,
+            'workers': self.workers.get_stats(),
+            'expensive': self.get_expensive_patterns()
+        }
+
+def validate_task_patterns(settings: Dict[str, Any]) -> List[str]:
+    """فحص أنماط الفلاتر في إعدادات مهمة وإرجاع قائمة الأخطاء"""
+    errors = []
+    filters = settings.get('filters') or {}
+    
+    # فلتر 'text' لـ MessageFilterManager (النمط نص) و 'text_content' لـ AdvancedFilterManager (النمط مع الإجراء)
+    for filter_name in ('text', 'text_content'):
+        for pattern_config in (filters.get(filter_name) or {}).get('regex_patterns') or []:
+            pattern = pattern_config.get('pattern', '') if isinstance(pattern_config, dict) else pattern_config
+            error = pattern_cache.validate(pattern)
+            if error:
+                errors.append(f"{str(pattern)[:50]}: {error}")
+    return errors
+
+# كاش مشترك بين مديري الفلاتر
+pattern_cache = PatternCache()
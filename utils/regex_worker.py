@@ -0,0 +1,33 @@
+"""
+عملية منفصلة لمطابقة أنماط re بمهلة حقيقية
+Standalone Regex Match Worker Process
+"""
+
+# تُشغَّل كسكربت مستقل (لا تستورد وحدات البوت) ويمكن إنهاؤها في أي لحظة
+# البروتوكول: سطر JSON لكل طلب [النمط، الخيارات، النص] والرد '<1|0> <زمن المطابقة بالثواني>' أو 'e' لنمط غير صالح
+
+import json
+import re
+import sys
+import time
+
+def serve(reader, writer):
+    """حلقة المطابقة حتى إغلاق قناة الإدخال"""
+    writer.write('ready\n')
+    writer.flush()
+    
+    for line in reader:
+        try:
+            pattern, flags, text = json.loads(line)
+            # re يحتفظ بكاش داخلي للأنماط المجمعة، والزمن المُرسل للمطابقة وحدها
+            regex = re.compile(pattern, flags)
+            started_at = time.perf_counter()
+            matched = regex.search(text) is not None
+            reply = f"{int(matched)} {time.perf_counter() - started_at:.6f}"
+        except (ValueError, re.error):
+            reply = 'e'
+        writer.write(reply + '\n')
+        writer.flush()
+
+if __name__ == "__main__":
+    serve(sys.stdin, sys.stdout)